@@ -0,0 +1,296 @@
+"""
+Moteur d'inférence natif : le scaler et le booster XGBoost extraits des artefacts MLflow.
+
+Le chemin pyfunc (`scale_data` puis `predict_with_model`) passe deux fois par les
+vérifications de schéma MLflow et recrée un DataFrame entre les deux. Ici, les features
+arrivent en matrice contiguë (`FeaturePipeline.transform_array`), sont standardisées en
+place puis passées telles quelles à `Booster.inplace_predict` (pas de DMatrix).
+
+La standardisation reste en float64, comme dans sklearn : les seuils des arbres XGBoost
+(méthode `hist`) sont des valeurs du jeu d'entraînement, et un arrondi float32 différent
+suffit à faire basculer une ligne de l'autre côté d'un seuil. En float64, les prédictions
+sont identiques à celles du chemin pyfunc, pour un coût équivalent.
+
+Activé par `INFERENCE_ENGINE=native` ; si les artefacts ne s'y prêtent pas (scaler
+non standard, modèle non XGBoost), le service reste sur le chemin pyfunc.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "pyfunc")  # "pyfunc" ou "native"
+
+
+class NativeEngineUnavailable(ValueError):
+    """Les artefacts chargés ne permettent pas l'inférence native."""
+
+
+def unwrap_model(model: Any) -> Any:
+    """
+    Objet sous-jacent d'un modèle `mlflow.pyfunc` (flavors sklearn/xgboost via `get_raw_model`,
+    modèles Python personnalisés via `unwrap_python_model`), ou le modèle lui-même.
+    """
+    for accessor in ("get_raw_model", "unwrap_python_model"):
+        if hasattr(model, accessor):
+            try:
+                return getattr(model, accessor)()
+            except (NotImplementedError, ValueError):
+                continue
+    return model
+
+
+def _is_standard_scaler(obj: Any) -> bool:
+    return hasattr(obj, "mean_") and hasattr(obj, "scale_") and hasattr(obj, "n_features_in_")
+
+
+def standard_scaler(scaler: Any) -> Any:
+    """
+    StandardScaler sklearn d'un scaler pyfunc, éventuellement porté par un attribut d'un
+    modèle pyfunc personnalisé (ex: `self.scaler`).
+    """
+    raw = unwrap_model(scaler)
+    if not _is_standard_scaler(raw):
+        candidates = [v for v in vars(raw).values() if _is_standard_scaler(v)] if hasattr(raw, "__dict__") else []
+        if len(candidates) != 1:
+            raise NativeEngineUnavailable(f"Scaler non reconnu : {type(raw).__name__}")
+        raw = candidates[0]
+    return raw
+
+
+def standardization(scaler: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Paramètres (mean, scale) en float64 d'un scaler, pour `(x - mean) / scale`.
+    """
+    raw = standard_scaler(scaler)
+    n = raw.n_features_in_
+    # Comme `StandardScaler.transform` : `mean_` est calculé même avec with_mean=False
+    mean = raw.mean_ if getattr(raw, "with_mean", True) and raw.mean_ is not None else np.zeros(n)
+    scale = raw.scale_ if raw.scale_ is not None else np.ones(n)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def native_booster(model: Any):
+    """
+    Booster XGBoost d'un modèle pyfunc (flavor xgboost) ou d'un estimateur `XGBModel`.
+    """
+    import xgboost as xgb
+
+    raw = unwrap_model(model)
+    if isinstance(raw, xgb.XGBModel):
+        raw = raw.get_booster()
+    if not isinstance(raw, xgb.Booster):
+        raise NativeEngineUnavailable(f"Modèle non XGBoost : {type(raw).__name__}")
+    return raw
+
+
+def as_matrix(X) -> np.ndarray:
+    """
+    Copie float64 contiguë de X ; colonne par colonne pour un DataFrame (types nullables
+    compris), bien plus rapide que `np.array(df)` sur des colonnes de types mélangés.
+    """
+    import pandas as pd
+
+    if not isinstance(X, pd.DataFrame):
+        return np.array(X, dtype=np.float64, order="C")
+    matrix = np.empty(X.shape, dtype=np.float64)
+    for j in range(X.shape[1]):
+        matrix[:, j] = X.iloc[:, j].to_numpy(dtype=np.float64, na_value=np.nan)
+    return matrix
+
+
+class CompiledTrees:
+    """
+    Arbres d'un booster XGBoost évalués en NumPy, tous les arbres avancés d'un niveau à la fois.
+
+    Pour les très petits lots appelés en boucle (prévision récursive : quelques lignes par pas),
+    le coût fixe de `inplace_predict` (~300 µs par appel, quel que soit le nombre de lignes)
+    domine ; ici un appel coûte quelques dizaines de µs. Résultats identiques au bit près :
+    mêmes comparaisons (float32, `x < seuil`, valeur manquante vers `default_left`) et
+    feuilles sommées en float32 dans l'ordre des arbres, à partir de `base_score`.
+
+    Args:
+        booster (xgboost.Booster): Modèle à lien identité (régression), sans split catégoriel.
+        iteration_range (tuple): Plage d'itérations utilisée, comme pour `inplace_predict`.
+    """
+
+    OBJECTIVES = ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror", "reg:quantileerror")
+
+    def __init__(self, booster, iteration_range: Tuple[int, int] = (0, 0)):
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in self.OBJECTIVES:
+            raise NativeEngineUnavailable(f"Objectif non pris en charge : {objective}")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise NativeEngineUnavailable(f"Booster non pris en charge : {learner['gradient_booster']['name']}")
+        model = learner["gradient_booster"]["model"]
+        indptr = model["iteration_indptr"]
+        end = iteration_range[1] or len(indptr) - 1
+        trees = model["trees"][indptr[iteration_range[0]]:indptr[end]]
+        if any(tree["categories_nodes"] for tree in trees):
+            raise NativeEngineUnavailable("Splits catégoriels non pris en charge")
+        num_target = learner["learner_model_param"].get("num_target", "1")
+        if num_target != "1":
+            raise NativeEngineUnavailable(f"Modèle multi-cible ({num_target} cibles)")
+        self.base_score = np.float32(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        # Tous les nœuds de tous les arbres à la suite. Le fils droit suit toujours le gauche
+        # (allocation XGBoost) : un seul tableau d'enfants. Une feuille boucle sur elle-même
+        # (jamais à droite, même pour x = +inf).
+        roots, feature, threshold, left, default_left, value, internal = [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in trees:
+            lc = np.asarray(tree["left_children"], dtype=np.int64)
+            rc = np.asarray(tree["right_children"], dtype=np.int64)
+            leaf = lc < 0
+            if not np.array_equal(rc[~leaf], lc[~leaf] + 1):
+                raise NativeEngineUnavailable("Disposition des nœuds non prise en charge")
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, tree["split_indices"]))
+            threshold.append(np.where(leaf, np.inf, tree["split_conditions"]))
+            left.append(np.where(leaf, np.arange(len(lc)), lc) + offset)
+            default_left.append(leaf | np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(leaf, tree["split_conditions"], 0.0))
+            internal.append(~leaf)
+            depth = max(depth, self._depth(lc, rc))
+            offset += len(lc)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.feature = np.concatenate(feature).astype(np.int64)
+        self.threshold = np.concatenate(threshold).astype(np.float32)
+        self.left = np.concatenate(left)
+        self.default_right = ~np.concatenate(default_left)
+        self.value = np.concatenate(value).astype(np.float32)
+        self.internal = np.concatenate(internal)
+        self.depth = depth
+
+    @staticmethod
+    def _depth(left: np.ndarray, right: np.ndarray) -> int:
+        depth, level = 0, [0]
+        while True:
+            level = [child for node in level for child in (left[node], right[node]) if child >= 0]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            X (np.ndarray): Features (n, n_features), déjà standardisées.
+
+        Returns:
+            np.ndarray: Prédictions (float32), une par ligne.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        row_offsets = np.arange(len(X)) * X.shape[1]
+        node = np.repeat(self.roots[:, None], len(X), axis=1)  # (arbres, lignes)
+        for _ in range(self.depth):
+            x = flat[row_offsets + self.feature[node]]
+            # x >= seuil est faux pour NaN : la valeur manquante suit `default_left`
+            go_right = ((x >= self.threshold[node]) | (np.isnan(x) & self.default_right[node])) & self.internal[node]
+            node = self.left[node] + go_right
+        # Même ordre d'accumulation que XGBoost : base_score puis chaque arbre, en float32
+        leaves = np.empty((len(self.roots) + 1, len(X)), dtype=np.float32)
+        leaves[0] = self.base_score
+        leaves[1:] = self.value[node]
+        return np.cumsum(leaves, axis=0, dtype=np.float32)[-1]
+
+
+class NativeEngine:
+    """
+    Standardisation en place + prédiction XGBoost par un appel natif.
+
+    Args:
+        booster (xgboost.Booster): Modèle natif.
+        mean (np.ndarray): Moyenne par feature (float64).
+        scale (np.ndarray): Écart-type par feature (float64).
+    """
+
+    def __init__(self, booster, mean: np.ndarray, scale: np.ndarray):
+        self.booster = booster
+        self.mean = mean
+        self.scale = scale
+        best = booster.attr("best_iteration")
+        # Même plage d'arbres que `XGBModel.predict` (arrêt anticipé pris en compte)
+        self.iteration_range = (0, int(best) + 1) if best is not None else (0, 0)
+        self._step_predictor: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_models(cls, scaler: Any, model: Any, feature_names: Optional[Sequence[str]] = None) -> "NativeEngine":
+        """
+        Le chemin natif passe une matrice sans noms de colonnes : les features du pipeline
+        (`feature_names`), du scaler et du booster doivent correspondre une à une.
+        """
+        raw_scaler = standard_scaler(scaler)
+        booster = native_booster(model)
+        fitted_names = getattr(raw_scaler, "feature_names_in_", None)
+        if feature_names is not None:
+            if fitted_names is not None and list(fitted_names) != list(feature_names):
+                raise NativeEngineUnavailable(f"Features du scaler {list(fitted_names)} "
+                                              f"différentes de celles du pipeline {list(feature_names)}")
+            if raw_scaler.n_features_in_ != len(feature_names):
+                raise NativeEngineUnavailable(f"Scaler ajusté sur {raw_scaler.n_features_in_} features, "
+                                              f"le pipeline en produit {len(feature_names)}")
+        if raw_scaler.n_features_in_ != booster.num_features():
+            raise NativeEngineUnavailable(f"Scaler ajusté sur {raw_scaler.n_features_in_} features, "
+                                          f"booster sur {booster.num_features()}")
+        mean, scale = standardization(raw_scaler)
+        return cls(booster, mean, scale)
+
+    def predict(self, X, overwrite: bool = False) -> np.ndarray:
+        """
+        Args:
+            X (pd.DataFrame | np.ndarray): Features non standardisées, colonnes dans l'ordre d'entraînement.
+            overwrite (bool): X est une matrice float64 contiguë jetable (ex: `transform_array`),
+                standardisée en place sans copie.
+
+        Returns:
+            np.ndarray: Prédictions (float32), une par ligne.
+        """
+        reusable = (overwrite and isinstance(X, np.ndarray) and X.dtype == np.float64
+                    and X.flags["C_CONTIGUOUS"] and X.flags["WRITEABLE"])
+        data = X if reusable else as_matrix(X)
+        if data.ndim != 2 or data.shape[1] != len(self.scale):
+            raise ValueError(f"{len(self.scale)} features attendues, reçu {data.shape}")
+        data -= self.mean
+        data /= self.scale
+        return self.booster.inplace_predict(data, iteration_range=self.iteration_range, validate_features=False)
+
+    def step_predictor(self) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        Prédicteur pour de petits lots répétés (même contrat que `predict(X, overwrite=True)`) :
+        arbres compilés en NumPy si le booster s'y prête, sinon `predict`. Compilé une fois.
+        """
+        with self._lock:
+            if self._step_predictor is None:
+                try:
+                    trees = CompiledTrees(self.booster, self.iteration_range)
+
+                    def predict(X: np.ndarray) -> np.ndarray:
+                        X -= self.mean
+                        X /= self.scale
+                        return trees.predict(X)
+
+                    self._step_predictor = predict
+                except NativeEngineUnavailable as e:
+                    logger.warning(f"⚠️ Arbres non compilables, `inplace_predict` utilisé pas à pas : {e}")
+                    self._step_predictor = lambda X: self.predict(X, overwrite=True)
+            return self._step_predictor
+
+
+def build_native_engine(scaler: Any, model: Any,
+                        feature_names: Optional[Sequence[str]] = None) -> Optional[NativeEngine]:
+    """
+    Moteur natif pour ce couple scaler/modèle, ou None (avec un avertissement) s'il n'est pas applicable.
+    """
+    try:
+        return NativeEngine.from_models(scaler, model, feature_names)
+    except (NativeEngineUnavailable, ImportError) as e:
+        logger.warning(f"⚠️ Inférence native indisponible, chemin pyfunc conservé : {e}")
+        return None
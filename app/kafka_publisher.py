@@ -0,0 +1,312 @@
+"""
+Publication des prédictions sur Kafka, depuis la file d'effets de bord (`publish`).
+
+Un message par prédiction (`KAFKA_MESSAGE_MODE=batch`, défaut) ou un par pas de temps
+(`point`), en JSON ou dans un format binaire compact (`KAFKA_ENCODING=binary`) :
+
+* batch : en-tête `<BqIi` (version, T1 en secondes epoch, nombre de points, pas en
+  secondes) suivi des prédictions en float32 little-endian. Si les horodatages réels
+  sautent des pas de la grille (lignes sans mesure, changement d'heure), le pas vaut 0
+  et les horodatages suivent les valeurs (int64, secondes epoch) ;
+* point : `<qf` (horodatage en secondes epoch, prédiction float32), 12 octets.
+
+En JSON, une prédiction non finie (NaN, ±inf) est écrite `null` (JSON valide, comme la
+réponse de l'API) ; en binaire, elle reste un float32 NaN/±inf.
+
+Les versions des modèles voyagent dans les en-têtes Kafka (`model_versions`, JSON) ;
+`decode_message` relit les deux formats.
+
+Remise « au moins une fois » : un lot d'effets de bord en échec (flush expiré, broker
+injoignable) est rejoué en entier par la file, et un message déjà acquitté peut être
+republié. L'en-tête `message_id` (empreinte de la clé, de la valeur et des versions) est
+identique d'un envoi à l'autre : les consommateurs dédupliquent sur cet en-tête. Le producteur groupe les envois (`linger_ms`,
+`batch_size`) et les compresse. Le nombre de messages non acquittés est borné : au-delà,
+`publish` attend au plus `KAFKA_MAX_BLOCK_MS` puis abandonne le message (compté).
+Latence de remise et abandons sont exportés sur /metrics.
+"""
+import os
+import json
+import math
+import hashlib
+import time
+import struct
+import logging
+import threading
+from datetime import date
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.serialization import ROW_STEP, payload_timestamps, row_timestamps
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# === Config Kafka ===
+KAFKA_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
+KAFKA_TOPIC = os.getenv("KAFKA_TOPIC")
+KAFKA_MESSAGE_MODE = os.getenv("KAFKA_MESSAGE_MODE", "batch")  # "batch" ou "point"
+KAFKA_ENCODING = os.getenv("KAFKA_ENCODING", "json")  # "json" ou "binary"
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION", "gzip")  # gzip, snappy, lz4, zstd ou none
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", 20))
+KAFKA_BATCH_BYTES = int(os.getenv("KAFKA_BATCH_BYTES", 64 * 1024))
+KAFKA_BUFFER_BYTES = int(os.getenv("KAFKA_BUFFER_BYTES", 16 * 1024 * 1024))
+KAFKA_ACKS = os.getenv("KAFKA_ACKS", "1")
+KAFKA_MAX_PENDING = int(os.getenv("KAFKA_MAX_PENDING", 10000))  # Messages envoyés, non acquittés
+KAFKA_MAX_BLOCK_MS = int(os.getenv("KAFKA_MAX_BLOCK_MS", 1000))
+
+MESSAGE_MODES = ("batch", "point")
+ENCODINGS = ("json", "binary")
+BINARY_VERSION = 1
+BATCH_HEADER = struct.Struct("<BqIi")
+POINT = struct.Struct("<qf")
+STEP_SECONDS = int(ROW_STEP // np.timedelta64(1, "s"))  # Pas des prédictions (voir `row_timestamps`)
+
+Message = Tuple[Optional[bytes], bytes, List[Tuple[str, bytes]]]
+
+
+def build_kafka_producer(servers: str = KAFKA_SERVERS, **overrides):
+    """
+    KafkaProducer configuré pour le débit : envois groupés, compression, tampon borné.
+    """
+    from kafka import KafkaProducer
+
+    acks = KAFKA_ACKS if KAFKA_ACKS == "all" else int(KAFKA_ACKS)
+    config = dict(bootstrap_servers=servers,
+                  acks=acks,
+                  compression_type=None if KAFKA_COMPRESSION == "none" else KAFKA_COMPRESSION,
+                  linger_ms=KAFKA_LINGER_MS,
+                  batch_size=KAFKA_BATCH_BYTES,
+                  buffer_memory=KAFKA_BUFFER_BYTES,
+                  max_block_ms=KAFKA_MAX_BLOCK_MS)
+    config.update(overrides)
+    return KafkaProducer(**config)
+
+
+def json_values(values: List[Optional[float]]) -> List[Optional[float]]:
+    """Valeurs non finies (NaN, ±inf) ou absentes -> None, écrites `null`."""
+    return [v if v is not None and math.isfinite(v) else None for v in values]
+
+
+def message_id(key: bytes, value: bytes, versions: bytes) -> bytes:
+    """Identifiant déterministe d'un message : le même à chaque nouvel essai du lot."""
+    return hashlib.sha1(b"\0".join([key, value, versions])).hexdigest()[:20].encode("ascii")
+
+
+def encode_messages(payload: dict, mode: str = KAFKA_MESSAGE_MODE, encoding: str = KAFKA_ENCODING) -> Iterator[Message]:
+    """
+    Messages (clé, valeur, en-têtes) d'une prédiction `{"T1", "timestamps", "predictions", "model_versions"}`,
+    chacun avec son en-tête `message_id` (déduplication côté consommateur).
+    """
+    for key, value, headers in _encode(payload, mode, encoding):
+        yield key, value, headers + [("message_id", message_id(key, value, dict(headers)["model_versions"]))]
+
+
+def _encode(payload: dict, mode: str, encoding: str) -> Iterator[Message]:
+    T1 = date.fromisoformat(str(payload["T1"]))
+    predictions = payload["predictions"]
+    timestamps = payload_timestamps(payload)
+    headers = [("model_versions", json.dumps(payload.get("model_versions") or {}).encode("utf-8")),
+               ("encoding", encoding.encode("ascii"))]
+    start = int(np.datetime64(T1, "s").astype(np.int64))
+
+    if mode == "batch":
+        key = str(T1).encode("ascii")
+        if encoding == "binary":
+            values = np.asarray(predictions, dtype="<f4").tobytes()
+            if np.array_equal(timestamps, row_timestamps(T1, len(predictions))):
+                yield key, BATCH_HEADER.pack(BINARY_VERSION, start, len(predictions), STEP_SECONDS) + values, headers
+            else:
+                seconds = timestamps.astype("<i8").tobytes()
+                yield key, BATCH_HEADER.pack(BINARY_VERSION, start, len(predictions), 0) + values + seconds, headers
+        else:
+            body = {"T1": str(T1), "timestamps": timestamps.astype(str).tolist(),
+                    "predictions": json_values(predictions), "model_versions": payload.get("model_versions")}
+            yield key, json.dumps(body, allow_nan=False).encode("utf-8"), headers
+        return
+
+    seconds = timestamps.astype(np.int64).tolist()
+    if encoding == "binary":
+        for timestamp, second, value in zip(timestamps.astype(str).tolist(), seconds, predictions):
+            yield timestamp.encode("ascii"), POINT.pack(second, math.nan if value is None else value), headers
+        return
+    for timestamp, value in zip(timestamps.astype(str).tolist(), json_values(predictions)):
+        point = json.dumps({"timestamp": timestamp, "y_pred": value}, allow_nan=False)
+        yield timestamp.encode("ascii"), point.encode("utf-8"), headers
+
+
+def decode_message(value: bytes, headers: List[Tuple[str, bytes]] = ()) -> dict:
+    """
+    Message publié -> `{"T1", "timestamps", "predictions"}` (batch) ou `{"timestamp", "y_pred"}` (point),
+    avec `model_versions` si l'en-tête est présent.
+    """
+    meta = dict(headers or ())
+    if meta.get("encoding") == b"binary":
+        if len(value) == POINT.size:
+            seconds, y = POINT.unpack(value)
+            decoded = {"timestamp": str(np.datetime64(seconds, "s")), "y_pred": y}
+        else:
+            version, start, count, step = BATCH_HEADER.unpack_from(value)
+            if version != BINARY_VERSION:
+                raise ValueError(f"Version de message inconnue : {version}")
+            values = np.frombuffer(value, dtype="<f4", count=count, offset=BATCH_HEADER.size)
+            if step:
+                seconds = start + np.arange(count, dtype=np.int64) * step
+            else:
+                seconds = np.frombuffer(value, dtype="<i8", count=count, offset=BATCH_HEADER.size + 4 * count)
+            decoded = {"T1": str(np.datetime64(start, "s").astype("datetime64[D]")),
+                       "timestamps": seconds.astype("datetime64[s]").astype(str).tolist(),
+                       "predictions": values.tolist()}
+    else:
+        decoded = json.loads(value)
+    if "model_versions" in meta:
+        decoded["model_versions"] = json.loads(meta["model_versions"])
+    return decoded
+
+
+class PredictionPublisher:
+    """
+    Producteur Kafka partagé, créé au premier message, avec remises comptées et bornées.
+
+    Args:
+        topic (str): Topic de destination (None : publication désactivée).
+        producer_factory (Callable): Crée le producteur (par défaut `build_kafka_producer`,
+            si `KAFKA_BOOTSTRAP_SERVERS` est défini).
+        mode (str): "batch" (un message par prédiction) ou "point" (un message par pas de temps).
+        encoding (str): "json" ou "binary".
+        max_pending (int): Messages envoyés mais pas encore acquittés par le broker.
+        max_block (float): Attente maximale (s) d'une place quand `max_pending` est atteint.
+    """
+
+    def __init__(self,
+                 topic: Optional[str] = KAFKA_TOPIC,
+                 producer_factory: Optional[Callable[[], object]] = None,
+                 mode: str = KAFKA_MESSAGE_MODE,
+                 encoding: str = KAFKA_ENCODING,
+                 max_pending: int = KAFKA_MAX_PENDING,
+                 max_block: float = KAFKA_MAX_BLOCK_MS / 1000):
+        if mode not in MESSAGE_MODES:
+            raise ValueError(f"KAFKA_MESSAGE_MODE inconnu : {mode} (attendu : {', '.join(MESSAGE_MODES)})")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"KAFKA_ENCODING inconnu : {encoding} (attendu : {', '.join(ENCODINGS)})")
+        if producer_factory is None and KAFKA_SERVERS:
+            producer_factory = build_kafka_producer
+        self.topic = topic
+        self.producer_factory = producer_factory
+        self.mode = mode
+        self.encoding = encoding
+        self.max_pending = max_pending
+        self.max_block = max_block
+        self._producer = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {"sent": 0, "delivered": 0, "failed": 0, "dropped": 0, "bytes": 0}
+        self._warned_disabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.topic) and self.producer_factory is not None
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            pending = self._stats["sent"] - self._stats["delivered"] - self._stats["failed"]
+            return dict(self._stats, pending=pending, enabled=self.enabled)
+
+    def _get_producer(self):
+        with self._lock:
+            if self._producer is None:
+                self._producer = self.producer_factory()
+                logger.info(f"📡 Producteur Kafka prêt (topic {self.topic}, {self.mode}/{self.encoding})")
+            return self._producer
+
+    def _drop(self, reason: str) -> None:
+        self._count("dropped")
+        metrics.inc("kafka_dropped_total", 1, "Messages Kafka abandonnés.", reason=reason)
+
+    def _delivered(self, sent_at: float, size: int, _metadata=None) -> None:
+        self._slots.release()
+        self._count("delivered")
+        metrics.observe("kafka_delivery_seconds", time.monotonic() - sent_at,
+                        "Délai entre l'envoi d'un message et son acquittement par le broker.")
+        metrics.inc("kafka_delivered_bytes_total", size, "Octets acquittés par le broker Kafka (avant compression).")
+
+    def _failed(self, error) -> None:
+        self._slots.release()
+        self._count("failed")
+        metrics.inc("kafka_dropped_total", 1, "Messages Kafka abandonnés.", reason="delivery")
+        logger.warning(f"⚠️ Message Kafka non remis : {error}")
+
+    def publish(self, payload: dict) -> int:
+        """
+        Envoie les messages d'une prédiction (sans attendre les acquittements).
+
+        Returns:
+            int: Nombre de messages remis au producteur (les autres sont comptés comme abandonnés).
+        """
+        if not self.enabled:
+            if not self._warned_disabled:
+                self._warned_disabled = True
+                logger.info("ℹ️ Kafka non configuré (KAFKA_BOOTSTRAP_SERVERS / KAFKA_TOPIC) : publication ignorée.")
+            return 0
+        producer = self._get_producer()
+        accepted = 0
+        for key, value, headers in encode_messages(payload, self.mode, self.encoding):
+            # Contre-pression : place libérée à chaque acquittement (ou échec) du broker
+            if not self._slots.acquire(timeout=self.max_block):
+                self._drop("backpressure")
+                continue
+            sent_at = time.monotonic()
+            try:
+                future = producer.send(self.topic, value=value, key=key, headers=headers)
+            except Exception as e:  # Tampon du producteur plein (KafkaTimeoutError), message trop gros...
+                self._slots.release()
+                self._drop("buffer")
+                logger.warning(f"⚠️ Message Kafka refusé par le producteur : {e}")
+                continue
+            self._count("sent")
+            self._count("bytes", len(value))
+            future.add_callback(self._delivered, sent_at, len(value))
+            future.add_errback(self._failed)
+            accepted += 1
+        metrics.inc("kafka_messages_total", accepted, "Messages remis au producteur Kafka.")
+        return accepted
+
+    def _reset_after_fork(self) -> None:
+        # Le producteur (thread d'envoi, sockets) ne survit pas au fork : recréé au premier message
+        self._producer = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(self._stats, 0)
+
+    def flush(self, timeout: float = 10) -> None:
+        """
+        Attend l'envoi des messages en attente (une fois par lot d'effets de bord).
+        """
+        if self._producer is not None:
+            with metrics.stage("kafka_flush"):
+                self._producer.flush(timeout=timeout)
+
+    def close(self, timeout: float = 10) -> None:
+        """
+        Vide le tampon puis ferme le producteur (arrêt de l'API).
+        """
+        with self._lock:
+            producer, self._producer = self._producer, None
+        if producer is not None:
+            try:
+                with metrics.stage("kafka_flush"):
+                    producer.flush(timeout=timeout)
+            finally:
+                producer.close(timeout=timeout)
+            logger.info(f"📡 Producteur Kafka fermé ({self.stats()['delivered']} messages remis)")
+
+
+publisher = PredictionPublisher()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=publisher._reset_after_fork)
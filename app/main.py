@@ -1,55 +1,339 @@
-from fastapi import FastAPI, HTTPException
-from app.schemas import PeriodInput, PredictionOutput
-from app.utils import (
-    get_data_between_dates,
-    preprocess_data,
-    scale_data,
-    predict_with_model,
-    upload_predictions_to_minio
-)
-from datetime import timedelta
-import pandas as pd
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.schemas import MAX_DAYS, BatchInput, ForecastInput, PeriodInput, PredictionOutput
+from app.serialization import ARROW, FORMATS, NDJSON, iter_arrow_ipc, iter_ndjson, json_body, negotiate_format
+from app.model import registry
+from app.prefork import BackgroundWarmUp, warm_up
+from app.side_effects import SIDE_EFFECTS_BATCH_SIZE, side_effects, submit_prediction_side_effects
+from app.result_cache import prediction_cache
+from core.metrics import metrics, server_timing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+import asyncio
+import contextvars
+import json
 import os
-import subprocess
+import time
 import logging
 
-app = FastAPI()
 logger = logging.getLogger(__name__)
 
-MAX_DAYS = 7  # Durée maximale autorisée
+# Démarrage à froid : ce module n'importe ni pandas, ni pyarrow, ni mlflow, ni boto3.
+# Le pipeline (`app.utils`) et le monitoring sont importés au premier usage, dans un
+# thread du pool, ou par le préchauffage lancé une fois le port ouvert.
+STARTED_AT = time.time()
 
-@app.post("/predict", response_model=PredictionOutput)
-def predict_period(period: PeriodInput):
-    # Validation de la période
+BATCH_MAX_PERIODS = int(os.getenv("BATCH_MAX_PERIODS", 1000))  # Périodes par appel à /predict/batch
+FORECAST_MAX_SCENARIOS = int(os.getenv("FORECAST_MAX_SCENARIOS", 64))  # Scénarios par appel à /forecast
+
+# === Limites de concurrence (configurables via .env) ===
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", min(8, os.cpu_count() or 1)))
+PREDICT_MAX_CONCURRENCY = int(os.getenv("PREDICT_MAX_CONCURRENCY", 16))
+PREDICT_QUEUE_TIMEOUT = float(os.getenv("PREDICT_QUEUE_TIMEOUT", 30))
+
+# En-tête `Server-Timing` sur toutes les réponses (sinon seulement avec `X-Trace: 1`)
+TRACE_HEADERS = os.getenv("TRACE_HEADERS", "0") == "1"
+
+# Pool borné pour le travail CPU (pandas, XGBoost) et les appels bloquants restants
+executor = ThreadPoolExecutor(max_workers=PREDICT_WORKERS, thread_name_prefix="predict")
+predict_slots = asyncio.Semaphore(PREDICT_MAX_CONCURRENCY)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Exécute une fonction bloquante dans le pool borné, sans bloquer la boucle d'événements.
+    Le contexte (trace de la requête en cours) suit l'appel dans le thread du pool.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+
+
+def warm_up_service() -> None:
+    """
+    Imports lourds, modèles, stock eCO2mix et historique, puis surveillance de l'alias.
+    """
+    warm_up()
+    registry.start()
+
+
+warmup = BackgroundWarmUp(warm_up_service)
+
+
+def run_prediction(T1, T2):
+    from app.utils import run_prediction_pipeline
+
+    return run_prediction_pipeline(T1, T2)
+
+
+def run_batch_prediction(periods, models):
+    from app.utils import run_batch_prediction_pipeline
+
+    return run_batch_prediction_pipeline(periods, models)
+
+
+def run_forecast(T1, T2, scenarios):
+    from app.utils import run_forecast_pipeline
+
+    return run_forecast_pipeline(T1, T2, scenarios)
+
+
+def get_kafka_publisher():
+    from app.kafka_publisher import publisher
+
+    return publisher
+
+
+def get_monitoring_service():
+    from monitoring.service import monitoring_service
+
+    return monitoring_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Effets de bord post-prédiction (CSV, MinIO, Kafka, NannyML) traités en arrière-plan
+    side_effects.start()
+    # Modèles et données chargés en arrière-plan : le port s'ouvre sans les attendre
+    # (`/health/ready` indique quand ils sont prêts ; une requête arrivée avant les charge à la demande)
+    warmup.start()
+    yield
+    side_effects.stop()
+    # Messages encore dans le tampon du producteur envoyés avant l'arrêt
+    get_kafka_publisher().close()
+    registry.stop()
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Compteurs déjà tenus par les composants, exportés tels quels sur /metrics
+metrics.register_collector("prediction_cache", prediction_cache.stats)
+metrics.register_collector("side_effects", side_effects.stats)
+metrics.register_collector("monitoring", lambda: get_monitoring_service().stats())
+metrics.register_collector("kafka", lambda: get_kafka_publisher().stats())
+
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """
+    Durée de chaque requête par route. Avec `X-Trace: 1` (ou TRACE_HEADERS=1), la réponse
+    porte un en-tête `Server-Timing` : durée de chaque étape du pipeline pour cette requête.
+    """
+    traced = TRACE_HEADERS or request.headers.get("x-trace") == "1"
+    start = time.perf_counter()
+    if traced:
+        with metrics.trace() as spans:
+            response = await call_next(request)
+    else:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.observe_request(request.method, getattr(route, "path", "unmatched"), response.status_code, elapsed)
+    if traced:
+        response.headers["Server-Timing"] = server_timing(spans, elapsed)
+    return response
+
+
+def check_period(period: PeriodInput) -> None:
+    """
+    Validation de la période (lève une HTTPException 400).
+    """
     delta = (period.T2 - period.T1).days
     if delta <= 0:
         raise HTTPException(status_code=400, detail="T2 doit être après T1.")
     if delta > MAX_DAYS:
         raise HTTPException(status_code=400, detail=f"Période trop longue. Max autorisé : {MAX_DAYS} jours.")
 
-    # Pipeline de traitement
-    raw_data = get_data_between_dates(period.T1, period.T2)
-    X = preprocess_data(raw_data)
-    X_scaled = scale_data(X)
-    predictions = predict_with_model(X_scaled)
 
-    # Générer les timestamps correspondants
-    timestamps = pd.date_range(start=period.T1, periods=len(predictions), freq="H")
-    df_result = pd.DataFrame({"timestamp": timestamps, "y_pred": predictions})
+async def acquire_predict_slot() -> None:
+    """
+    Limite du nombre de prédictions en cours : au-delà, attente bornée puis 503.
+    """
+    try:
+        await asyncio.wait_for(predict_slots.acquire(), timeout=PREDICT_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Serveur saturé, réessayez plus tard.")
 
-    # Enregistrement local
-    os.makedirs("data", exist_ok=True)
-    local_path = "data/predictions.csv"
-    df_result.to_csv(local_path, index=False)
 
-    # Envoi à MinIO
-    upload_predictions_to_minio(local_path, "predictions.csv")
+@app.post("/predict", response_model=PredictionOutput, responses={
+    200: {"content": {NDJSON: {}, ARROW: {}},
+          "description": "JSON (défaut), lignes NDJSON (timestamp, y_pred) ou flux Arrow IPC selon l'en-tête Accept."}})
+async def predict_period(period: PeriodInput, request: Request):
+    # Validation de la période et du format demandé
+    check_period(period)
+    media_type = negotiate_format(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Formats disponibles : {', '.join(FORMATS)}.")
 
-    # Appel automatique à NannyML pour contrôle
+    await acquire_predict_slot()
     try:
-        subprocess.run(["python", "monitoring/nannyml_runner.py"], check=True)
-        logger.info("✅ NannyML runner exécuté avec succès.")
-    except Exception as e:
-        logger.warning(f"⚠️ Erreur lors de l’exécution de NannyML: {e}")
+        # Pipeline de traitement (téléchargement, features, scaler, modèle) dans le pool borné
+        predictions, timestamps, models, cached = await run_blocking(run_prediction, period.T1, period.T2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        predict_slots.release()
+    headers = {"X-Model-Version": models.version_header(),
+               "X-Model-Loaded-At": models.loaded_at.isoformat(),
+               "X-Cache": "HIT" if cached else "MISS"}
+
+    # CSV local, MinIO, Kafka et NannyML : mis en file, la réponse part sans les attendre.
+    # Un résultat servi depuis le cache a déjà été stocké et publié lors de son calcul.
+    if not cached:
+        await run_blocking(submit_prediction_side_effects, [(period.T1, timestamps, predictions)], models.versions)
+
+    # Réponse écrite directement : pas de DataFrame intermédiaire ni de validation Pydantic par float
+    if media_type == NDJSON:
+        return StreamingResponse(iter_ndjson(timestamps, predictions), media_type=NDJSON, headers=headers)
+    if media_type == ARROW:
+        return StreamingResponse(iter_arrow_ipc(timestamps, predictions), media_type=ARROW, headers=headers)
+    return Response(json_body(timestamps, predictions), media_type="application/json", headers=headers)
+
+
+@app.post("/predict/batch")
+async def predict_batch(batch: BatchInput):
+    """
+    Prédit plusieurs périodes en une passe. Réponse NDJSON en flux : une ligne
+    `{"T1", "T2", "prediction", "timestamps", "cached"}` par période, dans l'ordre de la requête.
+    """
+    if not batch.periods:
+        raise HTTPException(status_code=400, detail="Aucune période fournie.")
+    if len(batch.periods) > BATCH_MAX_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Trop de périodes. Max autorisé : {BATCH_MAX_PERIODS}.")
+    for period in batch.periods:
+        check_period(period)
+
+    await acquire_predict_slot()
+    try:
+        # Un seul instantané des modèles pour tout le lot
+        models = await run_blocking(lambda: registry.current)
+        results = await run_blocking(run_batch_prediction, [(p.T1, p.T2) for p in batch.periods], models)
+        # Premier paquet calculé avant l'envoi des en-têtes : une erreur de données renvoie encore un 500
+        first = await run_blocking(next, results, None)
+    except ValueError as e:
+        predict_slots.release()
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        predict_slots.release()
+        raise
+
+    async def stream():
+        item, pending = first, []
+        try:
+            while item is not None:
+                line = {"T1": str(item.T1), "T2": str(item.T2), "prediction": item.predictions,
+                        "timestamps": item.timestamps.astype(str).tolist(), "cached": item.cached}
+                yield json.dumps(line) + "\n"
+                if not item.cached:
+                    pending.append((item.T1, item.timestamps, item.predictions))
+                if len(pending) >= SIDE_EFFECTS_BATCH_SIZE:
+                    # Effets de bord regroupés : une tâche par handler pour SIDE_EFFECTS_BATCH_SIZE périodes
+                    await run_blocking(submit_prediction_side_effects, pending, models.versions)
+                    pending = []
+                item = await run_blocking(next, results, None)
+            if pending:
+                await run_blocking(submit_prediction_side_effects, pending, models.versions)
+                pending = []
+        finally:
+            predict_slots.release()
+            if pending:
+                # Flux interrompu (client déconnecté) : périodes déjà calculées mises en file sans attendre
+                executor.submit(submit_prediction_side_effects, pending, models.versions)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"X-Model-Version": models.version_header(),
+                                      "X-Model-Loaded-At": models.loaded_at.isoformat()})
+
+
+@app.post("/forecast")
+async def forecast(request_body: ForecastInput):
+    """
+    Prévision récursive de T1 à T2 depuis la dernière mesure, pour un ou plusieurs scénarios TEMPO.
+    Réponse : `{"start", "step_minutes", "timestamps", "forecasts": {scénario: [...]}}`.
+    """
+    check_period(PeriodInput(T1=request_body.T1, T2=request_body.T2))
+    scenarios = [(s.name, s.tempo) for s in request_body.scenarios or []]
+    if len(scenarios) > FORECAST_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Trop de scénarios. Max autorisé : {FORECAST_MAX_SCENARIOS}.")
+    if len({name for name, _ in scenarios}) != len(scenarios):
+        raise HTTPException(status_code=400, detail="Noms de scénarios en double.")
+
+    await acquire_predict_slot()
+    try:
+        result = await run_blocking(run_forecast, request_body.T1, request_body.T2, scenarios)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        predict_slots.release()
+    timestamps = [str(t) for t in result.timestamps.astype("datetime64[s]")]
+    body = {"start": timestamps[0] if timestamps else None, "step_minutes": result.step_minutes,
+            "timestamps": timestamps, "forecasts": result.forecasts}
+    return Response(json.dumps(body), media_type="application/json",
+                    headers={"X-Model-Version": result.models.version_header(),
+                             "X-Model-Loaded-At": result.models.loaded_at.isoformat()})
+
+
+@app.get("/health/live")
+async def liveness():
+    """
+    Le processus répond (boucle d'événements active). Ne dépend ni des modèles ni des données.
+    """
+    return {"status": "alive", "pid": os.getpid(), "uptime_s": round(time.time() - STARTED_AT, 3)}
+
+
+@app.get("/health/ready")
+def readiness(response: Response):
+    """
+    Prêt à servir : préchauffage terminé et modèles chargés (sinon 503).
+    """
+    ready = warmup.finished and registry.is_loaded
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "warming_up",
+            "models_loaded": registry.is_loaded,
+            "warm_up": warmup.stats()}
+
+
+@app.get("/models")
+def loaded_models():
+    """
+    Versions MLflow actuellement en service et date de leur chargement.
+    """
+    if not registry.is_loaded:
+        raise HTTPException(status_code=503, detail="Modèles non chargés.")
+    return registry.current.describe()
+
+
+@app.get("/side-effects")
+def side_effects_stats():
+    """
+    Compteurs de la file des effets de bord (soumis, traités, relancés, rejetés, en attente).
+    """
+    return side_effects.stats()
+
+
+@app.get("/prediction-cache")
+def prediction_cache_stats():
+    """
+    Compteurs du cache de résultats (hits, misses, évictions, invalidations, taille).
+    """
+    return prediction_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Métriques du processus au format texte Prometheus : durées, lignes, erreurs et mémoire
+    par étape du pipeline, durées des requêtes HTTP, octets téléchargés et envoyés.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
-    return {"prediction": predictions}
+@app.get("/monitoring")
+def monitoring_stats():
+    """
+    État du monitoring RMSE : version de référence, chunks estimés, alertes et e-mails envoyés.
+    """
+    return get_monitoring_service().stats()
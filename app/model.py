@@ -1,11 +1,210 @@
-import mlflow.pyfunc
 import os
+import threading
+import time
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 
+from app.inference import INFERENCE_ENGINE, build_native_engine
+from core.metrics import metrics
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+SCALER_NAME = os.getenv("SCALER_NAME", "Scaler_standard")
+MODEL_NAME = os.getenv("MODEL_NAME", "EnergyForecastModel_xgboost")
+MODEL_STAGE = os.getenv("MODEL_STAGE", "prod")
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", 60))
+
+
+# mlflow (~0,6 s d'import) n'est importé qu'au premier chargement de modèle
 def load_model_by_alias(model_name: str, alias: str = "prod"):
+    import mlflow.pyfunc
+
     tracking_uri = os.getenv("MLFLOW_TRACKING_URI")
     mlflow.set_tracking_uri(tracking_uri)
     model_uri = f"models:/{model_name}@{alias}"
     return mlflow.pyfunc.load_model(model_uri)
+
+
+def resolve_model_version(model_name: str, alias: str = "prod") -> str:
+    """
+    Résout la version du registre MLflow pointée par un alias (ex: `prod`).
+    """
+    import mlflow
+    from mlflow import MlflowClient
+
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+    return str(MlflowClient().get_model_version_by_alias(model_name, alias).version)
+
+
+def load_model_version(model_name: str, version: str):
+    """
+    Charge une version figée d'un modèle, pour que l'alias ne bouge pas entre résolution et chargement.
+    """
+    import mlflow.pyfunc
+
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+    return mlflow.pyfunc.load_model(f"models:/{model_name}/{version}")
+
+
+@dataclass(frozen=True)
+class LoadedModels:
+    """
+    Instantané immuable du scaler et du modèle servis ensemble.
+
+    Une requête prend un instantané une seule fois et l'utilise de bout en bout :
+    un rechargement concurrent ne peut donc pas mélanger deux versions.
+    `native` (optionnel) est le moteur d'inférence natif construit à partir des deux artefacts.
+    """
+    scaler: Any
+    model: Any
+    versions: Dict[str, str]
+    loaded_at: datetime
+    native: Any = None
+
+    def describe(self) -> dict:
+        return {
+            "versions": dict(self.versions),
+            "loaded_at": self.loaded_at.isoformat(),
+            "engine": "native" if self.native is not None else "pyfunc",
+        }
+
+    def version_header(self) -> str:
+        return ";".join(f"{name}={version}" for name, version in sorted(self.versions.items()))
+
+
+class ModelRegistry:
+    """
+    Cache process du scaler et du modèle XGBoost chargés depuis MLflow.
+
+    Les deux artefacts sont chargés une fois (au démarrage ou au premier accès),
+    puis un thread de fond surveille l'alias et charge toute nouvelle version
+    hors du chemin des requêtes avant de l'échanger atomiquement.
+    Avec `engine="native"`, chaque instantané embarque aussi son moteur natif (`app.inference`).
+    """
+
+    def __init__(self,
+                 scaler_name: str = SCALER_NAME,
+                 model_name: str = MODEL_NAME,
+                 alias: str = MODEL_STAGE,
+                 poll_interval: float = MODEL_POLL_INTERVAL,
+                 resolver=resolve_model_version,
+                 loader=load_model_version,
+                 engine: str = INFERENCE_ENGINE):
+        self.scaler_name = scaler_name
+        self.model_name = model_name
+        self.alias = alias
+        self.poll_interval = poll_interval
+        self.engine = engine
+        self._resolver = resolver
+        self._loader = loader
+        self._current: Optional[LoadedModels] = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _resolve_versions(self) -> Dict[str, str]:
+        return {
+            self.scaler_name: self._resolver(self.scaler_name, self.alias),
+            self.model_name: self._resolver(self.model_name, self.alias),
+        }
+
+    @metrics.timed("mlflow_load")
+    def _load(self, versions: Dict[str, str], previous: Optional[LoadedModels] = None) -> LoadedModels:
+        # Artefact dont la version n'a pas bougé repris de l'instantané précédent, sans appel MLflow
+        def unchanged(name: str) -> bool:
+            return previous is not None and previous.versions.get(name) == versions[name]
+
+        start = time.perf_counter()
+        scaler = previous.scaler if unchanged(self.scaler_name) else self._loader(self.scaler_name,
+                                                                                 versions[self.scaler_name])
+        model = previous.model if unchanged(self.model_name) else self._loader(self.model_name,
+                                                                              versions[self.model_name])
+        logger.info(f"✅ Modèles chargés {versions} en {time.perf_counter() - start:.2f}s")
+        return self._prepare(LoadedModels(scaler=scaler,
+                                          model=model,
+                                          versions=versions,
+                                          loaded_at=datetime.now(timezone.utc)))
+
+    def _prepare(self, snapshot: LoadedModels) -> LoadedModels:
+        if self.engine == "native" and snapshot.native is None:
+            from app.utils import FEATURE_PIPELINE
+
+            return replace(snapshot, native=build_native_engine(snapshot.scaler, snapshot.model,
+                                                                FEATURE_PIPELINE.feature_names))
+        return snapshot
+
+    def refresh(self) -> bool:
+        """
+        Recharge les modèles si l'alias pointe vers de nouvelles versions.
+
+        Returns:
+            bool: True si un nouvel instantané a été installé.
+        """
+        with self._load_lock:
+            versions = self._resolve_versions()
+            if self._current is not None and self._current.versions == versions:
+                return False
+            # Chargement complet avant l'échange : les requêtes en cours gardent l'ancien instantané.
+            # Seul l'artefact dont la version a changé est rechargé.
+            self._current = self._load(versions, self._current)
+            return True
+
+    @property
+    def current(self) -> LoadedModels:
+        """
+        Instantané courant, chargé à la demande si le démarrage n'a pas pu le faire.
+        """
+        snapshot = self._current
+        if snapshot is None:
+            self.refresh()
+            snapshot = self._current
+        return snapshot
+
+    def install(self, snapshot: LoadedModels) -> None:
+        """
+        Installe directement un instantané (modèles locaux, tests, benchmarks hors ligne).
+        """
+        snapshot = self._prepare(snapshot)
+        with self._load_lock:
+            self._current = snapshot
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._current is not None
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if self.refresh():
+                    logger.info(f"🔄 Alias '{self.alias}' déplacé, nouveaux modèles en service.")
+            except Exception as e:
+                logger.warning(f"⚠️ Échec de la vérification de l'alias '{self.alias}' : {e}")
+
+    def start(self) -> None:
+        """
+        Charge les modèles (sauf s'ils l'ont déjà été, ex: par le processus maître
+        avant fork) puis démarre la surveillance de l'alias en arrière-plan.
+        """
+        if not self.is_loaded:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Chargement initial des modèles impossible : {e}")
+        if self.poll_interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="model-registry-poll", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+registry = ModelRegistry()
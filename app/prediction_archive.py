@@ -0,0 +1,282 @@
+"""
+Archive des prédictions : Parquet en ajout seul, partitionné par jour et par version du modèle.
+
+    <root>/date=2025-06-01/model_version=7/part-<empreinte>.parquet
+
+Chaque lot d'effets de bord ajoute un fichier par partition touchée, sans jamais réécrire
+les précédents. Le nom du fichier dérive de son contenu : un lot rejoué après un échec
+réécrit le même fichier au lieu de dupliquer ses lignes. Après une compaction, le fichier
+fusionné garde dans ses métadonnées Parquet le nom des fichiers dont il provient : un lot
+rejoué dont le fichier a déjà été fusionné n'est pas réécrit. Les fichiers sont envoyés sur
+MinIO sous la même clé (préfixe ARCHIVE_PREFIX), en multipart au-delà de ARCHIVE_PART_SIZE.
+`compact` fusionne les petits fichiers d'une partition ; `read_between` ne lit que les
+partitions de la période demandée. Ajouts, compactions et lectures prennent le verrou de
+fichier de la partition (`.lock`) : sûrs entre threads et entre workers.
+"""
+import os
+import re
+import glob
+import json
+import hashlib
+import logging
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from app.model import MODEL_NAME
+from app.serialization import payload_timestamps
+from core.file_lock import file_lock
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# === Config de l'archive ===
+PREDICTION_ARCHIVE_PATH = os.getenv("PREDICTION_ARCHIVE_PATH", "./data/04_predictions")
+ARCHIVE_PREFIX = os.getenv("ARCHIVE_PREFIX", "predictions")  # Préfixe des clés dans le bucket MinIO
+ARCHIVE_PART_SIZE = int(os.getenv("ARCHIVE_PART_SIZE", 8 * 1024 * 1024))  # ≥ 5 Mo pour S3/MinIO
+ARCHIVE_COMPACT_MIN_FILES = int(os.getenv("ARCHIVE_COMPACT_MIN_FILES", 16))
+
+ARCHIVE_SCHEMA = pa.schema([("timestamp", pa.timestamp("s")),
+                            ("y_pred", pa.float64()),
+                            ("T1", pa.date32()),
+                            ("model_versions", pa.string())])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("model_version", pa.string())]), flavor="hive")
+COMPACTED_FROM = b"compacted_from"  # Métadonnée Parquet d'un fichier fusionné : fichiers sources (JSON)
+
+
+def version_label(versions: Optional[dict]) -> str:
+    """
+    Valeur de la partition `model_version` : version du modèle XGBoost, utilisable dans un chemin.
+    """
+    version = str((versions or {}).get(MODEL_NAME, "unknown"))
+    return re.sub(r"[^A-Za-z0-9._-]", "_", version) or "unknown"
+
+
+def multipart_upload(client, path: str, bucket: str, key: str, part_size: int = ARCHIVE_PART_SIZE) -> int:
+    """
+    Envoie `path` en un seul PUT s'il tient dans une part, sinon en multipart (parts lues
+    une à une : mémoire bornée à `part_size`). Un envoi interrompu est annulé côté serveur.
+
+    Returns:
+        int: Nombre de parts envoyées.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f, metrics.stage("minio_upload"):
+        if size <= part_size:
+            client.put_object(Bucket=bucket, Key=key, Body=f.read())
+            parts = [None]
+        else:
+            upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+            parts = []
+            try:
+                for chunk in iter(lambda: f.read(part_size), b""):
+                    response = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                  PartNumber=len(parts) + 1, Body=chunk)
+                    parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+                client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                 MultipartUpload={"Parts": parts})
+            except Exception:
+                client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                raise
+    metrics.inc("minio_upload_bytes_total", size, "Octets envoyés sur MinIO.")
+    return len(parts)
+
+
+class PredictionArchive:
+    """
+    Prédictions horodatées de chaque appel, conservées en local et sur MinIO.
+
+    Args:
+        root (str): Dossier local de l'archive.
+        prefix (str): Préfixe des clés dans le bucket.
+        part_size (int): Taille des parts d'un envoi multipart.
+        compact_min_files (int): Nombre de fichiers d'une partition à partir duquel `store` la compacte.
+    """
+
+    def __init__(self,
+                 root: str = PREDICTION_ARCHIVE_PATH,
+                 prefix: str = ARCHIVE_PREFIX,
+                 part_size: int = ARCHIVE_PART_SIZE,
+                 compact_min_files: int = ARCHIVE_COMPACT_MIN_FILES):
+        self.root = root
+        self.prefix = prefix
+        self.part_size = part_size
+        self.compact_min_files = compact_min_files
+
+    @staticmethod
+    def partition(day: str, label: str) -> str:
+        return os.path.join(f"date={day}", f"model_version={label}")
+
+    def key(self, relative_path: str) -> str:
+        return "/".join([self.prefix, *relative_path.split(os.sep)])
+
+    def files(self, partition: str) -> List[str]:
+        """Fichiers de données d'une partition (chemins relatifs à `root`), triés."""
+        paths = glob.glob(os.path.join(self.root, partition, "part-*.parquet"))
+        return sorted(os.path.relpath(path, self.root) for path in paths)
+
+    def _lock_path(self, partition: str) -> str:
+        # Verrou de la partition : fichier caché, ignoré par `files` et par les lectures pyarrow
+        return os.path.join(self.root, partition, ".lock")
+
+    def _compacted(self, partition: str) -> set:
+        """Noms des fichiers déjà fusionnés dans un fichier compacté de la partition."""
+        names = set()
+        for relative_path in self.files(partition):
+            metadata = pq.read_schema(os.path.join(self.root, relative_path)).metadata or {}
+            if COMPACTED_FROM in metadata:
+                names.update(json.loads(metadata[COMPACTED_FROM]))
+        return names
+
+    def _write(self, table: pa.Table, relative_path: str) -> None:
+        # Fichier caché (ignoré par les lectures) puis renommage atomique
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp-{os.getpid()}")
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+    def append(self, payloads: List[dict]) -> List[str]:
+        """
+        Ajoute les prédictions `{"T1", "timestamps", "predictions", "model_versions"}` du lot : un
+        fichier par partition (jour de l'horodatage, version du modèle).
+
+        Returns:
+            List[str]: Fichiers écrits (chemins relatifs à `root`).
+        """
+        pieces: Dict[Tuple[str, str], list] = defaultdict(list)
+        for payload in payloads:
+            T1 = date.fromisoformat(str(payload["T1"]))
+            values = np.asarray(payload["predictions"], dtype=np.float64)
+            timestamps = payload_timestamps(payload)  # Datetime réel de chaque ligne prédite
+            versions = payload.get("model_versions") or {}
+            label, versions_json = version_label(versions), json.dumps(versions, sort_keys=True)
+            # Horodatages croissants : un bloc contigu par jour
+            days, starts = np.unique(timestamps.astype("datetime64[D]"), return_index=True)
+            for day, start, end in zip(days, starts, list(starts[1:]) + [len(values)]):
+                pieces[(str(day), label)].append((timestamps[start:end], values[start:end], T1, versions_json))
+
+        written = []
+        with metrics.stage("archive_write") as stage:
+            stage.rows = 0
+            for (day, label), parts in pieces.items():
+                n = [len(values) for _, values, _, _ in parts]
+                table = pa.table({
+                    "timestamp": pa.array(np.concatenate([t for t, _, _, _ in parts]), type=pa.timestamp("s")),
+                    "y_pred": np.concatenate([v for _, v, _, _ in parts]),
+                    "T1": pa.array(np.repeat([np.datetime64(T1, "D") for _, _, T1, _ in parts], n), type=pa.date32()),
+                    "model_versions": pa.array(np.repeat([j for _, _, _, j in parts], n).tolist(), type=pa.string()),
+                }, schema=ARCHIVE_SCHEMA)
+                digest = hashlib.sha1()
+                for column in table.columns:
+                    for buffer in column.combine_chunks().buffers():
+                        if buffer is not None:
+                            digest.update(buffer)
+                partition = self.partition(day, label)
+                name = f"part-{digest.hexdigest()[:20]}.parquet"
+                with file_lock(self._lock_path(partition)):
+                    if name in self._compacted(partition):
+                        logger.info(f"♻️ {name} déjà fusionné dans {partition} : lot rejoué ignoré")
+                        continue
+                    self._write(table, os.path.join(partition, name))
+                written.append(os.path.join(partition, name))
+                stage.rows += table.num_rows
+        return written
+
+    def upload(self, relative_paths: List[str], client, bucket: str) -> None:
+        for relative_path in relative_paths:
+            multipart_upload(client, os.path.join(self.root, relative_path), bucket, self.key(relative_path),
+                             self.part_size)
+
+    def compact(self, partition: str, client=None, bucket: Optional[str] = None,
+                min_files: int = 2) -> Optional[str]:
+        """
+        Fusionne les fichiers d'une partition en un seul, trié par horodatage.
+
+        Le fichier fusionné est d'abord envoyé sur MinIO et les anciens objets supprimés ;
+        l'échange local n'a lieu qu'ensuite. Son nom dérive des fichiers fusionnés : une
+        compaction interrompue puis relancée produit le même fichier. Ses métadonnées
+        listent les fichiers sources (y compris ceux des compactions précédentes).
+
+        Returns:
+            Optional[str]: Fichier fusionné (chemin relatif), None si rien à compacter.
+        """
+        with file_lock(self._lock_path(partition)):
+            sources = self.files(partition)
+            if len(sources) < min_files:
+                return None
+            with metrics.stage("archive_compact") as stage:
+                provenance = self._compacted(partition) | {os.path.basename(source) for source in sources}
+                table = pa.concat_tables([pq.ParquetFile(os.path.join(self.root, source)).read()
+                                         .replace_schema_metadata(None) for source in sources])
+                table = table.sort_by([("timestamp", "ascending"), ("T1", "ascending")])
+                stage.rows = table.num_rows
+                digest = hashlib.sha1("\n".join(sources).encode("utf-8")).hexdigest()[:20]
+                target = os.path.join(partition, f"part-{digest}.parquet")
+                provenance.discard(os.path.basename(target))
+                table = table.replace_schema_metadata({COMPACTED_FROM: json.dumps(sorted(provenance))})
+                hidden = os.path.join(partition, f".compact-{digest}.parquet")
+                self._write(table, hidden)
+                if client is not None:
+                    key = self.key(target)
+                    multipart_upload(client, os.path.join(self.root, hidden), bucket, key, self.part_size)
+                    stale = [{"Key": self.key(source)} for source in sources if source != target]
+                    if stale:
+                        client.delete_objects(Bucket=bucket, Delete={"Objects": stale})
+                os.replace(os.path.join(self.root, hidden), os.path.join(self.root, target))
+                for source in sources:
+                    if source != target:
+                        os.remove(os.path.join(self.root, source))
+        logger.info(f"🗜️ Partition {partition} compactée : {len(sources)} fichiers → 1 ({table.num_rows} lignes)")
+        return target
+
+    def store(self, payloads: List[dict], client=None, bucket: Optional[str] = None) -> List[str]:
+        """
+        Ajoute le lot (local puis MinIO), puis compacte les partitions touchées qui ont
+        au moins `compact_min_files` fichiers. Un échec d'envoi est levé (lot rejoué à
+        l'identique) ; un échec de compaction est seulement journalisé (reprise au lot suivant).
+        """
+        written = self.append(payloads)
+        if client is not None:
+            self.upload(written, client, bucket)
+        for partition in sorted({os.path.dirname(path) for path in written}):
+            if len(self.files(partition)) >= self.compact_min_files:
+                try:
+                    self.compact(partition, client, bucket)
+                except Exception as e:
+                    logger.warning(f"⚠️ Compaction de {partition} reportée : {e}")
+        return written
+
+    def read_between(self, start: date, end: date, model_version: Optional[str] = None) -> pd.DataFrame:
+        """
+        Prédictions dont l'horodatage tombe entre `start` et `end` (inclus), triées par
+        horodatage puis par T1. Seules les partitions de la période sont ouvertes.
+        """
+        columns = ARCHIVE_SCHEMA.names + ["model_version"]
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns)
+        expr = (ds.field("date") >= str(start)) & (ds.field("date") <= str(end))
+        if model_version is not None:
+            expr &= ds.field("model_version") == version_label({MODEL_NAME: model_version})
+        # Partitions lues verrouillées (ordre fixe) : aucune compaction en cours ne retire un fichier
+        partitions = sorted(os.path.relpath(path, self.root)
+                            for path in glob.glob(os.path.join(self.root, "date=*", "model_version=*"))
+                            if str(start) <= os.path.basename(os.path.dirname(path))[len("date="):] <= str(end))
+        with ExitStack() as locks, metrics.stage("archive_read") as stage:
+            for partition in partitions:
+                locks.enter_context(file_lock(self._lock_path(partition)))
+            dataset = ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+            table = dataset.to_table(columns=columns, filter=expr)
+            stage.rows = table.num_rows
+        df = table.to_pandas()
+        return df.sort_values(["timestamp", "T1"], kind="stable").reset_index(drop=True)
+
+
+prediction_archive = PredictionArchive()
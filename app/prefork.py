@@ -0,0 +1,97 @@
+"""
+Préchargement : dans le processus maître avant le fork des workers (gunicorn `preload_app`),
+ou en arrière-plan une fois le port ouvert (`BackgroundWarmUp`, démarrage à froid rapide).
+
+Tout ce qui est chargé ici (bibliothèques, modèles MLflow, historique de consommation)
+est partagé en copie sur écriture par les workers au lieu d'être dupliqué dans chacun.
+Le stock Parquet eCO2mix est lu en mémoire mappée : ses pages restent dans le cache
+du noyau, communes à tous les processus.
+"""
+import gc
+import time
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """
+    Charge modèles, stock eCO2mix et historique une seule fois (et donc les bibliothèques
+    lourdes : mlflow, pandas, pyarrow, XGBoost). Aucun thread n'est démarré ici : les
+    threads ne survivent pas au fork.
+    """
+    from app.model import registry
+    from app.utils import refresh_eCO2mix_store, sync_history
+
+    if not registry.is_loaded:
+        try:
+            registry.refresh()
+        except Exception as e:
+            logger.error(f"❌ Préchargement des modèles impossible, chaque worker les chargera : {e}")
+    try:
+        sync_history(refresh_eCO2mix_store(date.today() + timedelta(days=7)))
+    except Exception as e:
+        logger.warning(f"⚠️ Préchargement des données impossible : {e}")
+
+
+def freeze_heap() -> None:
+    """
+    Range les objets déjà créés hors du ramasse-miettes : ses passages ne réécrivent
+    plus leurs en-têtes dans les workers, et leurs pages restent partagées.
+    """
+    gc.collect()
+    gc.freeze()
+    logger.info(f"🧊 {gc.get_freeze_count()} objets figés avant fork")
+
+
+class BackgroundWarmUp:
+    """
+    Exécute `steps` dans un thread de fond, une seule fois, et expose son état.
+
+    L'API démarre sans rien charger de lourd : le port s'ouvre tout de suite, `/health/live`
+    répond, et `/health/ready` passe à 200 quand le préchauffage est terminé.
+
+    Args:
+        steps (Callable[[], None]): Travail de préchauffage (par défaut `warm_up`).
+    """
+
+    def __init__(self, steps: Callable[[], None] = warm_up):
+        self.steps = steps
+        self.state = "pending"  # pending -> running -> done | failed
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        try:
+            self.steps()
+            self.state = "done"
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            logger.error(f"❌ Préchauffage interrompu : {e}")
+        self.duration = time.perf_counter() - start
+        logger.info(f"🔥 Préchauffage {self.state} en {self.duration:.2f}s")
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    def stats(self) -> dict:
+        return {"state": self.state, "duration_s": self.duration, "error": self.error}
@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR") or None
+
+CacheKey = Tuple[str, str, str, Tuple[Tuple[str, str], ...]]
+Entry = Tuple[List[float], np.ndarray]  # (prédictions, horodatages datetime64[s] des lignes prédites)
+
+# Coût mémoire approximatif d'une entrée : liste Python de floats, horodatages + clé
+_FLOAT_BYTES = 32
+_TIMESTAMP_BYTES = 8
+_ENTRY_OVERHEAD = 512
+
+
+def make_cache_key(T1, T2, data_version: str, model_versions: Dict[str, str]) -> CacheKey:
+    """
+    Clé (période, empreinte des données eCO2mix, versions MLflow résolues).
+    """
+    return str(T1), str(T2), data_version or "", tuple(sorted(model_versions.items()))
+
+
+class PredictionCache:
+    """
+    Cache LRU des résultats de prédiction, borné en mémoire, avec persistance disque optionnelle.
+
+    Les entrées sont indexées par `make_cache_key` : dès que les données ou l'alias
+    `prod` changent, la clé change. Les entrées devenues obsolètes sont purgées par
+    `retain` pour libérer la mémoire sans attendre l'éviction LRU.
+    """
+
+    def __init__(self, max_bytes: int = PREDICTION_CACHE_MAX_BYTES, persist_dir: Optional[str] = PREDICTION_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.persist_dir = persist_dir
+        self._entries: "OrderedDict[CacheKey, Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._retained: Optional[tuple] = None
+        if persist_dir:
+            self._load()
+
+    @staticmethod
+    def _size(entry: Entry) -> int:
+        return _ENTRY_OVERHEAD + (_FLOAT_BYTES + _TIMESTAMP_BYTES) * len(entry[0])
+
+    @staticmethod
+    def _file_name(key: CacheKey) -> str:
+        return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest() + ".json"
+
+    def _load(self) -> None:
+        os.makedirs(self.persist_dir, exist_ok=True)
+        paths = [os.path.join(self.persist_dir, n) for n in os.listdir(self.persist_dir) if n.endswith(".json")]
+        dropped = []
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                key = (entry["key"][0], entry["key"][1], entry["key"][2], tuple(map(tuple, entry["key"][3])))
+                timestamps = np.asarray(entry["timestamps"], dtype="datetime64[s]")
+                timestamps.setflags(write=False)
+                dropped += self._insert(key, (entry["predictions"], timestamps))[1]
+            except (ValueError, KeyError, IndexError):  # Fichier illisible ou d'un format antérieur
+                os.remove(path)
+        self._unlink(dropped)
+
+    def _persist(self, key: CacheKey, entry: Entry) -> None:
+        path = os.path.join(self.persist_dir, self._file_name(key))
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        predictions, timestamps = entry
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "predictions": predictions, "timestamps": timestamps.astype(str).tolist()}, f)
+        os.replace(tmp_path, path)
+
+    def _unlink(self, keys: List[CacheKey]) -> None:
+        if not self.persist_dir:
+            return
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.persist_dir, self._file_name(key)))
+            except FileNotFoundError:
+                pass
+
+    def _drop(self, key: CacheKey) -> None:
+        self._bytes -= self._size(self._entries.pop(key))
+
+    def _insert(self, key: CacheKey, entry: Entry) -> Tuple[bool, List[CacheKey]]:
+        # En mémoire seulement (sous le verrou) : renvoie (entrée gardée, clés évincées)
+        size = self._size(entry)
+        if size > self.max_bytes:
+            return False, []
+        if key in self._entries:
+            self._drop(key)
+        evicted = []
+        while self._entries and self._bytes + size > self.max_bytes:
+            evicted.append(next(iter(self._entries)))
+            self._drop(evicted[-1])
+            self._stats["evictions"] += 1
+        self._entries[key] = entry
+        self._bytes += size
+        return True, evicted
+
+    def get(self, key: CacheKey) -> Optional[Entry]:
+        """
+        Returns:
+            Optional[Entry]: (copie des prédictions, horodatages en lecture seule), ou None si
+            la clé est absente. L'appelant peut modifier la liste sans altérer le cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        predictions, timestamps = entry
+        return list(predictions), timestamps
+
+    def put(self, key: CacheKey, predictions: List[float], timestamps) -> None:
+        """
+        Ajoute une entrée. Écriture et suppression des fichiers de persistance hors du verrou :
+        une écriture disque ne bloque ni les lectures ni les ajouts des autres threads.
+        """
+        timestamps = np.array(timestamps, dtype="datetime64[s]")
+        timestamps.setflags(write=False)
+        entry = (list(predictions), timestamps)
+        with self._lock:
+            stored, evicted = self._insert(key, entry)
+        if not self.persist_dir:
+            return
+        self._unlink(evicted)
+        if stored:
+            self._persist(key, entry)
+            with self._lock:
+                gone = key not in self._entries  # Évincée ou invalidée pendant l'écriture
+            if gone:
+                self._unlink([key])
+
+    def retain(self, data_version: str, model_versions: Dict[str, str]) -> int:
+        """
+        Supprime les entrées calculées sur d'autres données ou d'autres modèles.
+
+        Returns:
+            int: Nombre d'entrées supprimées.
+        """
+        versions = tuple(sorted(model_versions.items()))
+        with self._lock:
+            if self._retained == (data_version, versions):
+                return 0
+            self._retained = (data_version, versions)
+            stale = [k for k in self._entries if k[2] != (data_version or "") or k[3] != versions]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidations"] += len(stale)
+        self._unlink(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._entries)
+            for key in keys:
+                self._drop(key)
+        self._unlink(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+
+prediction_cache = PredictionCache()
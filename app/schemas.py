@@ -1,9 +1,35 @@
+import os
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
+from typing import List, Literal, Optional
+
+# Durée maximale d'une période (jours), commune à l'API et au pipeline. Relevable par
+# l'environnement : au-delà de PREDICT_CHUNK_DAYS, la période est traitée par fenêtres
+# (voir `app.utils.predict_period`).
+MAX_DAYS = int(os.getenv("MAX_DAYS", 7))
 
 class PeriodInput(BaseModel):
     T1: date
     T2: date
 
 class PredictionOutput(BaseModel):
-    prediction: list
+    prediction: List[float]
+    timestamps: List[datetime]  # Datetime réel de chaque prédiction (lignes eCO2mix quart-horaires)
+
+class PredictionRow(BaseModel):
+    """Ligne des formats en flux (NDJSON, Arrow IPC)."""
+    timestamp: datetime
+    y_pred: float
+
+class BatchInput(BaseModel):
+    periods: List[PeriodInput]
+
+class ForecastScenario(BaseModel):
+    """Scénario de prévision : couleur TEMPO imposée sur tout l'horizon (None = calendrier connu)."""
+    name: str
+    tempo: Optional[Literal["BLEU", "BLANC", "ROUGE"]] = None
+
+class ForecastInput(BaseModel):
+    T1: date
+    T2: date
+    scenarios: Optional[List[ForecastScenario]] = None
@@ -0,0 +1,132 @@
+import io
+import math
+from datetime import date
+from functools import lru_cache
+from typing import Iterator, List, Optional
+
+import numpy as np
+from pydantic_core import to_json
+
+# === Formats de réponse négociés via l'en-tête Accept ===
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+FORMATS = [JSON, NDJSON, ARROW]  # Ordre de préférence quand le client accepte plusieurs formats
+
+STREAM_ROWS = 4096  # Lignes sérialisées par morceau envoyé
+
+
+@lru_cache(maxsize=1)
+def arrow_schema():
+    # pyarrow importé au premier flux Arrow, pas au démarrage de l'API
+    import pyarrow as pa
+
+    return pa.schema([("timestamp", pa.timestamp("s")), ("y_pred", pa.float64())])
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Choisit le format de réponse à partir de l'en-tête Accept (JSON par défaut).
+
+    Returns:
+        Optional[str]: Type MIME retenu, ou None si aucun format proposé n'est accepté (406).
+    """
+    if not accept:
+        return JSON
+    accepted = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(accepted):
+        if media_type in FORMATS:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+ROW_STEP = np.timedelta64(15, "m")  # Pas des lignes du stock eCO2mix : une prédiction par quart d'heure
+
+
+def row_timestamps(T1: date, n: int) -> np.ndarray:
+    """
+    Grille quart-horaire de `n` pas à partir de T1 à minuit. Repli seulement : le pipeline
+    renvoie le `Datetime` réel de chaque ligne prédite (lignes sans mesure, jours sans
+    couleur TEMPO et changements d'heure sautent des pas de cette grille).
+    """
+    return np.datetime64(T1, "s") + np.arange(n) * ROW_STEP
+
+
+def as_timestamps(values) -> np.ndarray:
+    """
+    Horodatages (colonne `Datetime`, chaînes ISO d'un payload) -> tableau datetime64[s].
+    """
+    return np.asarray(values, dtype="datetime64[s]")
+
+
+def payload_timestamps(payload: dict) -> np.ndarray:
+    """
+    Horodatages d'un payload d'effets de bord `{"T1", "timestamps", "predictions"}`, seule source
+    pour Kafka, l'archive et le monitoring. Un payload journalisé avant l'ajout de `timestamps`
+    retombe sur la grille `row_timestamps`.
+    """
+    if payload.get("timestamps") is not None:
+        return as_timestamps(payload["timestamps"])
+    return row_timestamps(date.fromisoformat(str(payload["T1"])), len(payload["predictions"]))
+
+
+def iter_ndjson(timestamps: np.ndarray, predictions: List[float], chunk_rows: int = STREAM_ROWS) -> Iterator[bytes]:
+    """
+    Lignes `{"timestamp": ..., "y_pred": ...}` produites par morceaux, sans DataFrame intermédiaire.
+    Une prédiction non finie (NaN, ±inf) est écrite `null`, comme dans le corps JSON.
+    """
+    timestamps = as_timestamps(timestamps)
+    for start in range(0, len(predictions), chunk_rows):
+        end = start + chunk_rows
+        rows = zip(timestamps[start:end].astype(str).tolist(), predictions[start:end])
+        yield "".join(f'{{"timestamp": "{ts}", "y_pred": {repr(y) if math.isfinite(y) else "null"}}}\n'
+                      for ts, y in rows).encode("utf-8")
+
+
+def iter_arrow_ipc(timestamps: np.ndarray, predictions: List[float], chunk_rows: int = STREAM_ROWS) -> Iterator[bytes]:
+    """
+    Flux Arrow IPC (format « stream ») : schéma, un record batch par morceau, puis fin de flux.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    timestamps = as_timestamps(timestamps)
+    values = np.asarray(predictions, dtype=np.float64)
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for start in range(0, len(values), chunk_rows):
+            end = start + chunk_rows
+            writer.write_batch(pa.record_batch([pa.array(timestamps[start:end]), pa.array(values[start:end])],
+                                               schema=schema))
+            yield drain()
+    yield drain()
+
+
+def json_body(timestamps: np.ndarray, predictions: List[float]) -> bytes:
+    """
+    Corps JSON `{"prediction": [...], "timestamps": [...]}` : les floats viennent de `ndarray.tolist()`,
+    une validation Pydantic élément par élément serait redondante. Sérialiseur de pydantic-core,
+    NaN et ±inf écrits `null` (JSON valide).
+    """
+    return to_json({"prediction": predictions, "timestamps": as_timestamps(timestamps).astype(str).tolist()},
+                   inf_nan_mode="null")
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SIDE_EFFECTS_DIR = os.getenv("SIDE_EFFECTS_DIR", "data/queue")
+SIDE_EFFECTS_MAX_PENDING = int(os.getenv("SIDE_EFFECTS_MAX_PENDING", 1000))
+SIDE_EFFECTS_BATCH_SIZE = int(os.getenv("SIDE_EFFECTS_BATCH_SIZE", 50))
+SIDE_EFFECTS_BATCH_WAIT = float(os.getenv("SIDE_EFFECTS_BATCH_WAIT", 1.0))
+SIDE_EFFECTS_MAX_RETRIES = int(os.getenv("SIDE_EFFECTS_MAX_RETRIES", 5))
+
+
+class SideEffectQueue:
+    """
+    File de travail durable, en processus, pour les effets de bord post-prédiction.
+
+    Chaque tâche est écrite dans `journal_dir/<pid>` avant d'être mise en file puis supprimée
+    une fois traitée : au redémarrage, les tâches non terminées sont rejouées. Avec plusieurs
+    workers, chaque processus a son propre sous-dossier et ne reprend que ceux des processus
+    terminés (renommage atomique : une tâche n'est rejouée que par un seul worker).
+    Un thread unique regroupe les tâches par lots, appelle un handler par type
+    (dans l'ordre d'enregistrement des handlers) et relance les échecs avec un
+    backoff exponentiel. La file est bornée : quand elle est pleine, `submit`
+    attend au plus `put_timeout` secondes puis rejette la tâche.
+
+    Args:
+        handlers (Dict[str, Callable]): Type de tâche -> fonction recevant la liste des payloads du lot.
+        journal_dir (str): Dossier du journal des tâches en attente (None : pas de durabilité).
+    """
+
+    def __init__(self,
+                 handlers: Dict[str, Callable[[List[dict]], None]],
+                 journal_dir: Optional[str] = SIDE_EFFECTS_DIR,
+                 max_pending: int = SIDE_EFFECTS_MAX_PENDING,
+                 batch_size: int = SIDE_EFFECTS_BATCH_SIZE,
+                 batch_wait: float = SIDE_EFFECTS_BATCH_WAIT,
+                 max_retries: int = SIDE_EFFECTS_MAX_RETRIES,
+                 backoff: float = 0.5,
+                 put_timeout: float = 0.1):
+        self.handlers = dict(handlers)
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.put_timeout = put_timeout
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "retried": 0, "failed": 0, "dropped": 0, "batches": 0}
+        self._replayed_pid: Optional[int] = None
+        self._replay_lock = threading.Lock()
+        self._replay_backlog: List[str] = []  # Tâches du journal pas encore mises en file
+        self._replay_partial = False
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, pending=self._queue.qsize())
+
+    def _own_dir(self) -> str:
+        # Calculé à l'usage : le pid change après un fork
+        return os.path.join(self.journal_dir, str(os.getpid()))
+
+    def _journal_path(self, task_id: str) -> str:
+        return os.path.join(self._own_dir(), f"{task_id}.json")
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _claim_orphans(self, own_dir: str) -> None:
+        # Tâches des processus terminés (et ancien format, à la racine du journal)
+        sources = [self.journal_dir]
+        for name in os.listdir(self.journal_dir):
+            path = os.path.join(self.journal_dir, name)
+            if name.isdigit() and path != own_dir and os.path.isdir(path) and not self._is_alive(int(name)):
+                sources.append(path)
+        for source in sources:
+            for name in os.listdir(source):
+                if name.endswith(".json"):
+                    try:
+                        os.rename(os.path.join(source, name), os.path.join(own_dir, name))
+                    except FileNotFoundError:
+                        pass  # Déjà repris par un autre worker
+            if source != self.journal_dir:
+                try:
+                    os.rmdir(source)
+                except OSError:
+                    pass
+
+    def _replay(self) -> None:
+        """
+        Met en file les tâches du journal (une fois par processus), puis, à chaque appel, celles
+        qui n'avaient pas trouvé de place lors d'une reprise partielle.
+        """
+        if not self.journal_dir:
+            return
+        with self._replay_lock:
+            if self._replayed_pid != os.getpid():
+                self._replayed_pid = os.getpid()
+                own_dir = self._own_dir()
+                os.makedirs(own_dir, exist_ok=True)
+                self._claim_orphans(own_dir)
+                # Les identifiants commencent par un horodatage : l'ordre alphabétique est l'ordre de soumission
+                self._replay_backlog = sorted(name for name in os.listdir(own_dir) if name.endswith(".json"))
+            self._enqueue_backlog()
+
+    def _enqueue_backlog(self) -> None:
+        # Appelé sous `_replay_lock`
+        own_dir = self._own_dir()
+        while self._replay_backlog:
+            path = os.path.join(own_dir, self._replay_backlog[0])
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    task = json.load(f)
+            except FileNotFoundError:
+                self._replay_backlog.pop(0)
+                continue
+            except ValueError:
+                os.remove(path)
+                self._replay_backlog.pop(0)
+                continue
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                if not self._replay_partial:
+                    self._replay_partial = True
+                    logger.warning(f"⚠️ Journal plus grand que la file : {len(self._replay_backlog)} tâches "
+                                   f"reprises quand la file se videra.")
+                return
+            self._replay_backlog.pop(0)
+        self._replay_partial = False
+
+    def submit(self, kind: str, payload: Union[dict, List[dict]]) -> bool:
+        """
+        Ajoute une tâche. Une liste de payloads forme une seule tâche (lot d'un appel à
+        `/predict/batch`) : une place dans la file, un seul fichier de journal.
+        Renvoie False si la file est pleine (tâche rejetée).
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Type de tâche inconnu : {kind}")
+        self._replay()  # Les tâches du journal passent avant les nouvelles
+        task = {"id": f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}", "kind": kind}
+        task["payloads" if isinstance(payload, list) else "payload"] = payload
+        if self.journal_dir:
+            tmp_path = self._journal_path(task["id"]) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(task, f)
+            os.replace(tmp_path, self._journal_path(task["id"]))
+        try:
+            self._queue.put(task, timeout=self.put_timeout)
+        except queue.Full:
+            self._forget(task)
+            self._count("dropped")
+            logger.warning(f"⚠️ File d'effets de bord pleine, tâche '{kind}' rejetée.")
+            return False
+        self._count("submitted")
+        return True
+
+    def _forget(self, task: dict) -> None:
+        if self.journal_dir:
+            try:
+                os.remove(self._journal_path(task["id"]))
+            except FileNotFoundError:
+                pass
+
+    def _next_batch(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_handler(self, kind: str, tasks: List[dict]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                payloads = [p for t in tasks for p in t.get("payloads", [t.get("payload")])]
+                with metrics.stage(f"side_effect_{kind}") as stage:
+                    stage.rows = len(payloads)
+                    self.handlers[kind](payloads)
+                self._count("completed", len(tasks))
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count("failed", len(tasks))
+                    logger.error(f"❌ Effet de bord '{kind}' abandonné après {attempt + 1} essais : {e}")
+                    break
+                self._count("retried")
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"⚠️ Effet de bord '{kind}' en échec ({e}), nouvel essai dans {delay:.1f}s")
+                if self._stop.wait(delay):
+                    # Arrêt demandé : la tâche reste dans le journal pour le prochain démarrage
+                    return
+        for task in tasks:
+            self._forget(task)
+
+    def process_batch(self, batch: List[dict]) -> None:
+        self._count("batches")
+        by_kind: Dict[str, List[dict]] = {}
+        for task in batch:
+            by_kind.setdefault(task["kind"], []).append(task)
+        for kind in self.handlers:
+            if kind in by_kind:
+                self._run_handler(kind, by_kind[kind])
+
+    def drain(self) -> None:
+        """
+        Traite immédiatement tout ce qui est en file (tests, arrêt propre).
+        """
+        while True:
+            self._replay()
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self.process_batch(batch)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self.process_batch(batch)
+            if self._replay_backlog:
+                self._replay()
+
+    def start(self) -> None:
+        """
+        Rejoue les tâches restées dans le journal puis démarre le thread de traitement.
+        """
+        self._replay()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._work, name="side-effects", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+# === Handlers post-prédiction ===
+
+def store_predictions(payloads: List[dict], archive=None, client=None, bucket: Optional[str] = None) -> None:
+    """
+    Ajoute les prédictions du lot à l'archive Parquet (ajout seul, partitionnée par jour et
+    version du modèle), puis envoie les nouveaux fichiers sur MinIO si un bucket est configuré.
+    """
+    from app.prediction_archive import prediction_archive
+
+    archive = archive or prediction_archive
+    bucket = bucket or os.getenv("MINIO_BUCKET")
+    if client is None and bucket:
+        from app.utils import get_s3_client
+
+        client = get_s3_client()
+    archive.store(payloads, client, bucket)
+
+
+def publish_predictions(payloads: List[dict], send: Callable[[dict], None] = None,
+                        flush: Callable[[], None] = None) -> None:
+    """
+    Publie chaque prédiction du lot sur Kafka, puis un seul flush pour tout le lot.
+    """
+    from app.kafka_publisher import publisher
+
+    send, flush = send or publisher.publish, flush or publisher.flush
+    for payload in payloads:
+        send(payload)
+    flush()
+
+
+def run_monitoring(payloads: List[dict], service=None) -> None:
+    """
+    Ajoute les prédictions du lot au service de monitoring (estimateur NannyML gardé en mémoire).
+    """
+    from app.serialization import payload_timestamps
+    from monitoring.service import monitoring_service
+
+    service = service or monitoring_service
+    for payload in payloads:
+        service.observe(payload_timestamps(payload), payload["predictions"])
+
+
+def build_side_effect_queue(**kwargs) -> SideEffectQueue:
+    # Ordre des handlers = ordre d'exécution dans un lot
+    return SideEffectQueue({
+        "store": store_predictions,
+        "publish": publish_predictions,
+        "monitor": run_monitoring,
+    }, **kwargs)
+
+
+side_effects = build_side_effect_queue()
+
+
+def submit_prediction_side_effects(items: List[Tuple[date, Sequence, list]], versions: dict) -> None:
+    """
+    Met en file le stockage, la publication et le monitoring des prédictions `(T1, timestamps, predictions)`
+    d'un appel : une tâche par handler pour tout le lot, et non par période. Les horodatages
+    réels des lignes prédites voyagent dans le payload (chaînes ISO, journal JSON).
+    """
+    from app.serialization import as_timestamps
+
+    payloads = [{"T1": str(T1), "timestamps": as_timestamps(timestamps).astype(str).tolist(),
+                 "predictions": predictions, "model_versions": versions} for T1, timestamps, predictions in items]
+    if not payloads:
+        return
+    for kind in ("store", "publish", "monitor"):
+        side_effects.submit(kind, payloads[0] if len(payloads) == 1 else payloads)
@@ -1,155 +1,552 @@
 import os
-import json
+import numpy as np
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from dotenv import load_dotenv
 import logging
-import boto3
-from botocore.client import Config
+import threading
 
 # Import modules métier
 from core.data_preprocessing import (
     fetch_eCO2mix_data,
-    convert_all_xls_eCO2mix_data,
-    concat_eCO2mix_annual_data,
-    concat_eCO2mix_tempo_data,
-    preprocess_annual_data,
-    preprocess_tempo_data,
-    merge_eCO2mix_data,
-    preprocess_eCO2mix_data,
-    preprocess_eCO2mix_data_engineered,
-    split_features_target
-)
-from core.features_engineering import (
-    create_date_features,
-    create_hour_features,
-    create_lag_features,
-    create_rolling_features,
+    build_eCO2mix_dataset,
 )
+from core.columnar_store import EcO2mixStore, get_eco2mix_store
+from core.features_engineering import FeaturePipeline
+from core.forecasting import RecursiveForecaster
+from core.history_buffer import HistoryBuffer
+from core.tempo_calendar import TEMPO_COLORS, TempoCalendar, get_tempo_calendar, tempo_seasons, tempo_url
+from core.metrics import metrics
+from app.model import registry, LoadedModels
+from app.result_cache import make_cache_key, prediction_cache
+from app.schemas import MAX_DAYS
+from app.serialization import as_timestamps
 
 logger = logging.getLogger(__name__)
 
 # Chargement des variables d'environnement
 load_dotenv()
 
-# === Config Kafka ===
-KAFKA_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
-KAFKA_TOPIC = os.getenv("KAFKA_TOPIC")
-
-producer = None
-
-def send_to_kafka(payload: dict):
-    global producer
-    try:
-        if producer is None:
-            from kafka import KafkaProducer
-            producer = KafkaProducer(
-                bootstrap_servers=KAFKA_SERVERS,
-                value_serializer=lambda v: json.dumps(v).encode("utf-8")
-            )
-        producer.send(KAFKA_TOPIC, payload)
-    except Exception as e:
-        print(f"[WARNING] Kafka not available. Skipping send. Error: {e}")
-
-# === Upload predictions to MinIO ===
-
-def upload_predictions_to_minio(local_path: str, object_name: str):
-    """
-    Upload un fichier local vers un bucket MinIO.
-    """
-    try:
-        minio_endpoint = os.getenv("MINIO_ENDPOINT")
-        minio_key = os.getenv("MINIO_ACCESS_KEY")
-        minio_secret = os.getenv("MINIO_SECRET_KEY")
-        bucket = os.getenv("MINIO_BUCKET")
-
-        s3 = boto3.client(
-            's3',
-            endpoint_url=minio_endpoint,
-            aws_access_key_id=minio_key,
-            aws_secret_access_key=minio_secret,
-            config=Config(signature_version='s3v4'),
-            region_name='us-east-1',
-        )
-        s3.upload_file(local_path, bucket, object_name)
-        logger.info(f"✅ Fichier '{object_name}' envoyé sur MinIO ({bucket})")
-    except Exception as e:
-        logger.error(f"❌ Erreur lors de l’upload MinIO : {e}")
+# Définition unique des features, partagée entre entraînement et service
+FEATURE_PIPELINE = FeaturePipeline(target="Consommation", lags=[1, 2, 3], window=3)
+
+# Historique récent de la cible : lags et moyenne mobile des premières lignes de chaque période
+HISTORY = HistoryBuffer()
+
+# Nombre maximal de périodes traitées en une passe par `/predict/batch`
+BATCH_CHUNK_PERIODS = int(os.getenv("BATCH_CHUNK_PERIODS", 256))
+
+# Longues périodes : fenêtres de PREDICT_CHUNK_DAYS jours, traitées une à une (mémoire
+# bornée) ou réparties sur PREDICT_CHUNK_PROCESSES processus (0 : dans le processus courant).
+# Usage hors ligne uniquement : forker un processus qui a d'autres threads (pool de l'API,
+# threads XGBoost/OpenMP ou pyarrow) peut bloquer l'enfant sur un verrou jamais relâché ;
+# avec plusieurs threads actifs, les fenêtres restent dans le processus courant.
+PREDICT_CHUNK_DAYS = int(os.getenv("PREDICT_CHUNK_DAYS", 7))
+PREDICT_CHUNK_PROCESSES = int(os.getenv("PREDICT_CHUNK_PROCESSES", 0))
+
+# Prévision récursive : pas (celui des données) et nombre maximal de pas depuis la dernière mesure.
+# Dérivé de MAX_DAYS : une période maximale (T2 inclus, soit MAX_DAYS + 1 jours) qui commence
+# le lendemain de la dernière mesure publiée tient dans l'horizon.
+FORECAST_STEP_MINUTES = int(os.getenv("FORECAST_STEP_MINUTES", 15))
+FORECAST_MAX_STEPS = (MAX_DAYS + 2) * 24 * 60 // FORECAST_STEP_MINUTES
+
+# Premier jour dont la couleur TEMPO est récupérée (rattrapage sur plusieurs saisons),
+# sinon le 1er janvier de l'année en cours (début du fichier eCO2mix temps réel)
+TEMPO_BACKFILL_START = os.getenv("TEMPO_BACKFILL_START")
+
+# === Client MinIO (archive des prédictions) ===
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    Client S3 (MinIO) partagé par le processus : pool de connexions réutilisé entre uploads.
+    boto3 est importé ici, au premier upload, et non au démarrage de l'API.
+    """
+    import boto3
+    from botocore.client import Config
+
+    return boto3.client(
+        's3',
+        endpoint_url=os.getenv("MINIO_ENDPOINT"),
+        aws_access_key_id=os.getenv("MINIO_ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("MINIO_SECRET_KEY"),
+        config=Config(signature_version='s3v4', max_pool_connections=10),
+        region_name='us-east-1',
+    )
+
+
+if hasattr(os, "register_at_fork"):
+    # Client boto3 (pool de connexions) recréé dans chaque worker forké
+    os.register_at_fork(after_in_child=get_s3_client.cache_clear)
+
+
 # === MLOps logique ===
 
-def get_data_between_dates(T1: date, T2: date) -> pd.DataFrame:
+def validate_period(T1: date, T2: date) -> None:
     """
-    Récupère les données brutes de consommation + tempo entre T1 et T2.
-    Applique les étapes de téléchargement, conversion, nettoyage, fusion et filtrage temporel.
+    Vérifie la période demandée (T1 ≥ aujourd'hui, au plus MAX_DAYS jours).
     """
-    # Validation des dates
     today = date.today()
     if T1 < today:
         raise ValueError(f"T1 doit être ≥ aujourd’hui ({today})")
-    if (T2 - T1).days > 7:
-        raise ValueError("La période demandée ne doit pas dépasser 7 jours.")
-    
-    # Construction dynamique de l'URL tempo
-    tempo_season = f"{T2.year - 1}-{T2.year}"
-    tempo_url = f"https://eco2mix.rte-france.com/curves/downloadCalendrierTempo?season={tempo_season}"
+    if (T2 - T1).days > MAX_DAYS:
+        raise ValueError(f"La période demandée ne doit pas dépasser {MAX_DAYS} jours.")
+
+
+def required_tempo_seasons(T2: date, calendar: TempoCalendar = None) -> List[str]:
+    """
+    Saisons TEMPO à télécharger pour couvrir les données jusqu'à T2. Une saison terminée dont
+    tous les jours sont déjà dans le calendrier persistant n'est plus demandée à RTE.
+    """
+    today = date.today()
+    start = date.fromisoformat(TEMPO_BACKFILL_START) if TEMPO_BACKFILL_START else date(today.year, 1, 1)
+    # Couleur publiée au plus tard la veille : pas de saison au-delà de demain
+    seasons = tempo_seasons(min(start, today), min(T2, today + timedelta(days=1)))
+    if calendar is None:
+        return seasons
+    needed = []
+    for season in seasons:
+        first, last = date(int(season[:4]), 9, 1), date(int(season[5:]), 8, 31)
+        if last >= today or not calendar.covers(first, last):
+            needed.append(season)
+    return needed
+
+
+def refresh_eCO2mix_store(T2: date) -> EcO2mixStore:
+    """
+    Met à jour les fichiers RTE (cache conditionnel) puis le stock Parquet s'ils ont changé.
+    Sans changement, aucun accès réseau ni reconstruction : seulement quelques `stat`.
+    """
+    # Toutes les saisons TEMPO utiles (une fenêtre peut traverser le 1er septembre), en parallèle
+    calendar = get_tempo_calendar()
+    tempo_urls = [tempo_url(season) for season in required_tempo_seasons(T2, calendar)]
     annual_url = "https://eco2mix.rte-france.com/download/eco2mix/eCO2mix_RTE_En-cours-TR.zip"
 
-    # Étape 1 : Télécharger les fichiers zip depuis RTE
-    fetch_eCO2mix_data(destination_folder="./data/01_raw", 
-                       tempo_url=tempo_url, 
-                       annual_url=annual_url)
+    # Étape 1 : Télécharger les fichiers zip depuis RTE (cache conditionnel local)
+    with metrics.stage("fetch"):
+        fetch_eCO2mix_data(destination_folder="./data/01_raw", 
+                           tempo_url=tempo_urls, 
+                           annual_url=annual_url)
+
+    # Étapes 2 à 5 : conversion, concaténation, fusion et nettoyage,
+    # uniquement si les fichiers bruts ont changé depuis la dernière construction.
+    # Le calendrier TEMPO est complété au passage et conservé sur disque.
+    store = get_eco2mix_store(raw_folder="./data/01_raw")
 
-    # Étape 2 : Convertir tous les fichiers .xls téléchargés en .csv propres
-    convert_all_xls_eCO2mix_data(xls_path="./data/01_raw", csv_path="./data/02_external")
+    def build() -> pd.DataFrame:
+        merged = build_eCO2mix_dataset(xls_path="./data/01_raw", calendar=calendar)
+        calendar.save()
+        return merged
 
-    # Étape 3 : Concaténer et prétraiter les fichiers annual et tempo
-    annual_data = concat_eCO2mix_annual_data("./data/02_external")
-    tempo_data = concat_eCO2mix_tempo_data("./data/02_external")
+    with metrics.stage("store_ensure"):
+        store.ensure(build)
+    return store
 
-    annual_cleaned = preprocess_annual_data(annual_data)
-    tempo_cleaned = preprocess_tempo_data(tempo_data)
 
-    # Étape 4 : Fusion des deux sources
-    merged = merge_eCO2mix_data(annual_cleaned, tempo_cleaned)
+def get_data_between_dates(T1: date, T2: date) -> pd.DataFrame:
+    """
+    Récupère les données brutes de consommation + tempo entre T1 et T2.
+    Applique les étapes de téléchargement, conversion, nettoyage, fusion et filtrage temporel.
+    """
+    validate_period(T1, T2)
+    store = refresh_eCO2mix_store(T2)
+
+    # Étape 6 : Lecture des seules partitions qui recouvrent T1–T2
+    return store.read_between(T1, T2)
+
 
-    # Étape 5 : Nettoyage post-fusion
-    preprocessed = preprocess_eCO2mix_data(merged)
+def sync_history(store: EcO2mixStore, history: HistoryBuffer = None) -> HistoryBuffer:
+    """
+    Ajoute au tampon d'historique les lignes arrivées depuis la dernière synchronisation.
+    Ne relit que le dernier jour déjà connu (révisions) et les jours suivants.
+    """
+    history = history or HISTORY
+    if history.version == store.version:
+        return history
+    manifest = store.manifest() or {}
+    if not manifest.get("max_date"):
+        return history
+    end = pd.Timestamp(manifest["max_date"]).date()
+    last = history.last_timestamp
+    start = last.date() - timedelta(days=1) if last is not None else end - timedelta(days=history.capacity // 96 + 1)
+    df = store.read_between(start, end)
+    with metrics.stage("history_sync") as stage:
+        history.append(df['Datetime'].to_numpy(), pd.to_numeric(df['Consommation'], errors='coerce'))
+        stage.rows = len(df)
+    history.version = store.version
+    logger.info(f"🕒 Historique synchronisé jusqu'à {history.last_timestamp} ({len(history)} lignes)")
+    return history
 
-    # Étape 6 : Filtrage sur la période T1–T2
-    mask = (preprocessed["Date"] >= pd.to_datetime(T1)) & (preprocessed["Date"] <= pd.to_datetime(T2))
-    filtered = preprocessed.loc[mask].copy()
 
-    return filtered
+def history_before(timestamp, history: HistoryBuffer = None) -> np.ndarray:
+    """
+    Les `history_rows` valeurs de consommation qui précèdent `timestamp`.
+    """
+    return (history or HISTORY).before(timestamp, FEATURE_PIPELINE.history_rows)
 
 
-def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess_data(df: pd.DataFrame, history=None, as_array: bool = False, with_datetimes: bool = False):
     """
     Applique les étapes de feature engineering et nettoyage avancé sur le dataframe filtré.
+    Un seul tri et une seule allocation de la matrice finale (voir `FeaturePipeline`).
+    Avec `history`, les lags des premières lignes viennent de l'historique : aucune ligne perdue.
+    Avec `as_array`, matrice float64 contiguë au lieu d'un DataFrame (moteur natif).
+    Avec `with_datetimes`, renvoie (X, Datetime de chaque ligne de X).
     """
-    df = create_date_features(df, "Date")
-    df = create_hour_features(df)
-    df = create_lag_features(df, target_column="Consommation", lags=[1, 2, 3])
-    df = create_rolling_features(df, target_column="Consommation", window=3)
-    df = preprocess_eCO2mix_data_engineered(df)
+    with metrics.stage("features") as stage:
+        if as_array:
+            result = FEATURE_PIPELINE.transform_array(df, history=history, with_datetimes=with_datetimes)
+        else:
+            result = FEATURE_PIPELINE.transform(df, history=history, with_datetimes=with_datetimes)
+        stage.rows = len(result[0] if with_datetimes else result)
+    return result
 
-    # Séparer les features de la cible
-    X, _ = split_features_target(df, target="Consommation")
-    return X
 
-
-def scale_data(X: pd.DataFrame) -> pd.DataFrame:
+def scale_data(X: pd.DataFrame, models: LoadedModels = None) -> pd.DataFrame:
     """
     Applique le modèle Scaler loggé dans MLflow pour transformer X.
+    Le scaler provient du cache `registry` : aucun appel MLflow sur le chemin de la requête.
     """
-    scaler = load_model_by_alias("Scaler_standard", "prod")
-    X_scaled = scaler.predict(X)
+    models = models or registry.current
+    with metrics.stage("scale") as stage:
+        stage.rows = len(X)
+        X_scaled = models.scaler.predict(X)
     return pd.DataFrame(X_scaled, columns=X.columns)
 
 
-def predict_with_model(X_scaled: pd.DataFrame) -> list:
+def predict_with_model(X_scaled: pd.DataFrame, models: LoadedModels = None) -> list:
     """
     Applique le modèle XGBoost loggé dans MLflow pour prédire les valeurs cibles.
     """
-    model = load_model_by_alias("EnergyForecastModel_xgboost", "prod")
-    y_pred = model.predict(X_scaled)
+    models = models or registry.current
+    with metrics.stage("predict") as stage:
+        stage.rows = len(X_scaled)
+        y_pred = models.model.predict(X_scaled)
     return y_pred.tolist()
+
+
+def run_inference(X, models: LoadedModels = None) -> np.ndarray:
+    """
+    Scaler puis modèle : moteur natif de l'instantané s'il en a un, sinon chemin pyfunc.
+    Une matrice NumPy (`preprocess_data(..., as_array=True)`) est standardisée en place.
+    """
+    models = models or registry.current
+    if models.native is None:
+        X_scaled = scale_data(X, models)
+        with metrics.stage("predict") as stage:
+            stage.rows = len(X_scaled)
+            return np.asarray(models.model.predict(X_scaled))
+    with metrics.stage("native_predict") as stage:
+        stage.rows = len(X)
+        return models.native.predict(X, overwrite=isinstance(X, np.ndarray))
+
+
+# === Inférence par fenêtres (longues périodes) ===
+
+def prediction_windows(T1: date, T2: date, chunk_days: Optional[int] = None) -> List[Tuple[date, date]]:
+    """
+    Découpe T1–T2 (inclus) en fenêtres consécutives de `chunk_days` jours au plus
+    (par défaut PREDICT_CHUNK_DAYS).
+    """
+    chunk_days = max(1, chunk_days or PREDICT_CHUNK_DAYS)
+    windows, start = [], T1
+    while start <= T2:
+        end = min(start + timedelta(days=chunk_days - 1), T2)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+
+def predict_window(store: EcO2mixStore, T1: date, T2: date, models: LoadedModels,
+                   history: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prédictions de T1–T2 (inclus), avec l'horodatage (`Datetime`) de chaque ligne prédite.
+    Sans `history`, la lecture déborde sur les jours précédents juste assez pour les lags
+    et la moyenne mobile des premières lignes : chaque fenêtre se suffit à elle-même et
+    peut être traitée dans un autre processus.
+    """
+    if history is None:
+        overlap = -(-FEATURE_PIPELINE.history_rows // 96)  # Lignes quart-horaires : 96 par jour
+        df = store.read_between(T1 - timedelta(days=overlap), T2)
+        before = (df['Date'] < pd.Timestamp(T1)).to_numpy()
+        target = pd.to_numeric(df[FEATURE_PIPELINE.target][before], errors='coerce').to_numpy(dtype=float)
+        history = target[-FEATURE_PIPELINE.history_rows:]
+        df = df[~before]
+    X, datetimes = preprocess_data(df, history, as_array=models.native is not None, with_datetimes=True)
+    return run_inference(X, models), as_timestamps(datetimes)
+
+
+_worker_models: Optional[LoadedModels] = None  # Défini dans les processus du pool de `predict_period` seulement
+
+
+def _init_window_worker(models: LoadedModels) -> None:
+    # Initialiseur du pool : modèles reçus par fork (arguments hérités, pas de sérialisation)
+    global _worker_models
+    _worker_models = models
+
+
+def _predict_window_in_worker(root: str, raw_folder: str, T1: date, T2: date) -> Tuple[np.ndarray, np.ndarray]:
+    return predict_window(EcO2mixStore(root, raw_folder), T1, T2, _worker_models)
+
+
+def predict_period(store: EcO2mixStore, T1: date, T2: date, models: LoadedModels,
+                   processes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prédictions de T1–T2, fenêtre par fenêtre (`prediction_windows`) puis mises bout à bout,
+    avec l'horodatage de chaque ligne prédite (voir `predict_window`).
+
+    Seule la fenêtre courante est en mémoire : le pic de mémoire ne dépend pas de la longueur
+    de la période. La première fenêtre prend son historique dans `HISTORY`, les suivantes le
+    relisent dans le stock : résultats identiques à un traitement d'un seul tenant.
+
+    Args:
+        processes (int): Fenêtres suivantes réparties sur ce nombre de processus (fork, les
+            modèles sont hérités sans sérialisation). 0 : dans le processus courant.
+            Par défaut PREDICT_CHUNK_PROCESSES. Ignoré si le processus a plusieurs threads
+            (API) : voir PREDICT_CHUNK_PROCESSES.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    windows = prediction_windows(T1, T2)
+    first_T1, first_T2 = windows[0]
+    df = store.read_between(first_T1, first_T2)
+    history = history_before(df['Datetime'].min(), sync_history(store)) if len(df) else None
+    X, datetimes = preprocess_data(df, history, as_array=models.native is not None, with_datetimes=True)
+    del df
+    parts = [(run_inference(X, models), as_timestamps(datetimes))]
+    del X
+    rest = windows[1:]
+    if rest:
+        logger.info(f"🧩 Période {T1} → {T2} traitée en {len(windows)} fenêtres de {PREDICT_CHUNK_DAYS} jours")
+    processes = PREDICT_CHUNK_PROCESSES if processes is None else processes
+    if rest and processes > 0 and threading.active_count() > 1:
+        logger.warning(f"⚠️ {threading.active_count()} threads actifs : fenêtres traitées sans fork "
+                       f"(PREDICT_CHUNK_PROCESSES est réservé aux traitements hors ligne)")
+        processes = 0
+
+    if rest and processes > 0 and "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=min(processes, len(rest)),
+                                 mp_context=multiprocessing.get_context("fork"),
+                                 initializer=_init_window_worker, initargs=(models,)) as pool:
+            parts += pool.map(_predict_window_in_worker, [store.root] * len(rest),
+                              [store.raw_folder] * len(rest), *zip(*rest))
+    else:
+        parts += [predict_window(store, start, end, models) for start, end in rest]
+    if len(parts) == 1:
+        return parts[0]
+    predictions, timestamps = zip(*parts)
+    return np.concatenate(predictions), np.concatenate(timestamps)
+
+
+class PredictionResult(NamedTuple):
+    predictions: list
+    timestamps: np.ndarray  # datetime64[s] : Datetime réel de chaque ligne prédite
+    models: LoadedModels
+    cached: bool
+
+
+def run_prediction_pipeline(T1: date, T2: date, models: LoadedModels = None) -> PredictionResult:
+    """
+    Enchaîne récupération des données, features, scaler et modèle pour la période T1–T2.
+    Fonction bloquante : à exécuter hors de la boucle d'événements.
+
+    Le résultat est mis en cache sous la clé (T1, T2, empreinte des données, versions
+    des modèles) : une requête identique sur les mêmes données et modèles est servie
+    depuis la mémoire, et toute nouvelle donnée ou tout déplacement de l'alias invalide le cache.
+    Une période de plus de PREDICT_CHUNK_DAYS jours est traitée par fenêtres (`predict_period`).
+    """
+    validate_period(T1, T2)
+    store = refresh_eCO2mix_store(T2)
+    models = models or registry.current  # Un seul instantané pour le scaler et le modèle
+    prediction_cache.retain(store.version, models.versions)
+
+    key = make_cache_key(T1, T2, store.version, models.versions)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return PredictionResult(*cached, models, True)
+
+    predictions, timestamps = predict_period(store, T1, T2, models)
+    predictions = predictions.tolist()
+    prediction_cache.put(key, predictions, timestamps)
+    return PredictionResult(predictions, timestamps, models, False)
+
+
+class PeriodPrediction(NamedTuple):
+    T1: date
+    T2: date
+    predictions: list
+    timestamps: np.ndarray
+    cached: bool
+
+
+def _predict_periods(store: EcO2mixStore, periods: List[Tuple[date, date]],
+                     models: LoadedModels) -> List[Tuple[list, np.ndarray]]:
+    # Lecture unique de l'union des périodes, puis une ligne par (période, ligne source) :
+    # une seule passe de features, un seul scaler et un seul `predict` pour tout le lot.
+    data = store.read_between(min(T1 for T1, _ in periods), max(T2 for _, T2 in periods))
+    dates = data['Date'].to_numpy()
+    positions, groups = [], []
+    for i, (T1, T2) in enumerate(periods):
+        rows = np.flatnonzero((dates >= np.datetime64(T1)) & (dates <= np.datetime64(T2)))
+        positions.append(rows)
+        groups.append(np.full(len(rows), i))
+    stacked = data.take(np.concatenate(positions)).reset_index(drop=True)
+    history = sync_history(store)
+    datetimes = data['Datetime'].to_numpy()
+    histories = {i: history_before(datetimes[rows].min(), history) for i, rows in enumerate(positions) if len(rows)}
+
+    with metrics.stage("features") as stage:
+        X, row_groups, row_times = FEATURE_PIPELINE.transform_groups(stacked, np.concatenate(groups),
+                                                                     history=histories,
+                                                                     as_array=models.native is not None)
+        stage.rows = len(X)
+    predictions = run_inference(X, models)
+    row_times = as_timestamps(row_times)
+    # Lignes triées par groupe : découpage direct aux frontières
+    bounds = np.searchsorted(row_groups, np.arange(len(periods) + 1))
+    return [(predictions[bounds[i]:bounds[i + 1]].tolist(), row_times[bounds[i]:bounds[i + 1]])
+            for i in range(len(periods))]
+
+
+def run_batch_prediction_pipeline(periods: Iterable[Tuple[date, date]],
+                                  models: LoadedModels = None,
+                                  chunk_size: int = BATCH_CHUNK_PERIODS) -> Iterator[PeriodPrediction]:
+    """
+    Prédit une liste de périodes en un minimum de passes, résultats produits au fil de l'eau.
+
+    Les données sont rafraîchies une fois pour tout le lot. Les périodes déjà en cache sont
+    servies directement ; les autres sont traitées par paquets de `chunk_size` : lecture de
+    l'union des dates, features en une passe (sans lag d'une période à l'autre, résultats
+    identiques à `run_prediction_pipeline`), un seul appel au scaler et au modèle.
+    Générateur bloquant : seul le paquet courant est gardé en mémoire.
+
+    Args:
+        periods (Iterable[Tuple[date, date]]): Périodes (T1, T2), validées comme pour `/predict`.
+        models (LoadedModels): Instantané à utiliser (par défaut celui du registre), fixe pour tout le lot.
+        chunk_size (int): Nombre maximal de périodes par passe.
+
+    Yields:
+        PeriodPrediction: Une entrée par période, dans l'ordre de la liste.
+    """
+    periods = [(T1, T2) for T1, T2 in periods]
+    for T1, T2 in periods:
+        validate_period(T1, T2)
+    if not periods:
+        return
+    store = refresh_eCO2mix_store(max(T2 for _, T2 in periods))
+    models = models or registry.current
+    prediction_cache.retain(store.version, models.versions)
+
+    for start in range(0, len(periods), chunk_size):
+        chunk = periods[start:start + chunk_size]
+        keys = [make_cache_key(T1, T2, store.version, models.versions) for T1, T2 in chunk]
+        results = [prediction_cache.get(key) for key in keys]
+        missing = {i for i, result in enumerate(results) if result is None}
+        if missing:
+            # Périodes longues traitées seules, par fenêtres : le paquet garde une mémoire bornée
+            long = {i for i in missing if len(prediction_windows(*chunk[i])) > 1}
+            order = sorted(missing - long)
+            computed = _predict_periods(store, [chunk[i] for i in order], models) if order else []
+            for i in sorted(long):
+                order.append(i)
+                predictions, timestamps = predict_period(store, *chunk[i], models)
+                computed.append((predictions.tolist(), timestamps))
+            for i, (predictions, timestamps) in zip(order, computed):
+                prediction_cache.put(keys[i], predictions, timestamps)
+                results[i] = (predictions, timestamps)
+        for i, (T1, T2) in enumerate(chunk):
+            yield PeriodPrediction(T1, T2, *results[i], i not in missing)
+
+
+class ForecastResult(NamedTuple):
+    timestamps: np.ndarray
+    forecasts: Dict[str, list]
+    models: LoadedModels
+    step_minutes: int
+
+
+def forecast_predictor(models: LoadedModels) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Prédiction d'un pas de prévision récursive (quelques lignes, appelée à chaque pas) :
+    arbres compilés du moteur natif s'il est chargé, sinon scaler et modèle pyfunc.
+    """
+    if models.native is not None:
+        return models.native.step_predictor()
+
+    def predict(X: np.ndarray) -> np.ndarray:
+        X_scaled = pd.DataFrame(models.scaler.predict(FEATURE_PIPELINE.frame(X)), columns=FEATURE_PIPELINE.feature_names)
+        return np.asarray(models.model.predict(X_scaled), dtype=np.float64)
+
+    return predict
+
+
+def tempo_passthrough(timestamps: np.ndarray, calendar: TempoCalendar = None) -> np.ndarray:
+    """
+    Colonnes TEMPO de chaque horodatage d'après le calendrier (dernière couleur connue au-delà).
+    """
+    codes = (calendar or get_tempo_calendar()).lookup_or_last(timestamps)
+    one_hot = TempoCalendar.one_hot(codes)
+    return np.column_stack([one_hot[col] for col in FEATURE_PIPELINE.passthrough]).astype(np.float64)
+
+
+def run_forecast_pipeline(T1: date, T2: date, scenarios: Optional[List[Tuple[str, Optional[str]]]] = None,
+                          models: LoadedModels = None) -> ForecastResult:
+    """
+    Prévision récursive de T1 à T2 (inclus) à partir de la dernière mesure connue.
+
+    Chaque pas est prédit à partir des précédents (lags et moyenne mobile réinjectés),
+    depuis le quart d'heure qui suit la dernière mesure : les pas antérieurs à T1 sont
+    calculés mais non renvoyés. Tous les scénarios avancent ensemble, une matrice par pas
+    (voir `RecursiveForecaster`).
+
+    Args:
+        T1 (date): Premier jour renvoyé.
+        T2 (date): Dernier jour renvoyé.
+        scenarios (List[Tuple[str, str]]): (nom, couleur TEMPO imposée sur tout l'horizon ou None
+            pour le calendrier connu). Par défaut, un seul scénario "baseline" sur le calendrier connu.
+        models (LoadedModels): Instantané à utiliser (par défaut celui du registre).
+
+    Returns:
+        ForecastResult: Horodatages renvoyés et prédictions par scénario.
+    """
+    validate_period(T1, T2)
+    scenarios = scenarios or [("baseline", None)]
+    for _, color in scenarios:
+        if color is not None and color not in TEMPO_COLORS:
+            raise ValueError(f"Couleur TEMPO inconnue : {color} (attendu : {', '.join(TEMPO_COLORS)})")
+    store = refresh_eCO2mix_store(T2)
+    models = models or registry.current
+    history = sync_history(store)
+
+    forecaster = RecursiveForecaster(FEATURE_PIPELINE, forecast_predictor(models),
+                                     step=np.timedelta64(FORECAST_STEP_MINUTES, "m"))
+    last, observed = history.last_observations(FEATURE_PIPELINE.history_rows)
+    if last is None or len(observed) < FEATURE_PIPELINE.history_rows:
+        raise ValueError("Historique insuffisant pour la prévision.")
+    start = np.datetime64(last, "ns") + forecaster.step
+    end = np.datetime64(T2 + timedelta(days=1), "ns")
+    horizon = max(0, int((end - start) // forecaster.step))
+    if horizon > FORECAST_MAX_STEPS:
+        raise ValueError(f"Horizon trop long depuis la dernière mesure ({last}) : "
+                         f"{horizon} pas, max {FORECAST_MAX_STEPS}.")
+    timestamps = forecaster.timestamps(start, horizon)
+
+    # Colonnes TEMPO par scénario et par pas : calendrier connu, ou couleur imposée
+    known = tempo_passthrough(timestamps) if horizon else np.empty((0, len(FEATURE_PIPELINE.passthrough)))
+    passthrough = np.empty((len(scenarios), horizon, len(FEATURE_PIPELINE.passthrough)))
+    for i, (_, color) in enumerate(scenarios):
+        if color is None:
+            passthrough[i] = known
+        else:
+            passthrough[i] = [col == f"Type de jour TEMPO_{color}" for col in FEATURE_PIPELINE.passthrough]
+
+    with metrics.stage("forecast") as stage:
+        values = forecaster.forecast(np.tile(observed, (len(scenarios), 1)), start, horizon, passthrough)
+        stage.rows = values.size
+    shown = timestamps >= np.datetime64(T1, "ns")
+    return ForecastResult(timestamps[shown],
+                          {name: values[i, shown].tolist() for i, (name, _) in enumerate(scenarios)},
+                          models, FORECAST_STEP_MINUTES)
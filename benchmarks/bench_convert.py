@@ -0,0 +1,84 @@
+"""
+Benchmark de la conversion des exports eCO2mix : ancienne conversion ligne à ligne
+(CSV intermédiaire + relecture) contre lecture en streaming, fichier par fichier
+puis sur tous les fichiers en parallèle.
+
+    python -m benchmarks.bench_convert --years 3
+"""
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.fixtures import write_eco2mix_files
+from core.data_preprocessing import load_all_xls_eCO2mix_data, load_data, read_xls_eCO2mix
+
+
+def legacy_convert_xls_eCO2mix_to_csv(input_path: str, output_path: str) -> None:
+    with open(input_path, 'r', encoding='cp1252') as f:
+        lines = f.readlines()
+
+    cleaned_lines = []
+    for i, line in enumerate(lines):
+        if "RTE ne pourra" in line or "L'ensemble des informations disponibles" in line:
+            continue
+
+        line = line.replace('\t', ',')
+        if i > 0:
+            line = re.sub(r',\s*$', '', line)
+        cleaned_lines.append(line.rstrip() + '\n')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.writelines(cleaned_lines)
+
+
+def legacy_load(path: str, tmp_dir: str) -> pd.DataFrame:
+    csv_path = os.path.join(tmp_dir, os.path.basename(path).replace(".xls", ".csv"))
+    legacy_convert_xls_eCO2mix_to_csv(path, csv_path)
+    return load_data(csv_path)
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=3, help="Années d'historique synthétique")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw = os.path.join(tmp_dir, "raw")
+        write_eco2mix_files(raw, date(2025 - args.years, 1, 1), days=365 * args.years)
+        files = sorted(glob.glob(os.path.join(raw, "*.xls")))
+        total_mb = sum(os.path.getsize(f) for f in files) / 1e6
+        largest = max(files, key=os.path.getsize)
+        largest_mb = os.path.getsize(largest) / 1e6
+
+        results = {
+            "legacy (1 fichier)": (largest_mb, best_of(lambda: legacy_load(largest, tmp_dir), args.repeat)),
+            "streaming (1 fichier)": (largest_mb, best_of(lambda: read_xls_eCO2mix(largest), args.repeat)),
+            "legacy (tous, séquentiel)": (total_mb, best_of(
+                lambda: [legacy_load(f, tmp_dir) for f in files], args.repeat)),
+            "streaming (tous, parallèle)": (total_mb, best_of(
+                lambda: load_all_xls_eCO2mix_data(raw), args.repeat)),
+        }
+
+    print(f"{len(files)} fichiers, {total_mb:.1f} Mo au total ({os.cpu_count()} cœurs)")
+    for name, (size_mb, seconds) in results.items():
+        print(f"{name:<30} {seconds * 1000:8.1f} ms  {size_mb / seconds:8.1f} Mo/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Microbenchmark du parsing Date/Heures : ancien calcul (chaînes + `Series.apply`)
+contre le chemin vectorisé en minutes depuis minuit.
+
+    python -m benchmarks.bench_datetime --days 365
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from core.data_preprocessing import preprocess_annual_data
+from core.features_engineering import create_cyclical_features, create_hour_features
+
+
+def legacy_preprocess_annual_data(df: pd.DataFrame) -> pd.DataFrame:
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Datetime'] = pd.to_datetime(df['Date'].dt.strftime("%Y-%m-%d") + " " + df['Heures'], errors='coerce')
+    return df[['Date', 'Heures', 'Datetime', 'Consommation']].dropna()
+
+
+def legacy_create_hour_features(df: pd.DataFrame) -> pd.DataFrame:
+    return create_cyclical_features(df, column='Heures', max_val=24,
+                                    transform_func=lambda x: pd.to_datetime(x, format='%H:%M').hour,
+                                    prefix='hour')
+
+
+def best_of(func, make_input, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        df = make_input()
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    stamps = pd.date_range("2024-01-01", periods=args.days * 96, freq="15min")
+    raw = pd.DataFrame({"Date": stamps.strftime("%Y-%m-%d"),
+                        "Heures": stamps.strftime("%H:%M"),
+                        "Consommation": 50000.0})
+    pd.testing.assert_frame_equal(preprocess_annual_data(raw.copy()), legacy_preprocess_annual_data(raw.copy()))
+    pd.testing.assert_frame_equal(create_hour_features(raw.copy()), legacy_create_hour_features(raw.copy()))
+
+    print(f"{len(raw)} lignes quart-horaires")
+    for name, legacy, fast in [
+        ("preprocess_annual_data", legacy_preprocess_annual_data, preprocess_annual_data),
+        ("create_hour_features", legacy_create_hour_features, create_hour_features),
+    ]:
+        before = best_of(legacy, raw.copy, args.repeat)
+        after = best_of(fast, raw.copy, args.repeat)
+        print(f"{name:<24} {before * 1000:9.1f} ms -> {after * 1000:7.1f} ms  (x{before / after:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Latence de la prévision récursive selon l'horizon et le nombre de scénarios : un appel
+au modèle par pas, toutes séries confondues. Compare le prédicteur pas à pas du moteur
+natif (arbres compilés en NumPy) à `Booster.inplace_predict` et au chemin pyfunc, et
+donne l'écart maximal avec `inplace_predict`.
+
+Les modèles MLflow sont remplacés par un StandardScaler et un XGBRegressor entraînés
+sur des données synthétiques, enveloppés comme des modèles pyfunc.
+
+    python -m benchmarks.bench_forecast --steps 96,672 --scenarios 1,3
+"""
+import argparse
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+
+from app.inference import NativeEngine
+from app.utils import FEATURE_PIPELINE, LoadedModels, forecast_predictor
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.forecasting import RecursiveForecaster
+
+
+def best_of(func, repeat: int) -> tuple:
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="96,672", help="Horizons testés (pas quart-horaires)")
+    parser.add_argument("--scenarios", default="1,3", help="Nombres de séries avancées ensemble")
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pyfunc", action="store_true", help="Mesure aussi le chemin pyfunc (lent)")
+    args = parser.parse_args()
+
+    raw = tempfile.mkdtemp(prefix="superman-bench-forecast-")
+    write_eco2mix_files(raw, date(2024, 1, 1), days=120)
+    merged = build_eCO2mix_dataset(raw)
+    models = train_stand_in_models(merged, n_estimators=args.n_estimators)
+    engine = NativeEngine.from_models(models.scaler, models.model)
+    history = merged['Consommation'].to_numpy(dtype=float)[-FEATURE_PIPELINE.history_rows:]
+    start = merged['Datetime'].max() + np.timedelta64(15, "m")
+
+    predictors = {"compilé": engine.step_predictor(),
+                  "inplace": lambda X: engine.predict(X, overwrite=True)}
+    if args.pyfunc:
+        predictors["pyfunc"] = forecast_predictor(models)
+
+    print(f"{'pas':>5} {'séries':>6} " + " ".join(f"{name + ' ms':>11}" for name in predictors) + f" {'écart max':>10}")
+    for steps in (int(s) for s in args.steps.split(",")):
+        for n_series in (int(n) for n in args.scenarios.split(",")):
+            tempo = np.eye(3)[np.arange(n_series) % 3]
+            timings, results = [], {}
+            for name, predict in predictors.items():
+                forecaster = RecursiveForecaster(FEATURE_PIPELINE, predict)
+                seconds, results[name] = best_of(
+                    lambda: forecaster.forecast(np.tile(history, (n_series, 1)), start, steps, tempo),
+                    1 if name == "pyfunc" else args.repeat)
+                timings.append(seconds)
+            gap = float(np.max(np.abs(results["compilé"] - results["inplace"])))
+            print(f"{steps:>5} {n_series:>6} " + " ".join(f"{s * 1000:>11.2f}" for s in timings) + f" {gap:>10.3g}")
+
+
+if __name__ == "__main__":
+    main()
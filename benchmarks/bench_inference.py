@@ -0,0 +1,65 @@
+"""
+Latence de l'inférence selon l'horizon : chemin pyfunc (DataFrame de features, scaler
+pyfunc, nouveau DataFrame, modèle pyfunc) contre moteur natif (matrice de features,
+standardisation en place, `Booster.inplace_predict`), et écart maximal entre les deux.
+
+Les modèles MLflow sont remplacés par un StandardScaler et un XGBRegressor entraînés
+sur des données synthétiques, enveloppés comme des modèles pyfunc.
+
+    python -m benchmarks.bench_inference --hours 24,168,8760
+"""
+import argparse
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+
+from app.inference import NativeEngine
+from app.utils import FEATURE_PIPELINE, predict_with_model, scale_data
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.data_preprocessing import build_eCO2mix_dataset
+
+
+def best_of(func, repeat: int) -> tuple:
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", default="24,168,8760", help="Horizons testés (heures de données quart-horaires)")
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = tempfile.mkdtemp(prefix="superman-bench-inference-")
+    write_eco2mix_files(raw, date(2024, 1, 1), days=366)
+    merged = build_eCO2mix_dataset(raw)
+    models = train_stand_in_models(merged, n_estimators=args.n_estimators)
+    engine = NativeEngine.from_models(models.scaler, models.model)
+
+    print(f"{'heures':>7} {'lignes':>8} {'pyfunc ms':>10} {'natif ms':>9} {'gain':>6} {'écart max':>10}")
+    for hours in (int(h) for h in args.hours.split(",")):
+        df = merged.iloc[:hours * 4 + FEATURE_PIPELINE.history_rows]
+
+        def pyfunc():
+            X = FEATURE_PIPELINE.transform(df)
+            return predict_with_model(scale_data(X, models), models)
+
+        def native():
+            return engine.predict(FEATURE_PIPELINE.transform_array(df), overwrite=True).tolist()
+
+        pyfunc_s, expected = best_of(pyfunc, args.repeat)
+        native_s, predictions = best_of(native, args.repeat)
+        gap = float(np.max(np.abs(np.asarray(expected) - np.asarray(predictions))))
+        print(f"{hours:>7} {len(predictions):>8} {pyfunc_s * 1000:>10.2f} {native_s * 1000:>9.2f} "
+              f"{pyfunc_s / native_s:>5.1f}x {gap:>10.3g}")
+
+
+if __name__ == "__main__":
+    main()
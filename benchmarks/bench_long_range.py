@@ -0,0 +1,64 @@
+"""
+Pic mémoire et durée d'une prédiction sur une longue période, d'un seul tenant ou par
+fenêtres de PREDICT_CHUNK_DAYS jours (`app.utils.predict_period`). Par fenêtres, le pic
+(tracemalloc : Python et NumPy) doit rester à peu près constant quand la période s'allonge.
+
+Le stock eCO2mix est construit à partir de fichiers synthétiques ; les modèles MLflow sont
+remplacés par un StandardScaler et un XGBRegressor locaux (moteur natif).
+
+    python -m benchmarks.bench_long_range --days 30,90,180 --chunk-days 7
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import app.utils as app_utils
+from app.model import ModelRegistry
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.history_buffer import HistoryBuffer
+
+
+def run(store, T1: date, T2: date, models, chunk_days: int, processes: int) -> tuple:
+    app_utils.PREDICT_CHUNK_DAYS = chunk_days
+    app_utils.HISTORY = HistoryBuffer()
+    tracemalloc.start()
+    start = time.perf_counter()
+    predictions, _ = app_utils.predict_period(store, T1, T2, models, processes=processes)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(predictions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="30,90,180", help="Longueurs de période testées (jours)")
+    parser.add_argument("--chunk-days", type=int, default=7)
+    parser.add_argument("--processes", type=int, default=0, help="Processus pour les fenêtres (0 : aucun ; hors ligne uniquement)")
+    args = parser.parse_args()
+
+    lengths = [int(d) for d in args.days.split(",")]
+    today = date.today()
+    raw = tempfile.mkdtemp(prefix="superman-bench-long-")
+    write_eco2mix_files(raw, today - timedelta(days=30), days=max(lengths) + 31)
+    store = EcO2mixStore(os.path.join(raw, "store"), raw)
+    store.ensure(lambda: build_eCO2mix_dataset(raw))
+    registry = ModelRegistry(poll_interval=0, engine="native")
+    registry.install(train_stand_in_models(store.read_between(today - timedelta(days=30), today)))
+    models = registry.current
+
+    print(f"{'jours':>6} {'lignes':>8} {'mode':>10} {'durée ms':>10} {'pic Mo':>8}")
+    for days in lengths:
+        T2 = today + timedelta(days=days - 1)
+        for mode, chunk_days in (("d'un bloc", days), ("fenêtres", args.chunk_days)):
+            elapsed, peak, rows = run(store, today, T2, models, chunk_days, args.processes)
+            print(f"{days:>6} {rows:>8} {mode:>10} {elapsed * 1000:>10.1f} {peak / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Coût de sérialisation de la réponse `/predict` selon l'horizon : ancien chemin
+(DataFrame horodaté + validation Pydantic de `PredictionOutput`) contre JSON direct,
+NDJSON (timestamp, y_pred) et flux Arrow IPC.
+
+    python -m benchmarks.bench_serialization --rows 168,672,100000
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app.schemas import PredictionOutput
+from app.serialization import iter_arrow_ipc, iter_ndjson, json_body, row_timestamps
+
+
+def legacy_response(T1: date, predictions: list) -> bytes:
+    # DataFrame horodaté construit pour le CSV, puis validation et dump Pydantic de la liste
+    pd.DataFrame({"timestamp": pd.date_range(start=T1, periods=len(predictions), freq="h"),
+                  "y_pred": predictions})
+    return PredictionOutput(prediction=predictions).model_dump_json().encode("utf-8")
+
+
+def best_of(func, repeat: int) -> tuple:
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="168,672,100000", help="Horizons testés (nombre de prédictions)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    T1 = date(2025, 6, 1)
+    rng = np.random.default_rng(0)
+    print(f"{'lignes':>8} {'format':<22} {'ms':>8} {'octets':>10}")
+    for n in (int(x) for x in args.rows.split(",")):
+        predictions = (50000 + rng.normal(0, 5000, n)).tolist()
+        timestamps = row_timestamps(T1, n)
+        for name, func in [
+            ("pydantic + DataFrame", lambda: len(legacy_response(T1, predictions))),
+            ("json", lambda: len(json_body(timestamps, predictions))),
+            ("ndjson", lambda: sum(map(len, iter_ndjson(timestamps, predictions)))),
+            ("arrow ipc", lambda: sum(map(len, iter_arrow_ipc(timestamps, predictions)))),
+        ]:
+            elapsed, size = best_of(func, args.repeat)
+            print(f"{n:>8} {name:<22} {elapsed * 1000:8.2f} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
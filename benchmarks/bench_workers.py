@@ -0,0 +1,119 @@
+"""
+Mémoire par worker gunicorn, avec et sans préchargement dans le maître (`PRELOAD_APP`).
+
+Pour chaque mode, lance `gunicorn -c gunicorn.conf.py benchmarks.offline_app:app`,
+envoie quelques requêtes /predict pour chauffer les workers, puis lit
+`/proc/<pid>/smaps_rollup` :
+
+* RSS : pages résidentes, partagées comprises (surestime le coût réel) ;
+* PSS : pages partagées divisées entre les processus qui les utilisent (la somme = coût réel) ;
+* USS : pages privées du processus (ce que coûte un worker de plus).
+
+    python -m benchmarks.bench_workers --workers 4
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": values.get("Rss", 0), "pss": values.get("Pss", 0),
+            "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)}
+
+
+def children(pid: int) -> list:
+    pids = []
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                with open(f"/proc/{name}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(name))
+            except (FileNotFoundError, ProcessLookupError):
+                pass
+    return pids
+
+
+def prepare_data(folder: str) -> None:
+    # Données et stock Parquet créés une fois, avant le démarrage des workers
+    from benchmarks.fixtures import write_eco2mix_files
+    from core.columnar_store import EcO2mixStore
+    from core.data_preprocessing import build_eCO2mix_dataset
+
+    write_eco2mix_files(folder, date.today() - timedelta(days=60), days=75)
+    EcO2mixStore(os.path.join(folder, "store"), folder).ensure(lambda: build_eCO2mix_dataset(folder))
+
+
+def measure(workers: int, preload: bool, data_dir: str, requests: int) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, PRELOAD_APP="1" if preload else "0", OFFLINE_DATA_DIR=data_dir,
+               WEB_CONCURRENCY=str(workers), PYTHONPATH=ROOT)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                               "--bind", f"127.0.0.1:{port}", "benchmarks.offline_app:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 300
+        while True:
+            try:
+                if httpx.get(f"{url}/models", timeout=5).status_code == 200 and len(children(server.pid)) == workers:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn n'a pas démarré")
+            time.sleep(0.5)
+
+        today = date.today()
+        payload = {"T1": str(today), "T2": str(today + timedelta(days=1))}
+        with httpx.Client(timeout=60) as client:
+            for _ in range(requests):
+                client.post(f"{url}/predict", json=payload, headers={"Connection": "close"})
+        time.sleep(1)
+
+        master = memory_kb(server.pid)
+        per_worker = [memory_kb(pid) for pid in children(server.pid)]
+        return {"master": master, "workers": per_worker}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="Requêtes /predict de chauffe")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="superman-bench-workers-")
+    prepare_data(data_dir)
+    print(f"{'mode':<12} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} {'PSS total':>10}  (Mo)")
+    for preload in (False, True):
+        result = measure(args.workers, preload, data_dir, args.requests)
+        workers = result["workers"]
+        avg = {k: sum(w[k] for w in workers) / len(workers) / 1024 for k in ("rss", "pss", "uss")}
+        total = (result["master"]["pss"] + sum(w["pss"] for w in workers)) / 1024
+        print(f"{'preload' if preload else 'no preload':<12} {avg['rss']:>11.0f} {avg['pss']:>11.0f} "
+              f"{avg['uss']:>11.0f} {total:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
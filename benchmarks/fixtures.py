@@ -0,0 +1,276 @@
+"""
+Génération de fichiers eCO2mix et TEMPO synthétiques, au format des exports RTE
+(texte tabulé cp1252, tabulation finale, ligne d'avertissement en fin de fichier),
+modèles locaux et broker Kafka en mémoire.
+"""
+import os
+import gzip
+import functools
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from core.tempo_calendar import tempo_season
+
+ANNUAL_HEADER = ["Périmètre", "Nature", "Date", "Heures", "Consommation",
+                 "Prévision J-1", "Prévision J", "Fioul", "Charbon", "Gaz", "Nucléaire"]
+DISCLAIMER = ("RTE ne pourra être tenu responsable de l'utilisation qui pourrait être faite "
+              "des données mises à disposition")
+TEMPO_TYPES = np.array(["BLEU", "BLANC", "ROUGE"])
+
+
+def _annual_lines(start: date, days: int, freq_minutes: int, rng: np.random.Generator) -> List[str]:
+    stamps = pd.date_range(start, periods=days * 24 * 60 // freq_minutes, freq=f"{freq_minutes}min")
+    minutes = stamps.hour * 60 + stamps.minute
+    load = 50000 + 8000 * np.sin(2 * np.pi * minutes / 1440) + rng.normal(0, 500, len(stamps))
+    dates = stamps.strftime("%Y-%m-%d")
+    hours = stamps.strftime("%H:%M")
+    lines = ["\t".join(ANNUAL_HEADER) + "\t\n"]
+    for d, h, c in zip(dates, hours, load.astype(int)):
+        lines.append(f"France\tDonnées temps réel\t{d}\t{h}\t{c}\t{c + 120}\t{c - 80}\t210\t15\t4200\t{c // 2}\t\n")
+    lines.append(DISCLAIMER + "\t\n")
+    return lines
+
+
+def write_eco2mix_files(folder: str,
+                        start: date,
+                        days: int,
+                        freq_minutes: int = 15,
+                        seed: int = 0) -> List[str]:
+    """
+    Écrit un fichier annuel par année civile couverte et un fichier TEMPO par saison.
+
+    Args:
+        folder (str): Dossier de destination (équivalent de `data/01_raw`).
+        start (date): Premier jour généré.
+        days (int): Nombre de jours générés (taille du jeu).
+        freq_minutes (int): Pas de temps des mesures.
+        seed (int): Graine du générateur pseudo-aléatoire.
+
+    Returns:
+        List[str]: Chemins des fichiers écrits.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    end = start + timedelta(days=days)
+    written = []
+
+    day = start
+    while day < end:
+        year_end = min(date(day.year + 1, 1, 1), end)
+        name = "En-cours-TR" if year_end == end else f"Annuel-Definitif_{day.year}"
+        path = os.path.join(folder, f"eCO2mix_RTE_{name}.xls")
+        with open(path, "w", encoding="cp1252", newline="") as f:
+            f.writelines(_annual_lines(day, (year_end - day).days, freq_minutes, rng))
+        written.append(path)
+        day = year_end
+
+    seasons = {}
+    for offset in range(days):
+        d = start + timedelta(days=offset)
+        seasons.setdefault(tempo_season(d), []).append(d)
+    for season, season_days in seasons.items():
+        path = os.path.join(folder, f"eCO2mix_RTE_tempo_{season}.xls")
+        types = TEMPO_TYPES[rng.choice(3, size=len(season_days), p=[0.8, 0.15, 0.05])]
+        with open(path, "w", encoding="cp1252", newline="") as f:
+            f.write("Date\tType de jour TEMPO\n")
+            for d, t in zip(season_days, types):
+                f.write(f"{d.isoformat()}\t{t}\n")
+            f.write(DISCLAIMER + "\n")
+        written.append(path)
+    return written
+
+
+class PyfuncStandIn:
+    """
+    Imite un modèle `mlflow.pyfunc` : `predict` délègue à `transform` (scaler) ou `predict` (régression).
+    """
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def get_raw_model(self):
+        return self.estimator
+
+    def predict(self, X):
+        if hasattr(self.estimator, "transform"):
+            return self.estimator.transform(X)
+        return self.estimator.predict(X)
+
+
+def train_stand_in_models(merged: pd.DataFrame, n_estimators: int = 50):
+    """
+    Entraîne un StandardScaler et un XGBRegressor locaux sur un jeu fusionné synthétique,
+    et les renvoie sous forme d'instantané `LoadedModels` prêt à servir.
+    """
+    from datetime import datetime, timezone
+
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBRegressor
+
+    from app.model import LoadedModels
+    from core.features_engineering import FeaturePipeline
+
+    X, y = FeaturePipeline().transform_with_target(merged)
+    scaler = StandardScaler().fit(X)
+    model = XGBRegressor(n_estimators=n_estimators, max_depth=4).fit(scaler.transform(X), y.to_numpy().ravel())
+    return LoadedModels(scaler=PyfuncStandIn(scaler),
+                        model=PyfuncStandIn(model),
+                        versions={"Scaler_standard": "local", "EnergyForecastModel_xgboost": "local"},
+                        loaded_at=datetime.now(timezone.utc))
+
+
+class _RecordFuture:
+    """
+    Imite `FutureRecordMetadata` : `add_callback(f, *args)` appelle `f(*args, metadata)`.
+    """
+
+    def __init__(self):
+        self.is_done = False
+        self.value = None
+        self.exception = None
+        self._callbacks, self._errbacks = [], []
+
+    def add_callback(self, fn, *args):
+        if self.is_done and self.exception is None:
+            fn(*args, self.value)
+        elif not self.is_done:
+            self._callbacks.append(functools.partial(fn, *args))
+        return self
+
+    def add_errback(self, fn, *args):
+        if self.is_done and self.exception is not None:
+            fn(*args, self.exception)
+        elif not self.is_done:
+            self._errbacks.append(functools.partial(fn, *args))
+        return self
+
+    def resolve(self, value=None, exception=None):
+        self.is_done, self.value, self.exception = True, value, exception
+        for fn in (self._errbacks if exception is not None else self._callbacks):
+            fn(exception if exception is not None else value)
+
+
+class InMemoryProducer:
+    """
+    Producteur compatible `KafkaProducer` (send, flush, close) relié à un `InMemoryKafkaBroker`.
+    Les messages sont groupés, compressés en gzip et acquittés par lot : quand le lot atteint
+    `batch_size` octets, ou au `flush`.
+    """
+
+    def __init__(self, broker: "InMemoryKafkaBroker", batch_size: int = 16384, buffer_memory: int = 1 << 25):
+        self.broker = broker
+        self.batch_size = batch_size
+        self.buffer_memory = buffer_memory
+        self.closed = False
+        self._batch, self._batch_bytes = [], 0
+
+    def send(self, topic, value=None, key=None, headers=None):
+        if self.closed:
+            raise RuntimeError("Producteur fermé")
+        if self._batch_bytes + len(value) > self.buffer_memory:
+            raise TimeoutError("Tampon du producteur plein")
+        future = _RecordFuture()
+        self._batch.append((topic, key, value, list(headers or []), future))
+        self._batch_bytes += len(value)
+        if self._batch_bytes >= self.batch_size and not self.broker.hold:
+            self._deliver()
+        return future
+
+    def _deliver(self):
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        if not batch:
+            return
+        self.broker.receive(batch)
+
+    def flush(self, timeout=None):
+        self._deliver()
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        self.closed = True
+
+
+class InMemoryKafkaBroker:
+    """
+    Broker Kafka en mémoire : `topics[topic]` liste les messages (clé, valeur, en-têtes) reçus.
+
+    Args:
+        fail (bool): Les lots reçus sont refusés (erreur de remise pour chaque message).
+        hold (bool): Aucun lot n'est remis avant un `flush` explicite (broker lent).
+    """
+
+    def __init__(self, fail: bool = False, hold: bool = False):
+        self.fail = fail
+        self.hold = hold
+        self.topics = defaultdict(list)
+        self.batches = []  # (octets bruts, octets compressés) de chaque lot reçu
+        self.producers: List[InMemoryProducer] = []
+
+    def producer(self, **config) -> InMemoryProducer:
+        producer = InMemoryProducer(self, **config)
+        self.producers.append(producer)
+        return producer
+
+    def receive(self, batch) -> None:
+        raw = b"".join(value for _, _, value, _, _ in batch)
+        self.batches.append((len(raw), len(gzip.compress(raw))))
+        for topic, key, value, headers, future in batch:
+            if self.fail:
+                future.resolve(exception=ConnectionError("Broker indisponible"))
+                continue
+            self.topics[topic].append((key, value, headers))
+            future.resolve(value={"topic": topic, "offset": len(self.topics[topic]) - 1})
+
+
+class InMemoryS3:
+    """
+    Substitut local de MinIO (sous-ensemble de l'API boto3) : objets gardés en mémoire,
+    envois multipart assemblés à la fin comme par le serveur. `parts[key]` donne le nombre
+    de parts du dernier envoi de chaque objet.
+
+    Args:
+        fail_part (int): Numéro de part dont l'envoi échoue (simule une coupure réseau).
+    """
+
+    def __init__(self, fail_part: int = None):
+        self.fail_part = fail_part
+        self.objects = {}
+        self.parts = {}
+        self.aborted = 0
+        self._uploads = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+        self.parts[Key] = 1
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self._uploads) + self.aborted}"
+        self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise ConnectionError("Coupure pendant l'envoi d'une part")
+        self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        received = self._uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        self.objects[(Bucket, Key)] = b"".join(received[n] for n in numbers)
+        self.parts[Key] = len(numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._uploads.pop(UploadId, None)
+        self.aborted += 1
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            self.objects.pop((Bucket, item["Key"]), None)
+
+    def keys(self, Bucket):
+        return sorted(key for bucket, key in self.objects if bucket == Bucket)
@@ -0,0 +1,95 @@
+"""
+Temps d'import de l'API au démarrage (`python -X importtime`), pour suivre les régressions
+du démarrage à froid.
+
+Chaque mesure est faite dans un interpréteur neuf ; on garde, par module, le meilleur temps
+des répétitions. Le rapport donne le temps total d'import de `app.main`, les paquets de
+premier niveau les plus coûteux (temps propre cumulé de leurs modules) et signale les
+dépendances lourdes qui doivent rester chargées à la demande.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 600 --output /tmp/imports.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importées au premier usage ou par le préchauffage, jamais par `import app.main`
+LAZY_MODULES = ("pandas", "pyarrow", "mlflow", "boto3", "botocore", "sklearn", "xgboost", "scipy", "nannyml", "kafka")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    Lignes `import time: self | cumulative | module` -> [(module, self µs, cumulé µs)].
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return {name: (self_us, cumulative_us) for name, self_us, cumulative_us in parse_importtime(result.stderr)}
+
+
+def build_report(module: str = "app.main", repeat: int = 5) -> dict:
+    best: Dict[str, Tuple[int, int]] = {}
+    for _ in range(repeat):
+        for name, (self_us, cumulative_us) in measure(module).items():
+            previous = best.get(name)
+            best[name] = (self_us, cumulative_us) if previous is None else \
+                (min(previous[0], self_us), min(previous[1], cumulative_us))
+    packages: Dict[str, int] = {}
+    for name, (self_us, _) in best.items():
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+    return {
+        "module": module,
+        "total_ms": best[module][1] / 1000,
+        "modules": len(best),
+        "packages_ms": {name: us / 1000 for name, us in sorted(packages.items(), key=lambda kv: -kv[1])},
+        "eager_heavy": sorted(m for m in LAZY_MODULES if m in best),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Échec (code 1) au-delà de ce temps total")
+    parser.add_argument("--output", default=None, help="Rapport JSON")
+    args = parser.parse_args()
+
+    report = build_report(args.module, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"import {report['module']} : {report['total_ms']:.0f} ms ({report['modules']} modules)")
+    for name, ms in list(report["packages_ms"].items())[:args.top]:
+        print(f"  {name:<24} {ms:8.1f} ms")
+
+    failed = False
+    if report["eager_heavy"]:
+        print(f"\n❌ Dépendances lourdes importées au démarrage : {', '.join(report['eager_heavy'])}")
+        failed = True
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"\n❌ Import trop lent : {report['total_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
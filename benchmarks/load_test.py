@@ -0,0 +1,88 @@
+"""
+Test de charge de /predict : requêtes par seconde et percentiles de latence
+pour plusieurs niveaux de concurrence.
+
+    # Contre une API déjà démarrée (avant / après un changement)
+    python -m benchmarks.load_test --url http://localhost:8000
+
+    # Hors ligne : API locale avec données synthétiques et modèles de substitution
+    python -m benchmarks.load_test --offline
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+from datetime import date, timedelta
+
+import httpx
+import numpy as np
+
+
+def start_offline_server(cache: bool = True) -> str:
+    """
+    Démarre l'API dans un thread uvicorn, avec données synthétiques et modèles locaux.
+    """
+    import uvicorn
+
+    from app.result_cache import prediction_cache
+    from benchmarks.offline_app import app
+
+    if not cache:
+        prediction_cache.max_bytes = 0  # Aucune entrée n'est conservée : chaque requête recalcule
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_level(url: str, concurrency: int, requests_per_client: int, payload: dict) -> dict:
+    latencies = []
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            response = await client.post(f"{url}/predict", json=payload)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"concurrency": concurrency, "rps": len(latencies) / elapsed,
+            "p50": p50, "p95": p95, "p99": p99, "errors": errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--offline", action="store_true", help="API locale avec données et modèles synthétiques")
+    parser.add_argument("--levels", default="1,10,50", help="Niveaux de concurrence")
+    parser.add_argument("--requests", type=int, default=5, help="Requêtes par client")
+    parser.add_argument("--days", type=int, default=1, help="Durée de la période demandée")
+    parser.add_argument("--no-cache", action="store_true", help="Désactive le cache de résultats (mode --offline)")
+    args = parser.parse_args()
+
+    url = start_offline_server(cache=not args.no_cache) if args.offline else args.url
+    today = date.today()
+    payload = {"T1": str(today), "T2": str(today + timedelta(days=args.days))}
+
+    print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+    for level in (int(x) for x in args.levels.split(",")):
+        r = asyncio.run(run_level(url, level, args.requests, payload))
+        print(f"{r['concurrency']:>8} {r['rps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+API configurée hors ligne : fichiers RTE synthétiques, stock Parquet local, modèles
+entraînés sur place et effets de bord neutralisés. Utilisée par les benchmarks :
+
+    gunicorn -c gunicorn.conf.py benchmarks.offline_app:app
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+
+import app.utils as app_utils
+from app.main import app  # noqa: F401  (cible gunicorn / uvicorn)
+from app.model import registry
+from app.side_effects import side_effects
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.tempo_calendar import TempoCalendar
+
+OFFLINE_DIR = os.getenv("OFFLINE_DATA_DIR") or tempfile.mkdtemp(prefix="superman-offline-")
+
+
+def configure_offline(folder: str = OFFLINE_DIR, days: int = 75) -> EcO2mixStore:
+    today = date.today()
+    if not os.path.exists(os.path.join(folder, "store")):
+        write_eco2mix_files(folder, today - timedelta(days=days - 15), days=days)
+    store = EcO2mixStore(os.path.join(folder, "store"), folder)
+    calendar_path = os.path.join(folder, "tempo_calendar.npz")
+    calendar = TempoCalendar.load(calendar_path)
+
+    def build():
+        merged = build_eCO2mix_dataset(folder, calendar=calendar)
+        calendar.save(calendar_path)
+        return merged
+
+    store.ensure(build)
+    registry.poll_interval = 0
+    registry.install(train_stand_in_models(store.read_between(today - timedelta(days=days - 15), today)))
+    # Les fichiers RTE synthétiques remplacent le téléchargement
+    app_utils.refresh_eCO2mix_store = lambda T2: store
+    app_utils.get_tempo_calendar = lambda: calendar
+    # Ni MinIO, ni Kafka, ni NannyML hors ligne
+    side_effects.journal_dir = None
+    side_effects.handlers = {kind: (lambda payloads: None) for kind in side_effects.handlers}
+    return store
+
+
+configure_offline()
@@ -0,0 +1,239 @@
+"""
+Suite de benchmarks de bout en bout, hors ligne : fichiers eCO2mix/TEMPO synthétiques
+de taille réglable, scaler et XGBoost locaux, et une mesure par étape du pipeline
+(conversion, concat, merge, features, scale, predict, serialize).
+
+Pour chaque étape : latence médiane et minimale, débit (lignes/s, Mo/s pour la conversion)
+et pic mémoire Python (tracemalloc, sur une exécution séparée). Les résultats sont
+écrits en JSON puis comparés à une référence : toute étape plus lente ou plus gourmande
+que la référence au-delà de la tolérance fait échouer la commande (code de sortie 1).
+
+Les latences ne sont jamais comparées en absolu : une charge de calibration fixe
+(`reference`) est mesurée dans la même exécution, et chaque étape est jugée sur son
+rapport à cette charge. La référence enregistrée sur une machine reste donc valable
+sur une autre, plus lente ou plus rapide.
+
+    python -m benchmarks.suite                       # mesure et compare à benchmarks/baseline.json
+    python -m benchmarks.suite --update-baseline     # enregistre la mesure comme nouvelle référence
+    python -m benchmarks.suite --days 730 --repeat 3 --output /tmp/results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from typing import Callable, Dict, List
+
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+REFERENCE_STAGE = "reference"
+
+
+def reference_workload() -> int:
+    """
+    Charge de calibration fixe (tri NumPy + boucle Python), indépendante du code mesuré :
+    elle ne suit que la vitesse de la machine.
+    """
+    import numpy as np
+
+    values = np.random.default_rng(0).random(500_000)
+    np.sort(values)
+    return sum(i * i for i in range(200_000))
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    """
+    Exécute `func` `repeat` fois (latences), puis une fois sous tracemalloc (pic mémoire).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "peak_mb": peak / 1024 ** 2}
+
+
+def run_suite(days: int, repeat: int, seed: int = 0, n_estimators: int = 50) -> dict:
+    from app.serialization import iter_arrow_ipc, iter_ndjson, json_body
+    from app.utils import FEATURE_PIPELINE, scale_data
+    from core.data_preprocessing import (
+        concat_eCO2mix_frames,
+        load_all_xls_eCO2mix_data,
+        merge_eCO2mix_data,
+        preprocess_annual_data,
+        preprocess_eCO2mix_data,
+        preprocess_tempo_data,
+    )
+
+    # Fichiers synthétiques supprimés à la fin de la mesure
+    with tempfile.TemporaryDirectory(prefix="superman-suite-") as raw:
+        paths = write_eco2mix_files(raw, date(2024, 1, 1), days=days, seed=seed)
+        input_mb = sum(os.path.getsize(p) for p in paths) / 1024 ** 2
+
+        # Entrées de chaque étape préparées une fois : chaque mesure ne couvre que son étape
+        frames = load_all_xls_eCO2mix_data(raw)
+
+        def concat():
+            return (preprocess_annual_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_*")),
+                    preprocess_tempo_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_tempo*")))
+
+        annual, tempo = concat()
+
+        def merge():
+            return preprocess_eCO2mix_data(merge_eCO2mix_data(annual, tempo))
+
+        merged = merge()
+        models = train_stand_in_models(merged, n_estimators=n_estimators)
+        X, timestamps = FEATURE_PIPELINE.transform(merged, with_datetimes=True)
+        X_scaled = scale_data(X, models)
+        predictions = models.model.predict(X_scaled).tolist()
+
+        stages: Dict[str, tuple] = {
+            # étape: (fonction, lignes traitées)
+            REFERENCE_STAGE: (reference_workload, len(merged)),
+            "conversion": (lambda: load_all_xls_eCO2mix_data(raw), len(annual)),
+            "concat": (concat, len(annual)),
+            "merge": (merge, len(merged)),
+            "features": (lambda: FEATURE_PIPELINE.transform(merged), len(merged)),
+            "scale": (lambda: scale_data(X, models), len(X)),
+            "predict": (lambda: models.model.predict(X_scaled), len(X)),
+            "serialize_json": (lambda: json_body(timestamps, predictions), len(predictions)),
+            "serialize_ndjson": (lambda: sum(map(len, iter_ndjson(timestamps, predictions))), len(predictions)),
+            "serialize_arrow": (lambda: sum(map(len, iter_arrow_ipc(timestamps, predictions))), len(predictions)),
+        }
+        results = {}
+        for name, (func, rows) in stages.items():
+            result = measure(func, repeat)
+            result["rows_per_s"] = rows / (result["median_ms"] / 1000)
+            if name == "conversion":
+                result["mb_per_s"] = input_mb / (result["median_ms"] / 1000)
+            results[name] = result
+        return {
+            "params": {"days": days, "seed": seed, "n_estimators": n_estimators, "rows": len(merged),
+                       "input_mb": round(input_mb, 2)},
+            "machine": {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform()},
+            "stages": results,
+        }
+
+
+def machine_factor(results: dict, baseline: dict):
+    """
+    Rapport de vitesse entre cette exécution et la référence, mesuré sur la charge de
+    calibration (None si l'une des deux ne l'a pas).
+    """
+    current = results["stages"].get(REFERENCE_STAGE)
+    reference = baseline["stages"].get(REFERENCE_STAGE)
+    if not current or not reference:
+        return None
+    return current["min_ms"] / reference["min_ms"]
+
+
+def compare_to_baseline(results: dict, baseline: dict,
+                        time_tolerance: float = 0.3, memory_tolerance: float = 0.2) -> List[str]:
+    """
+    Liste des régressions : latence ou pic mémoire au-delà de la tolérance relative.
+
+    La latence de référence est d'abord ramenée à cette machine (facteur de la charge de
+    calibration mesurée dans la même exécution). Une étape régresse si sa meilleure répétition
+    est plus lente que cette médiane attendue, avec 1 ms de marge pour les étapes courtes.
+    Sans charge de calibration, les latences de la référence sont indicatives et ne font
+    pas échouer la comparaison ; le pic mémoire (tracemalloc) ne dépend pas de la machine.
+    """
+    if results["params"] != baseline["params"]:
+        return [f"paramètres différents de la référence ({results['params']} != {baseline['params']})"]
+    factor = machine_factor(results, baseline)
+    regressions = []
+    for name, reference in baseline["stages"].items():
+        if name == REFERENCE_STAGE:
+            continue
+        current = results["stages"].get(name)
+        if current is None:
+            regressions.append(f"{name}: étape absente")
+            continue
+        if factor is not None:
+            expected_ms = reference["median_ms"] * factor
+            if current["min_ms"] > expected_ms * (1 + time_tolerance) + 1:
+                regressions.append(f"{name}: {current['min_ms']:.1f} ms > {expected_ms:.1f} ms attendus "
+                                   f"(machine ×{factor:.2f}, +{time_tolerance:.0%} toléré)")
+        if current["peak_mb"] > reference["peak_mb"] * (1 + memory_tolerance) + 1:
+            regressions.append(f"{name}: pic {current['peak_mb']:.1f} Mo > {reference['peak_mb']:.1f} Mo "
+                               f"(+{memory_tolerance:.0%} toléré)")
+    return regressions
+
+
+def print_table(results: dict, baseline: dict = None) -> None:
+    factor = machine_factor(results, baseline) if baseline else None
+    print(f"{results['params']['rows']} lignes, {results['params']['input_mb']} Mo de fichiers bruts")
+    if factor is not None:
+        print(f"machine ×{factor:.2f} par rapport à la référence (charge « {REFERENCE_STAGE} »)")
+    print(f"{'étape':<18} {'médiane ms':>11} {'min ms':>8} {'att. ms':>9} {'lignes/s':>12} {'pic Mo':>8} {'réf. Mo':>8}")
+    for name, r in results["stages"].items():
+        ref = (baseline or {}).get("stages", {}).get(name, {})
+        ref_ms = f"{ref['median_ms'] * factor:.1f}" if ref and factor is not None else "-"
+        ref_mb = f"{ref['peak_mb']:.1f}" if ref else "-"
+        print(f"{name:<18} {r['median_ms']:>11.1f} {r['min_ms']:>8.1f} {ref_ms:>9} {r['rows_per_s']:>12,.0f} "
+              f"{r['peak_mb']:>8.1f} {ref_mb:>8}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="Taille du jeu synthétique (jours quart-horaires)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier JSON de référence")
+    parser.add_argument("--update-baseline", action="store_true", help="Enregistre les résultats comme référence")
+    parser.add_argument("--time-tolerance", type=float, default=0.3)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run_suite(args.days, args.repeat)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print_table(results)
+        print(f"\n📌 Référence enregistrée dans {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if baseline is None:
+        print(f"\n⚠️ Pas de référence ({args.baseline}) : lancer avec --update-baseline.")
+        return 0
+    if machine_factor(results, baseline) is None:
+        print(f"\n⚠️ Référence sans charge « {REFERENCE_STAGE} » : latences indicatives, seul le pic mémoire "
+              f"est comparé. Relancer avec --update-baseline.")
+    regressions = compare_to_baseline(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\n❌ RÉGRESSIONS DE PERFORMANCE :")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print("\n✅ Aucune régression par rapport à la référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import date, datetime
+from typing import Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from core.features_engineering import TEMPO_COLUMNS
+from core.file_lock import file_lock
+from core.metrics import metrics
+from core.raw_data_cache import raw_folder_lock
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+POINTER_NAME = "_current"  # Nom du dossier de version servi, remplacé par renommage atomique
+PARTITION_COLUMN = "period"  # Partition mensuelle "YYYY-MM" (hive : period=2025-06)
+DEFAULT_STORE_PATH = os.getenv("ECO2MIX_STORE_PATH", "./data/03_primary/eco2mix")
+
+
+def fingerprint_raw_inputs(raw_folder: str, pattern: str = "*.xls") -> str:
+    """
+    Empreinte des fichiers bruts (nom, taille, date de modification).
+    Le cache de téléchargement ne réécrit les fichiers que si leur contenu change.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(raw_folder, pattern))):
+        st = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _to_period(dates: pd.Series) -> pd.Series:
+    return dates.dt.strftime("%Y-%m")
+
+
+class EcO2mixStore:
+    """
+    Jeu de données eCO2mix fusionné et typé, stocké en Parquet partitionné par mois.
+
+    Le jeu n'est reconstruit que lorsque l'empreinte des fichiers bruts change.
+    Les lectures ne touchent que les partitions qui recouvrent la période demandée,
+    avec filtrage poussé jusqu'aux row groups et lecture en mémoire mappée.
+
+    Chaque reconstruction écrit une nouvelle version (`<root>/v-<horodatage>-<pid>`) puis
+    bascule le pointeur `_current`. La version précédente est gardée jusqu'à la reconstruction
+    suivante : un lecteur (thread ou worker) qui l'a ouverte continue de la lire, et une lecture
+    dont les fichiers ont disparu rouvre la version courante.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_PATH, raw_folder: str = "./data/01_raw"):
+        self.root = root
+        self.raw_folder = raw_folder
+        self._lock = threading.Lock()
+        self._dataset: Optional[ds.Dataset] = None
+        self._dataset_fingerprint: Optional[str] = None  # Empreinte du jeu ouvert par `_open`
+        self._manifest: Optional[dict] = None
+
+    @property
+    def lock_path(self) -> str:
+        # À côté du dossier : les lectures pyarrow n'en voient jamais le verrou
+        return f"{os.path.abspath(self.root)}.lock"
+
+    def version_dir(self) -> str:
+        """
+        Dossier de la version servie (le dossier racine lui-même pour un stock écrit avant les versions).
+        """
+        try:
+            with open(os.path.join(self.root, POINTER_NAME), "r", encoding="utf-8") as f:
+                return os.path.join(self.root, f.read().strip())
+        except FileNotFoundError:
+            return self.root
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.version_dir(), MANIFEST_NAME)
+
+    def manifest(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._manifest = None
+        return self._manifest
+
+    def is_current(self) -> bool:
+        manifest = self.manifest()
+        return manifest is not None and manifest.get("fingerprint") == fingerprint_raw_inputs(self.raw_folder)
+
+    @property
+    def version(self) -> Optional[str]:
+        """
+        Empreinte des données servies (utile pour invalider les caches en aval).
+        """
+        manifest = self._manifest or self.manifest()
+        return manifest.get("fingerprint") if manifest else None
+
+    @metrics.timed("store_write")
+    def write(self, df: pd.DataFrame, fingerprint: str) -> None:
+        """
+        Écrit le jeu complet dans une nouvelle version, bascule le pointeur, puis supprime
+        les versions plus anciennes que la précédente. Appelé sous le verrou de `ensure`.
+        """
+        df = df.copy()
+        for col in TEMPO_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].fillna(False).astype(bool)
+        df[PARTITION_COLUMN] = _to_period(df['Date'])
+        df = df.sort_values('Datetime')
+
+        name = f"v-{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+        tmp_root = os.path.join(self.root, f".tmp-{name}")  # Caché : ignoré par pyarrow
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_to_dataset(table, root_path=tmp_root, partition_cols=[PARTITION_COLUMN],
+                            row_group_size=64 * 1024)
+        with open(os.path.join(tmp_root, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "rows": len(df),
+                "min_date": str(df['Date'].min()),
+                "max_date": str(df['Date'].max()),
+                "built_at": datetime.now().isoformat(),
+            }, f, indent=2)
+
+        os.replace(tmp_root, os.path.join(self.root, name))
+        previous = self.version_dir()
+        pointer = os.path.join(self.root, f".{POINTER_NAME}.tmp-{os.getpid()}")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(self.root, POINTER_NAME))
+        self._collect({name, os.path.basename(previous)}, legacy=previous == self.root)
+        self._dataset = None
+        self.manifest()
+
+    def _collect(self, keep: set, legacy: bool = False) -> None:
+        # Versions antérieures à la précédente et restes d'écritures interrompues. Un stock
+        # d'avant les versions (fichiers à la racine) est lui aussi gardé une génération.
+        for entry in os.listdir(self.root):
+            if entry == POINTER_NAME or entry in keep or (legacy and not entry.startswith(("v-", ".tmp-"))):
+                continue
+            path = os.path.join(self.root, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def ensure(self, build: Callable[[], pd.DataFrame]) -> bool:
+        """
+        Reconstruit le jeu avec `build()` si les fichiers bruts ont changé.
+
+        Une seule reconstruction à la fois entre workers : les fichiers bruts ne sont pas
+        réécrits pendant la construction, et un worker qui attendait le verrou trouve le
+        jeu déjà à jour.
+
+        Returns:
+            bool: True si une reconstruction a eu lieu.
+        """
+        with self._lock:
+            fingerprint = fingerprint_raw_inputs(self.raw_folder)
+            if (self._manifest is not None and self._manifest.get("fingerprint") == fingerprint
+                    and (self._dataset is None or self._dataset_fingerprint == fingerprint)):
+                return False
+            with raw_folder_lock(self.raw_folder), file_lock(self.lock_path):
+                return self._ensure_locked(build)
+
+    def _ensure_locked(self, build: Callable[[], pd.DataFrame]) -> bool:
+        fingerprint = fingerprint_raw_inputs(self.raw_folder)
+        manifest = self.manifest()
+        if manifest is not None and manifest.get("fingerprint") == fingerprint:
+            # Jeu reconstruit par une autre instance : la version ouverte n'est plus la courante
+            if self._dataset_fingerprint != fingerprint:
+                self._dataset = None
+            return False
+        logger.info("🧱 Reconstruction du jeu eCO2mix en Parquet")
+        self.write(build(), fingerprint)
+        return True
+
+    def _open(self) -> ds.Dataset:
+        if self._dataset is None:
+            manifest = self.manifest()
+            self._dataset_fingerprint = manifest.get("fingerprint") if manifest else None
+            partitioning = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+            self._dataset = ds.dataset(self.version_dir(),
+                                       format="parquet",
+                                       partitioning=partitioning,
+                                       filesystem=fs.LocalFileSystem(use_mmap=True))
+        return self._dataset
+
+    def read_between(self, T1: date, T2: date) -> pd.DataFrame:
+        """
+        Lit les lignes dont la colonne `Date` est comprise entre T1 et T2 (inclus).
+        Si la version ouverte a été supprimée entre-temps (deux reconstructions par d'autres
+        workers), la lecture est refaite une fois sur la version courante.
+        """
+        start, end = pd.Timestamp(T1), pd.Timestamp(T2)
+        with metrics.stage("store_read") as stage:
+            for attempt in range(2):
+                dataset = self._open()
+                date_type = dataset.schema.field('Date').type
+                expr = ((ds.field(PARTITION_COLUMN) >= start.strftime("%Y-%m"))
+                        & (ds.field(PARTITION_COLUMN) <= end.strftime("%Y-%m"))
+                        & (ds.field('Date') >= pa.scalar(start, type=date_type))
+                        & (ds.field('Date') <= pa.scalar(end, type=date_type)))
+                columns = [name for name in dataset.schema.names if name != PARTITION_COLUMN]
+                try:
+                    table = dataset.to_table(columns=columns, filter=expr)
+                    break
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+                    logger.info("🔁 Version du stock eCO2mix supprimée pendant la lecture : réouverture")
+                    self._dataset = None
+            df = table.to_pandas()
+            stage.rows = len(df)
+            return df.sort_values('Datetime').reset_index(drop=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_eco2mix_store(root: str = DEFAULT_STORE_PATH, raw_folder: str = "./data/01_raw") -> EcO2mixStore:
+    key = (os.path.abspath(root), os.path.abspath(raw_folder))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EcO2mixStore(root, raw_folder)
+        return _stores[key]
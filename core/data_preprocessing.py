@@ -1,66 +1,199 @@
 import os
+import numpy as np
 import pandas as pd
-import requests
-from zipfile import ZipFile
-from io import BytesIO
 import glob
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from fnmatch import fnmatch
+from typing import Callable, Dict, Iterator, List, Optional, Union
 import logging
 
+from core.features_engineering import TEMPO_COLUMNS, parse_hour_minutes
+from core.metrics import metrics
+from core.raw_data_cache import RawDataCache, get_raw_data_cache
+from core.tempo_calendar import TempoCalendar
+
 logger = logging.getLogger(__name__)
 
+# Téléchargements simultanés (annuel + une archive TEMPO par saison)
+FETCH_WORKERS = int(os.getenv("ECO2MIX_FETCH_WORKERS", 4))
+
 
 def fetch_eCO2mix_data(destination_folder: str,
-                       tempo_url: str,
-                       annual_url: str) -> None:
+                       tempo_url: Union[str, List[str]],
+                       annual_url: str,
+                       cache: RawDataCache = None,
+                       max_workers: int = FETCH_WORKERS) -> bool:
     """
     Télécharge les fichiers de consommation et TEMPO via les URLs spécifiées.
+    Les archives passent par le cache local (requêtes conditionnelles, extraction
+    seulement si le contenu a changé). Plusieurs saisons TEMPO (`tempo_url` en liste)
+    sont téléchargées en parallèle, avec le fichier annuel.
+
+    Returns:
+        bool: True si au moins une source a été mise à jour.
     """
-    os.makedirs(destination_folder, exist_ok=True)
+    cache = cache or get_raw_data_cache(destination_folder)
 
-    urls = {
-        "annual": annual_url,
-        "tempo": tempo_url
-    }
+    urls = {"annual": annual_url}
+    tempo_urls = [tempo_url] if isinstance(tempo_url, str) else list(tempo_url)
+    for url in tempo_urls:
+        urls[f"tempo {url.rsplit('=', 1)[-1]}" if len(tempo_urls) > 1 else "tempo"] = url
 
-    for label, url in urls.items():
+    def fetch(item: tuple) -> bool:
+        label, url = item
         try:
-            print(f"⬇️  Téléchargement {label.upper()} : {url}")
-            response = requests.get(url)
-            response.raise_for_status()
-            with ZipFile(BytesIO(response.content)) as zf:
-                zf.extractall(destination_folder)
-            print(f"✅ {label.upper()} téléchargé et extrait dans {destination_folder}")
+            return cache.fetch(url, label)
         except Exception as e:
-            print(f"❌ Échec du téléchargement de {label.upper()} : {e}")
-            raise e
+            logger.error(f"❌ Échec du téléchargement de {label.upper()} : {e}")
+            raise
 
+    if len(urls) <= 1 or max_workers <= 1:
+        return any([fetch(item) for item in urls.items()])
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix="fetch") as pool:
+        return any(list(pool.map(fetch, urls.items())))
 
-def convert_xls_eCO2mix_to_csv(input_path: str, output_path: str) -> None:
+
+# Lignes d'avertissement RTE à écarter et virgule finale à retirer (traitées par blocs)
+DISCLAIMER_MARKERS = ("RTE ne pourra", "L'ensemble des informations disponibles")
+_TRAILING_COMMA_RE = re.compile(r",[^\S\n]*$", re.M)
+CONVERT_CHUNK_SIZE = 1 << 22
+
+
+def _drop_disclaimer_lines(block: str) -> str:
+    for marker in DISCLAIMER_MARKERS:
+        idx = block.find(marker)
+        while idx != -1:
+            start = block.rfind('\n', 0, idx) + 1
+            end = block.find('\n', idx)
+            block = block[:start] + (block[end + 1:] if end != -1 else '')
+            idx = block.find(marker, start)
+    return block
+
+
+def _clean_eCO2mix_block(block: str, header: bool = False) -> str:
+    """
+    Nettoie un bloc de lignes complètes avec des opérations sur le bloc entier
+    (recherche de sous-chaînes, remplacements et découpage en C).
+    """
+    block = _drop_disclaimer_lines(block).replace('\t', ',')
+    if not header:
+        block = _TRAILING_COMMA_RE.sub('', block)
+    return '\n'.join(map(str.rstrip, block.split('\n')))
+
+
+def iter_clean_eCO2mix_chunks(input_path: str, chunk_size: int = CONVERT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Lit un export eCO2mix (cp1252, tabulé) par blocs et produit du CSV propre.
+
+    Même règles que l'ancienne conversion ligne à ligne : lignes d'avertissement
+    supprimées, tabulations remplacées par des virgules, virgule finale retirée
+    (sauf sur l'en-tête) et espaces de fin supprimés.
+    """
     with open(input_path, 'r', encoding='cp1252') as f:
-        lines = f.readlines()
+        header = f.readline()
+        if header:
+            yield _clean_eCO2mix_block(header if header.endswith('\n') else header + '\n', header=True)
+        carry = ''
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind('\n') + 1
+            carry, block = block[cut:], block[:cut]
+            if block:
+                yield _clean_eCO2mix_block(block)
+        if carry:
+            yield _clean_eCO2mix_block(carry + '\n')
+
+
+class _ChunkReader:
+    """
+    Adaptateur fichier (méthode `read`) au-dessus d'un itérateur de blocs texte,
+    pour alimenter `pd.read_csv` sans fichier CSV intermédiaire.
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self._buffer = ''
 
-    cleaned_lines = []
-    for i, line in enumerate(lines):
-        if "RTE ne pourra" in line or "L'ensemble des informations disponibles" in line:
-            continue
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.read(1 << 16)
+        if not line:
+            raise StopIteration
+        return line
+
+
+def read_xls_eCO2mix(input_path: str) -> pd.DataFrame:
+    """
+    Charge directement un export eCO2mix en DataFrame, en streaming.
+    """
+    return pd.read_csv(_ChunkReader(iter_clean_eCO2mix_chunks(input_path)))
 
-        line = line.replace('\t', ',')
-        if i > 0:
-            line = re.sub(r',\s*$', '', line)
-        cleaned_lines.append(line.rstrip() + '\n')
 
+def convert_xls_eCO2mix_to_csv(input_path: str, output_path: str) -> None:
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.writelines(cleaned_lines)
+        for chunk in iter_clean_eCO2mix_chunks(input_path):
+            f.write(chunk)
+
+
+def _map_files(func: Callable, files: List[str], max_workers: Optional[int] = None) -> list:
+    """
+    Applique `func` à chaque fichier, en parallèle sur plusieurs processus s'il y en a plusieurs.
+    """
+    max_workers = max_workers or min(len(files), os.cpu_count() or 1)
+    if len(files) <= 1 or max_workers <= 1:
+        return [func(f) for f in files]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(func, files))
+
+
+def _convert_to_folder(args: tuple) -> None:
+    file, csv_path = args
+    convert_xls_eCO2mix_to_csv(file, os.path.join(csv_path, os.path.basename(file).replace(".xls", ".csv")))
 
 
-def convert_all_xls_eCO2mix_data(xls_path: str, csv_path: str) -> None:
+def convert_all_xls_eCO2mix_data(xls_path: str, csv_path: str, max_workers: int = None) -> None:
     os.makedirs(csv_path, exist_ok=True)
     xls_files = glob.glob(os.path.join(xls_path, "*.xls"))
-    for file in xls_files:
-        csv_file = os.path.join(csv_path, os.path.basename(file).replace(".xls", ".csv"))
-        convert_xls_eCO2mix_to_csv(file, csv_file)
+    _map_files(_convert_to_folder, [(f, csv_path) for f in xls_files], max_workers)
+
+
+def load_all_xls_eCO2mix_data(xls_path: str, max_workers: int = None) -> Dict[str, pd.DataFrame]:
+    """
+    Charge tous les exports .xls d'un dossier, en parallèle sur les cœurs disponibles.
+
+    Returns:
+        Dict[str, pd.DataFrame]: DataFrames indexés par nom de fichier (sans extension), triés par nom.
+    """
+    xls_files = sorted(glob.glob(os.path.join(xls_path, "*.xls")))
+    frames = _map_files(read_xls_eCO2mix, xls_files, max_workers)
+    return {os.path.splitext(os.path.basename(f))[0]: df for f, df in zip(xls_files, frames)}
+
+
+def concat_eCO2mix_frames(frames: Dict[str, pd.DataFrame], pattern: str) -> pd.DataFrame:
+    """
+    Équivalent en mémoire de `concat_eCO2mix_*_data` : concatène les fichiers dont le nom correspond.
+    """
+    dfs = [df for name, df in frames.items() if fnmatch(name, pattern)]
+    return pd.concat(dfs) if len(dfs) > 1 else dfs[0]
 
 
 def load_data(filepath: str) -> pd.DataFrame:
@@ -69,7 +202,20 @@ def load_data(filepath: str) -> pd.DataFrame:
 
 def preprocess_annual_data(df: pd.DataFrame) -> pd.DataFrame:
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Datetime'] = pd.to_datetime(df['Date'].dt.strftime("%Y-%m-%d") + " " + df['Heures'], errors='coerce')
+    # Datetime = Date + minutes depuis minuit, sans passer par des chaînes
+    minutes = parse_hour_minutes(df['Heures'])
+    datetimes = (df['Date'] + pd.to_timedelta(minutes, unit='min')).to_numpy(copy=True)
+    present = df['Heures'].notna().to_numpy() & df['Date'].notna().to_numpy()
+    slow = np.isnan(minutes) & present
+    if slow.any():
+        # Chemin lent sur les seules valeurs atypiques. Le format est celui que pandas
+        # déduit du premier élément de la colonne complète, comme dans l'ancien calcul.
+        first_is_fast = not np.isnan(minutes[np.argmax(present)])
+        fallback = pd.to_datetime(df.loc[slow, 'Date'].dt.strftime("%Y-%m-%d") + " " + df.loc[slow, 'Heures'],
+                                  format="%Y-%m-%d %H:%M" if first_is_fast else None,
+                                  errors='coerce')
+        datetimes[slow] = fallback.to_numpy().astype(datetimes.dtype)
+    df['Datetime'] = datetimes
     df = df[['Date', 'Heures', 'Datetime', 'Consommation']].dropna()
     return df
 
@@ -77,6 +223,8 @@ def preprocess_annual_data(df: pd.DataFrame) -> pd.DataFrame:
 def preprocess_tempo_data(df: pd.DataFrame) -> pd.DataFrame:
     df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
     one_hot = pd.get_dummies(df['Type de jour TEMPO'], prefix='Type de jour TEMPO')
+    # Les trois colonnes sont toujours présentes, même si une couleur n'apparaît pas dans les fichiers
+    one_hot = one_hot.reindex(columns=TEMPO_COLUMNS, fill_value=False)
     return pd.concat([df[['Date']], one_hot], axis=1)
 
 
@@ -92,9 +240,24 @@ def concat_eCO2mix_tempo_data(path_tempo: str) -> pd.DataFrame:
     return pd.concat(dfs) if len(dfs) > 1 else dfs[0]
 
 
-def merge_eCO2mix_data(df_annual: pd.DataFrame, df_tempo: pd.DataFrame) -> pd.DataFrame:
-    df = pd.merge(df_annual, df_tempo, on="Date", how="left")
-    return df
+def merge_eCO2mix_data(df_annual: pd.DataFrame, df_tempo: pd.DataFrame,
+                       calendar: Optional[TempoCalendar] = None) -> pd.DataFrame:
+    """
+    Ajoute les colonnes TEMPO aux lignes annuelles par lecture directe dans un calendrier
+    indexé par jour (voir `TempoCalendar`), au lieu d'une jointure `pd.merge` sur `Date`.
+    Les jours sans couleur sont écartés, comme le faisait `preprocess_eCO2mix_data`.
+
+    Args:
+        df_annual (pd.DataFrame): Lignes annuelles (colonne `Date`).
+        df_tempo (pd.DataFrame): Jours TEMPO (`preprocess_tempo_data`).
+        calendar (TempoCalendar): Calendrier persistant à compléter avec `df_tempo` et à utiliser
+            (les saisons qu'il connaît déjà restent disponibles). Par défaut, calendrier de `df_tempo` seul.
+    """
+    if calendar is None:
+        calendar = TempoCalendar.from_frame(df_tempo)
+    else:
+        calendar.update(df_tempo['Date'], TempoCalendar.codes_of_frame(df_tempo))
+    return calendar.join(df_annual.reset_index(drop=True))
 
 
 def preprocess_eCO2mix_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -103,6 +266,29 @@ def preprocess_eCO2mix_data(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def build_eCO2mix_dataset(xls_path: str, max_workers: int = None,
+                          calendar: Optional[TempoCalendar] = None) -> pd.DataFrame:
+    """
+    Chaîne complète fichiers bruts -> jeu fusionné et nettoyé (annual + TEMPO).
+    Utilisée pour (re)construire le stock Parquet quand les fichiers bruts changent.
+    Les exports sont lus en streaming et en parallèle, sans CSV intermédiaire.
+    Avec `calendar`, les jours TEMPO lus y sont ajoutés (voir `merge_eCO2mix_data`).
+    """
+    with metrics.stage("conversion") as stage:
+        frames = load_all_xls_eCO2mix_data(xls_path, max_workers=max_workers)
+        stage.rows = sum(len(df) for df in frames.values())
+
+    with metrics.stage("concat") as stage:
+        annual_cleaned = preprocess_annual_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_*"))
+        tempo_cleaned = preprocess_tempo_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_tempo*"))
+        stage.rows = len(annual_cleaned)
+
+    with metrics.stage("merge") as stage:
+        merged = preprocess_eCO2mix_data(merge_eCO2mix_data(annual_cleaned, tempo_cleaned, calendar))
+        stage.rows = len(merged)
+    return merged
+
+
 def preprocess_eCO2mix_data_engineered(df: pd.DataFrame) -> pd.DataFrame:
     cols = [c for c in df.columns if 'lag' in c.lower() or 'rolling' in c.lower()]
     df = df.dropna(subset=cols)
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from typing import List
+from typing import List, Optional
 
 def create_date_features(df: pd.DataFrame, date_column: str = 'Date') -> pd.DataFrame:
     """
@@ -108,20 +108,322 @@ def create_cyclical_features(
 
     return df
 
+def parse_hour_minutes(hours: pd.Series) -> np.ndarray:
+    """
+    Convertit une colonne horaire au format HH:MM en minutes depuis minuit, en une passe vectorisée.
+
+    Args:
+        hours (pd.Series): Colonne horaire (ex: 'Heures').
+
+    Returns:
+        np.ndarray: Minutes depuis minuit (float64), NaN pour toute valeur qui n'est
+            pas exactement au format HH:MM valide (à traiter par le chemin lent).
+    """
+    lengths = hours.str.len().to_numpy(dtype=float, na_value=np.nan) if len(hours) else np.empty(0)
+    well_formed = lengths == 5
+    # Caractères en code point (UCS-4) : une ligne de 5 entiers par valeur
+    chars = (hours.where(well_formed, "xx:xx").to_numpy(dtype="U5")
+             .view(np.uint32).reshape(-1, 5).astype(np.int64) - ord('0'))
+    digits = chars[:, [0, 1, 3, 4]]
+    hour = chars[:, 0] * 10 + chars[:, 1]
+    minute = chars[:, 3] * 10 + chars[:, 4]
+    valid = (well_formed
+             & (chars[:, 2] == ord(':') - ord('0'))
+             & ((digits >= 0) & (digits <= 9)).all(axis=1)
+             & (hour < 24) & (minute < 60))
+    return np.where(valid, hour * 60 + minute, np.nan)
+
+
+def hour_of_day(hours: pd.Series) -> np.ndarray:
+    """
+    Heure (0-23, int64) d'une colonne HH:MM, via `parse_hour_minutes`.
+    Les valeurs atypiques passent par l'ancien chemin (erreur si non interprétable).
+    """
+    minutes = parse_hour_minutes(hours)
+    invalid = np.isnan(minutes)
+    if invalid.any():
+        minutes[invalid] = hours[invalid].apply(lambda x: pd.to_datetime(x, format='%H:%M').hour) * 60
+    return minutes.astype(np.int64) // 60
+
+
 def create_hour_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Extrait l'heure et l'encode cycliquement à partir d'une colonne horaire.
+    Les heures sont lues en minutes depuis minuit et les colonnes remplies par opérations sur tableaux.
 
     Args:
         df (pd.DataFrame): DataFrame contenant une colonne horaire au format HH:MM.
         hour_column (str): Nom de la colonne contenant les heures.
 
     Returns:
-        pd.DataFrame: DataFrame avec 'hour', 'hour_sin', 'hour_cos'.
+        pd.DataFrame: DataFrame avec 'hour_transformed', 'hour_sin', 'hour_cos'.
     """
     assert 'Heures' in df.columns, "La colonne 'Heures' doit être présente dans le DataFrame."
-    return create_cyclical_features(df,
-                                    column='Heures',
-                                    max_val=24, 
-                                    transform_func=lambda x: pd.to_datetime(x, format='%H:%M').hour,
-                                    prefix='hour')
\ No newline at end of file
+    hour = hour_of_day(df['Heures'])
+
+    df['hour_transformed'] = hour
+    df['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+    df['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+    return df
+
+
+# Colonnes reprises telles quelles depuis le jeu fusionné (one-hot TEMPO)
+TEMPO_COLUMNS = ['Type de jour TEMPO_BLANC', 'Type de jour TEMPO_BLEU', 'Type de jour TEMPO_ROUGE']
+DATE_FEATURES = ['year', 'month', 'day', 'weekday', 'weekofyear', 'quarter', 'dayofyear',
+                 'is_weekend', 'is_end_of_month']
+HOUR_FEATURES = ['hour_transformed', 'hour_sin', 'hour_cos']
+
+
+class FeaturePipeline:
+    """
+    Pipeline déclaratif équivalent à l'enchaînement create_date_features ->
+    create_hour_features -> create_lag_features -> create_rolling_features ->
+    preprocess_eCO2mix_data_engineered -> split_features_target.
+
+    Les données sont triées une seule fois, chaque feature est calculée sur des
+    tableaux NumPy et la matrice finale est allouée en une fois, dans l'ordre
+    de colonnes attendu par le scaler. La même définition sert à l'entraînement
+    (`transform_with_target`) et au service (`transform`).
+
+    Args:
+        target (str): Colonne cible utilisée pour les lags et la moyenne mobile.
+        lags (List[int]): Décalages (en nombre de lignes).
+        window (int): Taille de la moyenne mobile (décalée d'une ligne).
+        passthrough (List[str]): Colonnes reprises telles quelles en tête de matrice.
+    """
+
+    def __init__(self,
+                 target: str = 'Consommation',
+                 lags: List[int] = (1, 2, 3),
+                 window: int = 3,
+                 passthrough: List[str] = TEMPO_COLUMNS):
+        assert window > 0, "La taille de la fenêtre doit être supérieure à 0."
+        self.target = target
+        self.lags = list(lags)
+        self.window = window
+        self.passthrough = list(passthrough)
+
+    @property
+    def lag_columns(self) -> List[str]:
+        return [f'{self.target}_lag_{lag}' for lag in self.lags]
+
+    @property
+    def rolling_column(self) -> str:
+        return f'{self.target}_rolling_mean_{self.window}'
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.passthrough + DATE_FEATURES + HOUR_FEATURES + self.lag_columns + [self.rolling_column]
+
+    @property
+    def feature_dtypes(self) -> dict:
+        """
+        Types des colonnes produits par l'ancien enchaînement (signature des modèles loggés).
+        """
+        dtypes = {col: 'bool' for col in self.passthrough}
+        dtypes.update({col: 'int32' for col in DATE_FEATURES})
+        dtypes.update({'weekofyear': 'UInt32', 'is_weekend': 'bool', 'is_end_of_month': 'bool',
+                       'hour_transformed': 'int64'})
+        return dtypes
+
+    @property
+    def history_rows(self) -> int:
+        """
+        Nombre de lignes d'historique à fournir (`history`) pour que la première ligne
+        reçoive les mêmes lags et la même moyenne mobile qu'au milieu d'une série continue.
+        """
+        return max(self.lags + [self.window])
+
+    @staticmethod
+    def _same_group(groups: np.ndarray, offset: int) -> np.ndarray:
+        # Un décalage ne doit jamais traverser la frontière entre deux groupes
+        return groups[offset:] == groups[:len(groups) - offset]
+
+    def _lagged(self, values: np.ndarray, groups: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        n = len(values)
+        out = []
+        for lag in self.lags:
+            shifted = np.full(n, np.nan)
+            if lag < n:
+                shifted[lag:] = values[:n - lag]
+                if groups is not None:
+                    shifted[lag:][~self._same_group(groups, lag)] = np.nan
+            out.append(shifted)
+        return out
+
+    def _rolling_mean(self, values: np.ndarray, groups: Optional[np.ndarray] = None) -> np.ndarray:
+        # Moyenne des `window` valeurs précédentes (shift(1)), NaN ignorés (min_periods=1)
+        n = len(values)
+        sums = np.zeros(n)
+        counts = np.zeros(n)
+        for offset in range(1, self.window + 1):
+            if offset >= n:
+                break
+            shifted = values[:n - offset]
+            valid = ~np.isnan(shifted)
+            if groups is not None:
+                valid &= self._same_group(groups, offset)
+            sums[offset:] += np.where(valid, shifted, 0.0)
+            counts[offset:] += valid
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    @staticmethod
+    def _prepend_history(target: np.ndarray, groups: Optional[np.ndarray], history) -> tuple:
+        # Valeurs d'historique insérées devant chaque série (ou chaque groupe), puis masquées en sortie
+        if groups is None:
+            history = np.asarray(history, dtype=float)
+            extended = np.concatenate([history, target])
+            return extended, None, np.arange(len(history), len(extended))
+        bounds = np.flatnonzero(np.diff(groups)) + 1
+        pieces, piece_groups, real = [], [], []
+        offset = 0
+        for segment, segment_groups in zip(np.split(target, bounds), np.split(groups, bounds)):
+            prefix = np.asarray(history.get(segment_groups[0], ()), dtype=float)
+            pieces += [prefix, segment]
+            piece_groups += [np.full(len(prefix), segment_groups[0]), segment_groups]
+            real.append(np.arange(offset + len(prefix), offset + len(prefix) + len(segment)))
+            offset += len(prefix) + len(segment)
+        return np.concatenate(pieces), np.concatenate(piece_groups), np.concatenate(real)
+
+    @staticmethod
+    def calendar_features(datetimes: np.ndarray, dates: np.ndarray):
+        """
+        Colonnes `DATE_FEATURES` puis `HOUR_FEATURES`, dans cet ordre, une à une (générateur).
+
+        Args:
+            datetimes (np.ndarray): Horodatages (datetime64) des lignes.
+            dates (np.ndarray): Jour (datetime64, minuit) de chaque ligne.
+        """
+        # Features calendaires calculées une fois par jour puis diffusées sur les lignes
+        days, inverse = np.unique(dates, return_inverse=True)
+        calendar = pd.DatetimeIndex(days)
+        weekday = calendar.weekday.to_numpy()
+        per_day = [calendar.year.to_numpy(), calendar.month.to_numpy(), calendar.day.to_numpy(), weekday,
+                   calendar.isocalendar().week.to_numpy(dtype=np.int64), calendar.quarter.to_numpy(),
+                   calendar.dayofyear.to_numpy(), weekday >= 5, calendar.is_month_end]
+        for values in per_day:
+            yield values[inverse]
+
+        # Heure = décalage entier Datetime - Date (Datetime est construit à partir de Heures)
+        hour = (datetimes - dates) // np.timedelta64(1, 'h')
+        yield hour
+        yield np.sin(2 * np.pi * hour / 24)
+        yield np.cos(2 * np.pi * hour / 24)
+
+    def _compute(self, df: pd.DataFrame, groups: Optional[np.ndarray] = None, history=None) -> tuple:
+        assert self.target in df.columns, f"La colonne '{self.target}' doit être présente dans le DataFrame."
+        assert 'Datetime' in df.columns, "La colonne 'Datetime' doit être présente dans le DataFrame."
+
+        datetimes = df['Datetime'].to_numpy()
+        if groups is None:
+            order = np.argsort(datetimes, kind='stable')
+        else:
+            order = np.lexsort((datetimes, groups))  # Tri stable par groupe puis par date
+            groups = np.asarray(groups)[order]
+        target = pd.to_numeric(df[self.target], errors='coerce').to_numpy(dtype=float)[order]
+
+        if history is None:
+            lagged = self._lagged(target, groups) + [self._rolling_mean(target, groups)]
+        else:
+            extended, extended_groups, real = self._prepend_history(target, groups, history)
+            lagged = [values[real] for values in
+                      self._lagged(extended, extended_groups) + [self._rolling_mean(extended, extended_groups)]]
+        keep = np.ones(len(target), dtype=bool)
+        for values in lagged:
+            keep &= ~np.isnan(values)
+        rows = order[keep]
+
+        dates = df['Date']
+        if not pd.api.types.is_datetime64_dtype(dates):
+            dates = pd.to_datetime(dates)
+        calendar = self.calendar_features(datetimes[rows], dates.to_numpy()[rows])
+
+        def columns():
+            # Générateur : chaque colonne temporaire est libérée dès qu'elle est recopiée
+            for col in self.passthrough:
+                yield df[col].to_numpy()[rows] if col in df.columns else np.zeros(len(rows))
+            yield from calendar
+            for values in lagged:
+                yield values[keep]
+
+        return columns(), target[keep], df.index[rows], None if groups is None else groups[keep], datetimes[rows]
+
+    def _matrix(self, columns, n_rows: int) -> np.ndarray:
+        matrix = np.empty((n_rows, len(self.feature_names)), dtype=np.float64)
+        for j, values in enumerate(columns):
+            matrix[:, j] = values
+        return matrix
+
+    def transform_array(self, df: pd.DataFrame, history: Optional[np.ndarray] = None,
+                        with_datetimes: bool = False):
+        """
+        Matrice de features float64 contiguë (une seule allocation), colonnes dans l'ordre de `feature_names`.
+        Mêmes lignes que `transform` (voir `history`), sans DataFrame intermédiaire.
+        Avec `with_datetimes`, renvoie (X, Datetime de chaque ligne de X).
+        """
+        columns, _, index, _, datetimes = self._compute(df, history=history)
+        X = self._matrix(columns, len(index))
+        return (X, datetimes) if with_datetimes else X
+
+    def _frame(self, columns, index: pd.Index) -> pd.DataFrame:
+        dtypes = self.feature_dtypes
+        data = {name: pd.array(values, dtype=dtypes[name]) if name in dtypes else values
+                for name, values in zip(self.feature_names, columns)}
+        return pd.DataFrame(data, index=index)
+
+    def frame(self, matrix: np.ndarray) -> pd.DataFrame:
+        """
+        Matrice au format de `transform_array` -> DataFrame au format de `transform` (types de la signature).
+        """
+        return self._frame(np.asarray(matrix).T, pd.RangeIndex(len(matrix)))
+
+    def transform(self, df: pd.DataFrame, history: Optional[np.ndarray] = None, with_datetimes: bool = False):
+        """
+        Matrice de features au format DataFrame, avec les types de l'ancien enchaînement
+        (ceux de la signature des modèles loggés dans MLflow).
+
+        Args:
+            df (pd.DataFrame): Lignes à transformer.
+            history (np.ndarray): Valeurs de la cible qui précèdent immédiatement `df` (voir
+                `HistoryBuffer.before`). Avec au moins `history_rows` valeurs, aucune ligne n'est
+                perdue faute de lag ; sans historique, les premières lignes sont supprimées.
+            with_datetimes (bool): Renvoie (X, Datetime de chaque ligne de X) : les lignes gardées
+                sont triées par date et peuvent sauter des pas (cible manquante).
+        """
+        columns, _, index, _, datetimes = self._compute(df, history=history)
+        X = self._frame(columns, index)
+        return (X, datetimes) if with_datetimes else X
+
+    def transform_groups(self, df: pd.DataFrame, groups: np.ndarray, history: Optional[dict] = None,
+                         as_array: bool = False) -> tuple:
+        """
+        Une seule passe sur plusieurs séries empilées (ex: plusieurs périodes d'un lot).
+
+        Les lignes sont triées par groupe puis par date, et lags et moyenne mobile
+        s'arrêtent à la frontière de chaque groupe : les lignes d'un groupe reçoivent
+        exactement les features d'un appel séparé à `transform` sur ce groupe seul.
+
+        Args:
+            df (pd.DataFrame): Lignes de tous les groupes (une ligne peut apparaître dans plusieurs groupes).
+            groups (np.ndarray): Identifiant entier du groupe de chaque ligne de `df`.
+            history (dict): Identifiant de groupe -> valeurs de la cible qui précèdent ce groupe.
+            as_array (bool): X sous forme de matrice float64 contiguë (comme `transform_array`).
+
+        Returns:
+            tuple: (X au format de `transform`, identifiant de groupe de chaque ligne de X, triés par groupe,
+                Datetime de chaque ligne de X).
+        """
+        columns, _, index, kept_groups, datetimes = self._compute(df, groups=groups, history=history)
+        if as_array:
+            return self._matrix(columns, len(index)), kept_groups, datetimes
+        # Index positionnel : une même ligne source peut apparaître dans plusieurs groupes
+        return self._frame(columns, pd.RangeIndex(len(index))), kept_groups, datetimes
+
+    def transform_with_target(self, df: pd.DataFrame) -> tuple:
+        """
+        Variante entraînement : renvoie (X, y) comme `split_features_target`.
+        """
+        columns, target, index, _, _ = self._compute(df)
+        y = pd.DataFrame({self.target: target.astype('float32')}, index=index)
+        return self._frame(columns, index), y
@@ -0,0 +1,101 @@
+import logging
+from typing import Callable
+
+import numpy as np
+
+from core.features_engineering import DATE_FEATURES, HOUR_FEATURES, FeaturePipeline
+
+logger = logging.getLogger(__name__)
+
+# Pas des données eCO2mix : une ligne par quart d'heure (les lags sont comptés en lignes)
+DEFAULT_STEP = np.timedelta64(15, "m")
+
+
+class RecursiveForecaster:
+    """
+    Prévision récursive multi-horizon : chaque prédiction est réinjectée dans les lags et
+    la moyenne mobile du pas suivant.
+
+    Toutes les séries (scénarios) avancent ensemble : à chaque pas, une matrice
+    (n_séries × n_features) est remplie par copies de tableaux puis prédite en un appel.
+    Les features calendaires de tout l'horizon sont calculées une seule fois au départ ;
+    lags et moyenne mobile sont lus dans un tableau (n_séries × (historique + horizon))
+    où chaque prédiction est écrite à sa place. Aucun DataFrame dans la boucle.
+
+    Les features sont exactement celles de `FeaturePipeline` pour une série continue,
+    dont les valeurs futures seraient les prédictions.
+
+    Args:
+        pipeline (FeaturePipeline): Définition des features (ordre des colonnes, lags, fenêtre).
+        predict (Callable): Matrice float64 (n, n_features) non standardisée -> n prédictions.
+            Peut modifier la matrice reçue (elle est réécrite à chaque pas).
+        step (np.timedelta64): Écart entre deux lignes successives.
+    """
+
+    def __init__(self, pipeline: FeaturePipeline, predict: Callable[[np.ndarray], np.ndarray],
+                 step: np.timedelta64 = DEFAULT_STEP):
+        self.pipeline = pipeline
+        self.predict = predict
+        self.step = np.timedelta64(step, "ns")
+        self.lags = np.asarray(pipeline.lags, dtype=np.int64)
+        self.window = pipeline.window
+        self.history_rows = pipeline.history_rows
+
+        # Position des blocs de colonnes dans la matrice de features
+        n_passthrough = len(pipeline.passthrough)
+        n_calendar = len(DATE_FEATURES) + len(HOUR_FEATURES)
+        self._calendar = slice(n_passthrough, n_passthrough + n_calendar)
+        self._lagged = slice(self._calendar.stop, self._calendar.stop + len(self.lags))
+        self._rolling = self._lagged.stop
+        self.n_features = len(pipeline.feature_names)
+        assert self._rolling == self.n_features - 1, "Ordre des colonnes inattendu."
+
+    def timestamps(self, start, horizon: int) -> np.ndarray:
+        """Horodatages (datetime64[ns]) des `horizon` pas à partir de `start`."""
+        return np.datetime64(start, "ns") + np.arange(horizon) * self.step
+
+    def calendar(self, timestamps: np.ndarray) -> np.ndarray:
+        """Features calendaires (horizon × colonnes), calculées une fois pour toute la prévision."""
+        dates = timestamps.astype("datetime64[D]").astype("datetime64[ns]")
+        block = np.empty((len(timestamps), self._calendar.stop - self._calendar.start))
+        for j, values in enumerate(self.pipeline.calendar_features(timestamps, dates)):
+            block[:, j] = values
+        return block
+
+    def forecast(self, history: np.ndarray, start, horizon: int, passthrough: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            history (np.ndarray): Dernières valeurs observées de chaque série (n_séries × ≥ `history_rows`),
+                la dernière colonne précédant immédiatement `start`.
+            start: Horodatage du premier pas prédit.
+            horizon (int): Nombre de pas.
+            passthrough (np.ndarray): Colonnes reprises telles quelles (ex: TEMPO), constantes
+                (n_séries × n_colonnes) ou par pas (n_séries × horizon × n_colonnes).
+
+        Returns:
+            np.ndarray: Prédictions (n_séries × horizon), float64.
+        """
+        history = np.atleast_2d(np.asarray(history, dtype=np.float64))
+        n_series, h = history.shape
+        if h < self.history_rows:
+            raise ValueError(f"Au moins {self.history_rows} valeurs d'historique attendues, reçu {h}.")
+        history = history[:, h - self.history_rows:]
+        if not np.isfinite(history).all():
+            raise ValueError("L'historique ne doit pas contenir de valeur manquante.")
+        passthrough = np.asarray(passthrough, dtype=np.float64)
+        if passthrough.ndim == 2:
+            passthrough = np.broadcast_to(passthrough[:, None, :], (n_series, horizon, passthrough.shape[-1]))
+
+        h = self.history_rows
+        values = np.empty((n_series, h + horizon))
+        values[:, :h] = history
+        calendar = self.calendar(self.timestamps(start, horizon))
+        X = np.empty((n_series, self.n_features))
+        for k in range(horizon):
+            pos = h + k
+            X[:, :self._calendar.start] = passthrough[:, k]
+            X[:, self._calendar] = calendar[k]
+            X[:, self._lagged] = values[:, pos - self.lags]
+            X[:, self._rolling] = values[:, pos - self.window:pos].mean(axis=1)
+            values[:, pos] = self.predict(X)
+        return values[:, h:]
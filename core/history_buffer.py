@@ -0,0 +1,97 @@
+import os
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Une année de données quart-horaires : ~560 Ko (horodatage int64 + valeur float64)
+HISTORY_BUFFER_ROWS = int(os.getenv("HISTORY_BUFFER_ROWS", 366 * 96))
+
+
+class HistoryBuffer:
+    """
+    Historique borné et trié d'une série (ex: `Consommation`), indexé par horodatage.
+
+    Deux tableaux NumPy contigus (horodatages int64 en ns, valeurs float64) de taille
+    2 × `capacity` : les ajouts se font en fin de tableau, et quand la fin est atteinte
+    les `capacity` dernières lignes sont recopiées en tête (coût amorti constant).
+    La partie utile reste contiguë et triée, donc interrogeable par recherche dichotomique.
+
+    Args:
+        capacity (int): Nombre maximal de lignes conservées (les plus anciennes sont oubliées).
+    """
+
+    def __init__(self, capacity: int = HISTORY_BUFFER_ROWS):
+        assert capacity > 0, "La capacité doit être supérieure à 0."
+        self.capacity = capacity
+        self._times = np.empty(2 * capacity, dtype=np.int64)
+        self._values = np.empty(2 * capacity, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None  # Version des données d'origine (ex: `EcO2mixStore.version`)
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._times[self._end - 1]) if len(self) else None
+
+    def append(self, timestamps, values) -> int:
+        """
+        Ajoute des lignes triées par horodatage. Les lignes déjà présentes à partir du premier
+        horodatage reçu sont remplacées (révisions des dernières mesures), les plus anciennes sont gardées.
+
+        Returns:
+            int: Nombre de lignes dans le tampon après l'ajout.
+        """
+        times = np.asarray(timestamps, dtype="datetime64[ns]").astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(times) == 0:
+            return len(self)
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        times, values = times[-self.capacity:], values[-self.capacity:]
+        with self._lock:
+            # Remplacement de la fin : on repart de la première ligne ≥ au premier horodatage reçu
+            self._end = self._start + int(np.searchsorted(self._times[self._start:self._end], times[0]))
+            if self._end + len(times) > len(self._times):
+                keep = min(len(self), self.capacity - len(times))
+                self._times[:keep] = self._times[self._end - keep:self._end]
+                self._values[:keep] = self._values[self._end - keep:self._end]
+                self._start, self._end = 0, keep
+            self._times[self._end:self._end + len(times)] = times
+            self._values[self._end:self._end + len(times)] = values
+            self._end += len(times)
+            self._start = max(self._start, self._end - self.capacity)
+            return len(self)
+
+    def before(self, timestamp, n: int) -> np.ndarray:
+        """
+        Les `n` dernières valeurs strictement antérieures à `timestamp` (moins si l'historique est plus court).
+        Recherche dichotomique puis copie de `n` valeurs : O(log N + n).
+        """
+        t = np.datetime64(pd.Timestamp(timestamp), "ns").astype(np.int64)
+        with self._lock:
+            stop = self._start + int(np.searchsorted(self._times[self._start:self._end], t))
+            return self._values[max(self._start, stop - n):stop].copy()
+
+    def last_observations(self, n: int) -> tuple:
+        """
+        Les `n` dernières valeurs jusqu'à la dernière mesure renseignée (les lignes finales
+        sans valeur, ex: quarts d'heure à venir du fichier temps réel, sont ignorées).
+
+        Returns:
+            tuple: (horodatage de la dernière mesure ou None, valeurs float64).
+        """
+        with self._lock:
+            valid = np.flatnonzero(~np.isnan(self._values[self._start:self._end]))
+            if len(valid) == 0:
+                return None, np.empty(0)
+            stop = self._start + int(valid[-1]) + 1
+            return pd.Timestamp(self._times[stop - 1]), self._values[max(self._start, stop - n):stop].copy()
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from zipfile import ZipFile
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.file_lock import file_lock
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_INDEX_NAME = ".cache_index.json"
+DOWNLOADS_DIR_NAME = ".downloads"
+
+# Durée (s) pendant laquelle une source vérifiée est réutilisée sans aucun appel réseau
+DEFAULT_MAX_AGE = float(os.getenv("ECO2MIX_CACHE_MAX_AGE", 900))
+DEFAULT_TIMEOUT = (float(os.getenv("ECO2MIX_CONNECT_TIMEOUT", 10)),
+                   float(os.getenv("ECO2MIX_READ_TIMEOUT", 120)))
+CHUNK_SIZE = 1 << 20
+
+
+def build_session(pool_size: int = 4, retries: int = 2) -> requests.Session:
+    """
+    Crée une session HTTP avec pool de connexions et relances sur erreurs transitoires.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries,
+                  backoff_factor=0.5,
+                  status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _reset_session_after_fork() -> None:
+    # Les sockets du pool seraient partagées avec le processus parent (gunicorn `preload_app`)
+    global _session, _session_lock
+    _session, _session_lock = None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_session_after_fork)
+
+
+def raw_folder_lock(folder: str):
+    """
+    Verrou du contenu d'un dossier brut : extraction d'une archive d'un côté, lecture
+    des fichiers pour construire le stock de l'autre (entre threads et entre workers).
+    """
+    return file_lock(os.path.join(folder, DOWNLOADS_DIR_NAME, "extract.lock"))
+
+
+def get_session() -> requests.Session:
+    """
+    Session partagée par tout le processus (réutilisation des connexions TCP/TLS).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+class RawDataCache:
+    """
+    Cache local des archives eCO2mix/TEMPO téléchargées depuis RTE.
+
+    Pour chaque URL, l'index `.cache_index.json` conserve l'ETag, le Last-Modified,
+    le hash SHA-256 de l'archive et la liste des fichiers extraits. Une source
+    vérifiée depuis moins de `max_age` secondes est servie sans accès réseau ;
+    au-delà, une requête conditionnelle est envoyée et l'extraction n'a lieu que
+    si le contenu a réellement changé.
+    """
+
+    def __init__(self,
+                 destination_folder: str,
+                 session: Optional[requests.Session] = None,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.destination_folder = destination_folder
+        self.session = session
+        self.timeout = timeout
+        self.max_age = max_age
+        self.index_path = os.path.join(destination_folder, CACHE_INDEX_NAME)
+        self._lock = threading.Lock()
+        self._index: Dict[str, dict] = self._read_index()
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_index(self) -> None:
+        tmp_path = f"{self.index_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def _update_entry(self, url: str, **fields) -> dict:
+        # Lecture, fusion et écriture de l'index sous son verrou de fichier : deux workers qui
+        # mettent à jour des URL différentes ne s'écrasent pas (comme `TempoCalendar.save`)
+        with file_lock(f"{self.index_path}.lock"), self._lock:
+            # Entrées des autres URL éventuellement écrites par un autre worker entre-temps
+            self._index.update({u: e for u, e in self._read_index().items() if u != url})
+            entry = dict(self._index.get(url, {}))
+            entry.update(fields)
+            self._index[url] = entry
+            self._write_index()
+            return entry
+
+    def entry(self, url: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._index.get(url)
+            return dict(entry) if entry else None
+
+    def _extracted_files_present(self, entry: dict) -> bool:
+        members = entry.get("files") or []
+        return bool(members) and all(
+            os.path.exists(os.path.join(self.destination_folder, m)) for m in members
+        )
+
+    def is_fresh(self, url: str) -> bool:
+        """
+        Vrai si la source peut être servie sans aucune requête réseau.
+        """
+        entry = self.entry(url)
+        return (entry is not None
+                and time.time() - entry.get("checked_at", 0) < self.max_age
+                and self._extracted_files_present(entry))
+
+    def fingerprint(self) -> str:
+        """
+        Empreinte de l'ensemble des archives en cache (change dès qu'une source change).
+        """
+        with self._lock:
+            parts = sorted(f"{url}={e.get('sha256', '')}" for url, e in self._index.items())
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _download(self, url: str, headers: dict) -> Tuple[requests.Response, Optional[str], Optional[str]]:
+        """
+        Télécharge en streaming vers un fichier temporaire en calculant le SHA-256 au fil de l'eau.
+        """
+        session = self.session or get_session()
+        response = session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        with response:
+            if response.status_code == 304:
+                return response, None, None
+            response.raise_for_status()
+            downloads = os.path.join(self.destination_folder, DOWNLOADS_DIR_NAME)
+            os.makedirs(downloads, exist_ok=True)
+            # Nom unique : deux téléchargements simultanés n'écrivent jamais dans le même fichier
+            digest = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(dir=downloads, suffix=".part", delete=False) as f:
+                tmp_path = f.name
+                try:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        metrics.inc("eco2mix_download_bytes_total", len(chunk), "Octets téléchargés depuis RTE.")
+                except BaseException:
+                    f.close()
+                    os.remove(tmp_path)
+                    raise
+        return response, tmp_path, digest.hexdigest()
+
+    def _lock_path(self, url: str) -> str:
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".lock"
+        return os.path.join(self.destination_folder, DOWNLOADS_DIR_NAME, name)
+
+    def _reload_index(self) -> None:
+        # Un autre worker a pu télécharger la source pendant l'attente du verrou
+        with self._lock:
+            self._index.update(self._read_index())
+
+    def fetch(self, url: str, label: str = "") -> bool:
+        """
+        Garantit que le contenu extrait de `url` est présent et à jour.
+
+        Returns:
+            bool: True si de nouveaux fichiers ont été extraits.
+        """
+        label = (label or url).upper()
+        os.makedirs(self.destination_folder, exist_ok=True)
+        if self.is_fresh(url):
+            logger.info(f"♻️  {label} servi depuis le cache local (pas d'accès réseau)")
+            return False
+
+        # Un seul téléchargement/extraction par URL, entre threads et entre processus
+        with file_lock(self._lock_path(url)):
+            self._reload_index()
+            if self.is_fresh(url):
+                logger.info(f"♻️  {label} déjà mis à jour par un autre worker")
+                return False
+            return self._fetch_locked(url, label)
+
+    def _fetch_locked(self, url: str, label: str) -> bool:
+        entry = self.entry(url) or {}
+        headers = {}
+        if self._extracted_files_present(entry):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        logger.info(f"⬇️  Téléchargement {label} : {url}")
+        response, tmp_path, sha256 = self._download(url, headers)
+        validators = {
+            "etag": response.headers.get("ETag", entry.get("etag")),
+            "last_modified": response.headers.get("Last-Modified", entry.get("last_modified")),
+            "checked_at": time.time(),
+        }
+        if tmp_path is None:
+            self._update_entry(url, **validators)
+            logger.info(f"♻️  {label} inchangé (304)")
+            return False
+
+        try:
+            if sha256 == entry.get("sha256") and self._extracted_files_present(entry):
+                self._update_entry(url, **validators)
+                logger.info(f"♻️  {label} inchangé (hash identique), extraction ignorée")
+                return False
+
+            with ZipFile(tmp_path) as zf, raw_folder_lock(self.destination_folder):
+                members = [m for m in zf.namelist() if not m.endswith("/")]
+                zf.extractall(self.destination_folder)
+        finally:
+            os.remove(tmp_path)
+        self._update_entry(url, sha256=sha256, files=members, **validators)
+        logger.info(f"✅ {label} téléchargé et extrait dans {self.destination_folder}")
+        return True
+
+
+_caches: Dict[str, RawDataCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_raw_data_cache(destination_folder: str) -> RawDataCache:
+    """
+    Cache partagé par dossier de destination, pour que l'index ne soit relu qu'une fois.
+    """
+    key = os.path.abspath(destination_folder)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = RawDataCache(destination_folder)
+        return _caches[key]
@@ -0,0 +1,243 @@
+import os
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.features_engineering import TEMPO_COLUMNS
+from core.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Code d'un jour : 0 = couleur inconnue, puis 1, 2, 3 dans l'ordre de TEMPO_COLORS
+TEMPO_COLORS = ("BLEU", "BLANC", "ROUGE")
+TEMPO_URL = "https://eco2mix.rte-france.com/curves/downloadCalendrierTempo?season={season}"
+DEFAULT_CALENDAR_PATH = os.getenv("TEMPO_CALENDAR_PATH", "./data/03_primary/tempo_calendar.npz")
+
+
+def tempo_season(day: date) -> str:
+    """Saison TEMPO (1er septembre -> 31 août) contenant `day`, ex: "2024-2025"."""
+    start = day.year if day.month >= 9 else day.year - 1
+    return f"{start}-{start + 1}"
+
+
+def tempo_seasons(start: date, end: date) -> List[str]:
+    """Saisons TEMPO qui recouvrent `start`–`end` (inclus), dans l'ordre chronologique."""
+    first = start.year if start.month >= 9 else start.year - 1
+    last = end.year if end.month >= 9 else end.year - 1
+    return [f"{year}-{year + 1}" for year in range(first, last + 1)]
+
+
+def tempo_url(season: str) -> str:
+    return TEMPO_URL.format(season=season)
+
+
+def encode_colors(colors) -> np.ndarray:
+    """Couleurs ("BLEU", "BLANC", "ROUGE", autre) -> codes uint8 (0 pour une valeur inconnue)."""
+    values = np.asarray(colors, dtype=object)
+    codes = np.zeros(len(values), dtype=np.uint8)
+    for code, color in enumerate(TEMPO_COLORS, start=1):
+        codes[values == color] = code
+    return codes
+
+
+class TempoCalendar:
+    """
+    Couleur TEMPO de chaque jour, codée sur un octet et indexée par le numéro du jour.
+
+    `codes[i]` est la couleur du jour `origin + i` : la couleur d'une date s'obtient par une
+    soustraction et une lecture de tableau. Joindre N lignes horaires coûte O(N), sans
+    table de hachage ni tri, et un siècle de calendrier tient dans 36 Ko.
+
+    `update` remplace le couple (origin, codes) d'un bloc, sans jamais modifier un tableau
+    publié : un lecteur qui lit `_state` une fois par appel voit toujours un couple cohérent,
+    sans prendre de verrou.
+
+    Args:
+        origin (np.datetime64): Premier jour couvert.
+        codes (np.ndarray): Un code uint8 par jour à partir de `origin` (0 = inconnu).
+    """
+
+    def __init__(self, origin=None, codes: Optional[np.ndarray] = None):
+        origin = np.datetime64(origin, "D") if origin is not None else None
+        self._state: Tuple[Optional[np.datetime64], np.ndarray] = (
+            origin, np.asarray(codes if codes is not None else (), dtype=np.uint8).copy())
+        self._lock = threading.Lock()  # Écritures seulement
+
+    @property
+    def origin(self) -> Optional[np.datetime64]:
+        return self._state[0]
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._state[1]
+
+    def __len__(self) -> int:
+        """Nombre de jours dont la couleur est connue."""
+        return int(np.count_nonzero(self._state[1]))
+
+    @property
+    def last_day(self) -> Optional[date]:
+        origin, codes = self._state
+        known = np.flatnonzero(codes)
+        return (origin + int(known[-1])).astype(date) if len(known) else None
+
+    def covers(self, first: date, last: date) -> bool:
+        """Vrai si la couleur de chaque jour de `first` à `last` (inclus) est connue."""
+        days = np.arange(np.datetime64(first, "D"), np.datetime64(last, "D") + 1)
+        return bool((self.lookup(days) > 0).all())
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_column: str = "Date") -> "TempoCalendar":
+        """
+        Calendrier depuis un export TEMPO brut (colonne 'Type de jour TEMPO') ou déjà encodé
+        en one-hot (`preprocess_tempo_data`). Pour une date en double, la dernière ligne l'emporte.
+        """
+        calendar = cls()
+        calendar.update(df[date_column], cls.codes_of_frame(df))
+        return calendar
+
+    @staticmethod
+    def codes_of_frame(df: pd.DataFrame) -> np.ndarray:
+        if "Type de jour TEMPO" in df.columns:
+            return encode_colors(df["Type de jour TEMPO"].to_numpy())
+        codes = np.zeros(len(df), dtype=np.uint8)
+        for code, color in enumerate(TEMPO_COLORS, start=1):
+            column = f"Type de jour TEMPO_{color}"
+            if column in df.columns:
+                codes[df[column].fillna(False).to_numpy(dtype=bool)] = code
+        return codes
+
+    def update(self, dates, codes: np.ndarray) -> int:
+        """
+        Enregistre la couleur de jours (codes non nuls seulement), en étendant le tableau si besoin.
+
+        Returns:
+            int: Nombre de jours dont le code a changé.
+        """
+        days = np.asarray(dates)
+        if not np.issubdtype(days.dtype, np.datetime64):
+            days = pd.to_datetime(pd.Series(days), errors="coerce").to_numpy()
+        days = days.astype("datetime64[D]")
+        codes = np.asarray(codes, dtype=np.uint8)
+        valid = ~np.isnat(days) & (codes > 0)
+        days, codes = days[valid], codes[valid]
+        if len(days) == 0:
+            return 0
+        with self._lock:
+            origin, current = self._state
+            lo, hi = days.min(), days.max()
+            if origin is not None:
+                lo, hi = min(lo, origin), max(hi, origin + max(len(current) - 1, 0))
+            grown = np.zeros(int((hi - lo).astype(np.int64)) + 1, dtype=np.uint8)
+            if origin is not None:
+                offset = int((origin - lo).astype(np.int64))
+                grown[offset:offset + len(current)] = current
+            index = (days - lo).astype(np.int64)
+            changed = int(np.count_nonzero(grown[index] != codes))
+            grown[index] = codes
+            self._state = (lo, grown)  # Publication atomique du nouveau couple
+            return changed
+
+    @staticmethod
+    def _day_index(origin: np.datetime64, dates) -> np.ndarray:
+        # Numéro du jour depuis `origin`, en arithmétique entière sur la représentation
+        # datetime64 (bien plus rapide que les conversions d'unité) ; NaT -> très négatif
+        dates = np.asarray(dates)
+        if not np.issubdtype(dates.dtype, np.datetime64):
+            dates = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy()
+        unit = np.datetime_data(dates.dtype)[0]
+        per_day = np.timedelta64(1, "D") // np.timedelta64(1, unit)
+        origin = origin.astype(dates.dtype).view(np.int64)
+        return (dates.view(np.int64) - origin) // per_day
+
+    def lookup(self, dates) -> np.ndarray:
+        """
+        Code de chaque date (datetime64, heure ignorée), 0 hors calendrier. O(n).
+        """
+        origin, codes = self._state
+        if origin is None:
+            return np.zeros(np.shape(dates), dtype=np.uint8)
+        index = self._day_index(origin, dates)
+        # Case sentinelle (code 0) en fin de tableau pour toutes les dates hors calendrier
+        padded = np.append(codes, np.uint8(0))
+        index[(index < 0) | (index >= len(codes))] = len(codes)
+        return padded[index]
+
+    def lookup_or_last(self, dates) -> np.ndarray:
+        """
+        Comme `lookup`, mais un jour inconnu reçoit la dernière couleur connue avant lui.
+        """
+        origin, codes = self._state
+        if origin is None:
+            return np.zeros(np.shape(dates), dtype=np.uint8)
+        known = np.flatnonzero(codes)
+        index = self._day_index(origin, dates)
+        position = np.searchsorted(known, index, side="right") - 1
+        return np.where(position >= 0, codes[known[np.maximum(position, 0)]], 0).astype(np.uint8)
+
+    @staticmethod
+    def one_hot(codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Codes -> colonnes booléennes `TEMPO_COLUMNS`."""
+        return {column: codes == TEMPO_COLORS.index(column.rsplit("_", 1)[1]) + 1 for column in TEMPO_COLUMNS}
+
+    def join(self, df: pd.DataFrame, date_column: str = "Date") -> pd.DataFrame:
+        """
+        Ajoute les colonnes `TEMPO_COLUMNS` à `df` par lecture directe dans le calendrier.
+        Les lignes d'un jour sans couleur connue sont écartées (jointure interne).
+        """
+        codes = self.lookup(df[date_column].to_numpy())
+        known = codes > 0
+        joined = df[known] if not known.all() else df.copy(deep=False)
+        for column, values in self.one_hot(codes[known]).items():
+            joined[column] = values
+        return joined
+
+    def save(self, path: str = DEFAULT_CALENDAR_PATH) -> None:
+        """
+        Écriture atomique (fichier temporaire puis renommage), sous verrou entre workers.
+        Les jours connus du fichier et absents d'ici sont repris avant l'écriture : un
+        worker ne perd pas les saisons enregistrées par un autre.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        with file_lock(f"{path}.lock"):
+            disk_origin, disk_codes = TempoCalendar.load(path)._state
+            if disk_origin is not None:
+                days = disk_origin + np.flatnonzero(disk_codes)
+                missing = self.lookup(days) == 0
+                self.update(days[missing], disk_codes[np.flatnonzero(disk_codes)][missing])
+            origin, codes = self._state
+            origin = origin if origin is not None else np.datetime64("NaT", "D")
+            np.savez(tmp_path, origin=np.array([origin]), codes=codes)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CALENDAR_PATH) -> "TempoCalendar":
+        """Calendrier enregistré par `save`, ou calendrier vide si le fichier est absent ou illisible."""
+        try:
+            with np.load(path) as data:
+                origin = data["origin"][0]
+                return cls(None if np.isnat(origin) else origin, data["codes"])
+        except (FileNotFoundError, ValueError, KeyError, OSError) as e:
+            if os.path.exists(path):
+                logger.warning(f"⚠️ Calendrier TEMPO illisible ({path}), reconstruit : {e}")
+            return cls()
+
+
+_calendars: Dict[str, TempoCalendar] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_tempo_calendar(path: str = DEFAULT_CALENDAR_PATH) -> TempoCalendar:
+    """
+    Calendrier partagé par fichier, chargé depuis le disque au premier appel.
+    """
+    key = os.path.abspath(path)
+    with _calendars_lock:
+        if key not in _calendars:
+            _calendars[key] = TempoCalendar.load(path)
+        return _calendars[key]
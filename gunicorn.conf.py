@@ -0,0 +1,26 @@
+"""
+Service multi-workers pré-forké :
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Le maître importe l'application, charge modèles et données (`app.prefork.warm_up`)
+puis forke les workers, qui partagent cette mémoire en copie sur écriture.
+Les clients réseau créés par le maître (session HTTP, client boto3, producteur Kafka)
+sont abandonnés dans chaque worker (`os.register_at_fork`) et recréés au premier usage ;
+les reconstructions du stock et du calendrier TEMPO sont sérialisées par verrou de fichier.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+
+def when_ready(server):
+    if preload_app:
+        from app.prefork import freeze_heap, warm_up
+
+        warm_up()
+        freeze_heap()
@@ -1,82 +1,54 @@
-import pandas as pd
-from nannyml import PerformanceEstimator
-import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-
-# Charger les variables d'environnement
-load_dotenv()
-
-# Configuration email (à définir dans .env)
-ALERT_EMAIL_FROM = os.getenv("ALERT_EMAIL_FROM")
-ALERT_EMAIL_TO = os.getenv("ALERT_EMAIL_TO")
-ALERT_EMAIL_PASSWORD = os.getenv("ALERT_EMAIL_PASSWORD")
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-
-# Vérifier que les fichiers existent
-reference_path = "data/reference_predictions.csv"
-predictions_path = "data/predictions.csv"
-
-if not os.path.exists(reference_path) or not os.path.exists(predictions_path):
-    print("❌ Données de référence ou prédictions manquantes.")
-    exit(1)
-
-# Charger les données
-reference_data = pd.read_csv(reference_path)
-analysis_data = pd.read_csv(predictions_path)
-
-# Estimation de la performance (RMSE)
-estimator = PerformanceEstimator(
-    y_pred='y_pred',
-    timestamp_column='timestamp',
-    chunk_size=100,
-    metric='rmse',
-)
-
-estimator.fit(reference_data)
-estimated = estimator.estimate(analysis_data)
-
-# Dernier RMSE
-last_rmse = estimated['value'].iloc[-1]
-print(f"\n⭐ RMSE estimé : {last_rmse:.2f}")
-
-# Fonction d'envoi email
-def send_email_alert(rmse_value: float):
-    subject = "⚠️ Alerte RMSE - Superman Inference Drift"
-    body = f"""Alerte automatique 🚨
-
-Le dernier RMSE estimé dépasse le seuil de 700.
-
-🕒 Heure : {pd.Timestamp.now()}
-📈 RMSE détecté : {rmse_value:.2f}
-
-Merci de vérifier l'intégrité du modèle en production.
-
-— Système de monitoring Superman
 """
-    msg = MIMEMultipart()
-    msg['From'] = ALERT_EMAIL_FROM
-    msg['To'] = ALERT_EMAIL_TO
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
+Estimation ponctuelle du RMSE sur une période de l'archive des prédictions (hors API).
 
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(ALERT_EMAIL_FROM, ALERT_EMAIL_PASSWORD)
-            server.send_message(msg)
-        print("📬 Alerte envoyée par e-mail.")
-    except Exception as e:
-        print(f"❌ Erreur envoi mail : {e}")
+L'API utilise directement `monitoring.service.monitoring_service`, qui garde l'estimateur
+en mémoire ; ce script rejoue à la main des semaines ou des mois de prédictions archivées.
+Pour un horodatage prédit plusieurs fois, la prédiction la plus récente (plus grand T1) est gardée.
 
-# Détection & alerte
-if last_rmse > 700:
-    print("⚠️ Alerte critique : RMSE > 700 — drift ou dégradation détectée !")
-    with open("data/alerts.log", "a") as log:
-        log.write(f"[ALERTE] {pd.Timestamp.now()}: RMSE={last_rmse:.2f}\n")
-    send_email_alert(last_rmse)
-else:
-    print("✅ RMSE en-dessous du seuil acceptable.")
+    python monitoring/nannyml_runner.py --start 2025-01-01 --end 2025-03-31 [--model-version 7]
+"""
+import os
+import sys
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.prediction_archive import prediction_archive  # noqa: E402
+from monitoring.service import MONITORING_CHUNK_SIZE, REFERENCE_PATH, MonitoringService  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=30))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today() + timedelta(days=7))
+    parser.add_argument("--model-version", default=None)
+    args = parser.parse_args()
+
+    analysis_data = prediction_archive.read_between(args.start, args.end, args.model_version)
+    analysis_data = analysis_data.drop_duplicates("timestamp", keep="last").reset_index(drop=True)
+    if not os.path.exists(REFERENCE_PATH) or analysis_data.empty:
+        print("❌ Données de référence ou prédictions manquantes.")
+        return 1
+
+    chunk_size = max(min(MONITORING_CHUNK_SIZE, len(analysis_data)), 1)
+    service = MonitoringService(chunk_size=chunk_size,
+                                buffer_rows=max(len(analysis_data), chunk_size),
+                                alert_interval=0,
+                                chunks_log=None)
+    chunks = service.observe(analysis_data["timestamp"].to_numpy(), analysis_data["y_pred"].tolist())
+    if not chunks:
+        print("❌ Aucune prédiction à estimer.")
+        return 1
+
+    last_rmse = chunks[-1]["rmse"]
+    print(f"\n⭐ RMSE estimé : {last_rmse:.2f}")
+    if chunks[-1]["alert"]:
+        print(f"⚠️ Alerte critique : RMSE > {service.threshold:.0f} — drift ou dégradation détectée !")
+    else:
+        print("✅ RMSE en-dessous du seuil acceptable.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+import os
+import hashlib
+import logging
+import smtplib
+import threading
+import time
+from collections import OrderedDict, deque
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration email (à définir dans .env)
+ALERT_EMAIL_FROM = os.getenv("ALERT_EMAIL_FROM")
+ALERT_EMAIL_TO = os.getenv("ALERT_EMAIL_TO")
+ALERT_EMAIL_PASSWORD = os.getenv("ALERT_EMAIL_PASSWORD")
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+
+# === Configuration du monitoring ===
+REFERENCE_PATH = os.getenv("MONITORING_REFERENCE_PATH", "data/reference_predictions.csv")
+ALERTS_LOG_PATH = os.getenv("MONITORING_ALERTS_LOG", "data/alerts.log")
+CHUNKS_LOG_PATH = os.getenv("MONITORING_CHUNKS_LOG", "data/monitoring_chunks.csv")
+MONITORING_CHUNK_SIZE = int(os.getenv("MONITORING_CHUNK_SIZE", 100))
+MONITORING_BUFFER_ROWS = int(os.getenv("MONITORING_BUFFER_ROWS", 10_000))
+MONITORING_MAX_CHUNKS = int(os.getenv("MONITORING_MAX_CHUNKS", 1000))
+RMSE_THRESHOLD = float(os.getenv("RMSE_THRESHOLD", 700))
+ALERT_MIN_INTERVAL = float(os.getenv("ALERT_MIN_INTERVAL", 3600))  # secondes entre deux e-mails
+
+
+def send_email_alert(rmse_value: float, suppressed: int = 0):
+    subject = "⚠️ Alerte RMSE - Superman Inference Drift"
+    body = f"""Alerte automatique 🚨
+
+Le dernier RMSE estimé dépasse le seuil de {RMSE_THRESHOLD:.0f}.
+
+🕒 Heure : {pd.Timestamp.now()}
+📈 RMSE détecté : {rmse_value:.2f}
+🔕 Alertes non envoyées depuis le dernier e-mail : {suppressed}
+
+Merci de vérifier l'intégrité du modèle en production.
+
+— Système de monitoring Superman
+"""
+    msg = MIMEMultipart()
+    msg['From'] = ALERT_EMAIL_FROM
+    msg['To'] = ALERT_EMAIL_TO
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+
+    try:
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            server.starttls()
+            server.login(ALERT_EMAIL_FROM, ALERT_EMAIL_PASSWORD)
+            server.send_message(msg)
+        logger.info("📬 Alerte envoyée par e-mail.")
+    except Exception as e:
+        logger.error(f"❌ Erreur envoi mail : {e}")
+
+
+def build_estimator(chunk_size: int):
+    """
+    Estimateur NannyML du RMSE (mêmes paramètres que l'ancien `nannyml_runner.py`).
+    """
+    from nannyml import PerformanceEstimator
+
+    return PerformanceEstimator(
+        y_pred='y_pred',
+        timestamp_column='timestamp',
+        chunk_size=chunk_size,
+        metric='rmse',
+    )
+
+
+def file_version(path: str) -> Optional[str]:
+    """
+    Version d'un fichier (nom, taille, date de modification), None s'il n'existe pas.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return hashlib.sha256(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+
+
+class PredictionRing:
+    """
+    Tampon circulaire borné des dernières prédictions (horodatage, y_pred).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype="datetime64[s]")
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.total = 0  # Nombre de lignes reçues depuis le démarrage
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        # Seules les `capacity` dernières lignes sont gardées, mais toutes sont comptées
+        start = self.total + max(len(values) - self.capacity, 0)
+        self.total += len(values)
+        positions = np.arange(start, self.total) % self.capacity
+        self.timestamps[positions] = timestamps[-self.capacity:]
+        self.values[positions] = values[-self.capacity:]
+
+    def last(self, n: int, end: Optional[int] = None) -> pd.DataFrame:
+        """
+        Les `n` lignes qui précèdent la ligne numéro `end` (par défaut : la plus récente).
+        """
+        end = self.total if end is None else end
+        positions = np.arange(end - n, end) % self.capacity
+        return pd.DataFrame({"timestamp": self.timestamps[positions], "y_pred": self.values[positions]})
+
+
+class MonitoringService:
+    """
+    Monitoring RMSE en continu, dans le processus de l'API.
+
+    L'estimateur NannyML est ajusté une seule fois par version du fichier de référence
+    et gardé en mémoire. Les prédictions reçues alimentent un tampon circulaire borné ;
+    chaque fois qu'un chunk de `chunk_size` lignes est complet, seul ce chunk est estimé.
+    Les métriques des derniers chunks restent en mémoire et sont ajoutées à `chunks_log`.
+    Au-delà du seuil, l'alerte est journalisée à chaque fois mais l'e-mail est limité à un
+    envoi toutes les `alert_interval` secondes ; il part hors du verrou.
+
+    `observe` peut être rejoué (nouvel essai d'un lot d'effets de bord) : des prédictions
+    identiques déjà reçues sont ignorées, et un chunk n'est compté comme estimé qu'une fois
+    son estimation réussie.
+
+    Args:
+        reference_path (str): CSV de référence (timestamp, y_pred, ...) servant à ajuster l'estimateur.
+        estimator_factory (Callable[[int], Any]): Construit un estimateur (`fit`, `estimate`) pour une taille de chunk.
+        alert (Callable[[float, int], None]): Envoi de l'alerte (RMSE, alertes non envoyées depuis le dernier envoi).
+    """
+
+    def __init__(self,
+                 reference_path: str = REFERENCE_PATH,
+                 chunk_size: int = MONITORING_CHUNK_SIZE,
+                 buffer_rows: int = MONITORING_BUFFER_ROWS,
+                 max_chunks: int = MONITORING_MAX_CHUNKS,
+                 threshold: float = RMSE_THRESHOLD,
+                 alert_interval: float = ALERT_MIN_INTERVAL,
+                 alerts_log: Optional[str] = ALERTS_LOG_PATH,
+                 chunks_log: Optional[str] = CHUNKS_LOG_PATH,
+                 estimator_factory: Callable = build_estimator,
+                 alert: Callable[[float, int], None] = send_email_alert,
+                 clock: Callable[[], float] = time.time):
+        assert buffer_rows >= chunk_size, "Le tampon doit contenir au moins un chunk."
+        self.reference_path = reference_path
+        self.chunk_size = chunk_size
+        self.threshold = threshold
+        self.alert_interval = alert_interval
+        self.alerts_log = alerts_log
+        self.chunks_log = chunks_log
+        self._estimator_factory = estimator_factory
+        self._alert = alert
+        self._clock = clock
+        self._ring = PredictionRing(buffer_rows)
+        self._scored = 0  # Lignes déjà couvertes par un chunk estimé
+        self._chunks: deque = deque(maxlen=max_chunks)
+        self._estimator = None
+        self._reference_version: Optional[str] = None
+        self._last_email: Optional[float] = None
+        self._suppressed_since_email = 0
+        self._seen: OrderedDict = OrderedDict()  # Empreintes des derniers appels (rejeux ignorés)
+        self._seen_max = max_chunks
+        self._lock = threading.Lock()
+        self._stats = {"fits": 0, "chunks": 0, "alerts": 0, "emails": 0, "suppressed": 0, "skipped_rows": 0,
+                       "replayed": 0}
+
+    def _ensure_estimator(self) -> bool:
+        version = file_version(self.reference_path)
+        if version is None:
+            return False
+        if version != self._reference_version:
+            estimator = self._estimator_factory(self.chunk_size)
+            estimator.fit(pd.read_csv(self.reference_path))
+            self._estimator, self._reference_version = estimator, version
+            self._stats["fits"] += 1
+            logger.info(f"📐 Estimateur NannyML ajusté sur la référence {version}")
+        return True
+
+    def _is_replay(self, timestamps: np.ndarray, values: np.ndarray) -> bool:
+        key = hashlib.sha1(timestamps.tobytes() + values.tobytes()).hexdigest()
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return True
+        self._seen[key] = None
+        if len(self._seen) > self._seen_max:
+            self._seen.popitem(last=False)
+        return False
+
+    def observe(self, timestamps: np.ndarray, predictions: List[float]) -> List[dict]:
+        """
+        Ajoute des prédictions et estime les chunks devenus complets.
+
+        Returns:
+            List[dict]: Chunks estimés lors de cet appel (start, end, rmse, alert).
+        """
+        timestamps = np.asarray(timestamps, dtype="datetime64[s]")
+        values = np.asarray(predictions, dtype=np.float64)
+        emails = []
+        with self._lock:
+            if self._is_replay(timestamps, values):
+                self._stats["replayed"] += 1
+            else:
+                self._ring.extend(timestamps, values)
+            if not self._ensure_estimator():
+                logger.warning(f"⚠️ Référence {self.reference_path} absente : chunks non estimés.")
+                return []
+            # Lignes sorties du tampon avant d'avoir été estimées (rafale plus grande que le tampon)
+            oldest = self._ring.total - len(self._ring)
+            if self._scored < oldest:
+                skipped = (oldest - self._scored + self.chunk_size - 1) // self.chunk_size * self.chunk_size
+                self._stats["skipped_rows"] += skipped
+                self._scored += skipped
+            new_chunks = []
+            while self._scored + self.chunk_size <= self._ring.total:
+                # `_scored` avancé après l'estimation : un échec laisse le chunk à estimer au prochain appel
+                result = self._score(self._ring.last(self.chunk_size, end=self._scored + self.chunk_size), emails)
+                self._scored += self.chunk_size
+                new_chunks.append(result)
+        for rmse, suppressed in emails:
+            try:
+                self._alert(rmse, suppressed)
+            except Exception as e:
+                logger.error(f"❌ Erreur envoi de l'alerte : {e}")
+        return new_chunks
+
+    def _score(self, chunk: pd.DataFrame, emails: list) -> dict:
+        estimated = self._estimator.estimate(chunk)
+        rmse = float(estimated['value'].iloc[-1])
+        result = {"start": str(chunk['timestamp'].iloc[0]), "end": str(chunk['timestamp'].iloc[-1]),
+                  "rmse": rmse, "alert": rmse > self.threshold, "reference": self._reference_version}
+        self._append_chunk_log(result)
+        self._chunks.append(result)
+        self._stats["chunks"] += 1
+        logger.info(f"⭐ RMSE estimé : {rmse:.2f}")
+        if result["alert"]:
+            self._raise_alert(rmse, emails)
+        return result
+
+    def _append_chunk_log(self, result: dict) -> None:
+        if not self.chunks_log:
+            return
+        os.makedirs(os.path.dirname(self.chunks_log) or ".", exist_ok=True)
+        new_file = not os.path.exists(self.chunks_log)
+        with open(self.chunks_log, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write("start,end,rmse,alert,reference\n")
+            f.write(f"{result['start']},{result['end']},{result['rmse']:.4f},{result['alert']},{result['reference']}\n")
+
+    def _raise_alert(self, rmse: float, emails: list) -> None:
+        # E-mail ajouté à `emails`, envoyé par `observe` une fois le verrou relâché
+        self._stats["alerts"] += 1
+        logger.warning(f"⚠️ Alerte critique : RMSE > {self.threshold:.0f} — drift ou dégradation détectée !")
+        if self.alerts_log:
+            os.makedirs(os.path.dirname(self.alerts_log) or ".", exist_ok=True)
+            with open(self.alerts_log, "a") as log:
+                log.write(f"[ALERTE] {pd.Timestamp.now()}: RMSE={rmse:.2f}\n")
+        now = self._clock()
+        if self._last_email is not None and now - self._last_email < self.alert_interval:
+            self._stats["suppressed"] += 1
+            self._suppressed_since_email += 1
+            return
+        emails.append((rmse, self._suppressed_since_email))
+        self._last_email = now
+        self._stats["emails"] += 1
+        self._suppressed_since_email = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats,
+                        reference=self._reference_version,
+                        buffered_rows=len(self._ring),
+                        pending_rows=self._ring.total - self._scored,
+                        last_chunks=list(self._chunks)[-10:])
+
+
+monitoring_service = MonitoringService()
@@ -0,0 +1,162 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+import app.utils as app_utils
+from app.result_cache import PredictionCache
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.history_buffer import HistoryBuffer
+
+
+@pytest.fixture
+def offline_pipeline(tmp_path, monkeypatch):
+    today = date.today()
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, today - timedelta(days=20), days=35)
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    store.ensure(lambda: build_eCO2mix_dataset(raw))
+    monkeypatch.setattr(app_utils, "refresh_eCO2mix_store", lambda T2: store)
+    monkeypatch.setattr(app_utils, "prediction_cache", PredictionCache(persist_dir=None))
+    monkeypatch.setattr(app_utils, "HISTORY", HistoryBuffer(capacity=96 * 60))
+    return train_stand_in_models(store.read_between(today - timedelta(days=20), today), n_estimators=5)
+
+
+def test_batch_matches_single_period_predictions(offline_pipeline):
+    today = date.today()
+    # Périodes qui se chevauchent : aucun lag ne doit fuir d'une période à l'autre
+    periods = [(today, today + timedelta(days=2)),
+               (today + timedelta(days=1), today + timedelta(days=3)),
+               (today, today + timedelta(days=1))]
+
+    batch = list(app_utils.run_batch_prediction_pipeline(periods, offline_pipeline, chunk_size=2))
+    assert [(item.T1, item.T2) for item in batch] == periods
+    assert not any(item.cached for item in batch)
+    assert all(len(item.predictions) > 0 for item in batch)
+
+    app_utils.prediction_cache.clear()
+    for item in batch:
+        single = app_utils.run_prediction_pipeline(item.T1, item.T2, offline_pipeline)
+        assert single.predictions == pytest.approx(item.predictions)
+
+    again = list(app_utils.run_batch_prediction_pipeline(periods, offline_pipeline))
+    assert all(item.cached for item in again)
+
+
+def test_history_keeps_the_first_rows_of_each_period(offline_pipeline):
+    today = date.today()
+    store = app_utils.refresh_eCO2mix_store(today)
+    rows = store.read_between(today, today + timedelta(days=1))
+
+    result = app_utils.run_prediction_pipeline(today, today + timedelta(days=1), offline_pipeline)
+    assert len(result.predictions) == rows['Consommation'].notna().sum() == len(rows)
+
+
+def test_predictions_carry_the_datetime_of_each_predicted_row(offline_pipeline, monkeypatch):
+    today = date.today()
+    store = app_utils.refresh_eCO2mix_store(today)
+    read_between = store.read_between
+
+    def with_gaps(T1, T2):
+        # Lignes absentes du stock (mesure manquante, jour sans couleur TEMPO)
+        df = read_between(T1, T2)
+        return df[~df['Datetime'].dt.hour.isin([3, 4])].reset_index(drop=True)
+
+    monkeypatch.setattr(store, "read_between", with_gaps)
+    expected = with_gaps(today, today + timedelta(days=1))['Datetime'].to_numpy().astype("datetime64[s]")
+
+    single = app_utils.run_prediction_pipeline(today, today + timedelta(days=1), offline_pipeline)
+    [batch] = app_utils.run_batch_prediction_pipeline([(today, today + timedelta(days=1))], offline_pipeline)
+    app_utils.prediction_cache.clear()
+    [fresh] = app_utils.run_batch_prediction_pipeline([(today, today + timedelta(days=1))], offline_pipeline)
+    assert len(single.predictions) == len(expected) == 2 * 88
+    for timestamps in (single.timestamps, batch.timestamps, fresh.timestamps):
+        assert (timestamps == expected).all()
+
+    # Réponse NDJSON et payload des effets de bord : mêmes horodatages réels
+    submitted = []
+    monkeypatch.setattr(app_main, "submit_prediction_side_effects", lambda items, versions: submitted.extend(items))
+    monkeypatch.setattr(app_main.registry, "_current", offline_pipeline)
+    app_utils.prediction_cache.clear()
+    period = {"T1": str(today), "T2": str(today + timedelta(days=1))}
+    response = TestClient(app_main.app).post("/predict", json=period, headers={"Accept": "application/x-ndjson"})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["timestamp"] for row in rows] == expected.astype(str).tolist()
+    assert rows[-1]["timestamp"] == f"{today + timedelta(days=1)}T23:45:00"
+    assert (submitted[0][1] == expected).all()
+
+
+def test_batch_rejects_invalid_period(offline_pipeline):
+    today = date.today()
+    with pytest.raises(ValueError):
+        list(app_utils.run_batch_prediction_pipeline([(today, today + timedelta(days=app_utils.MAX_DAYS + 1))],
+                                                     offline_pipeline))
+
+
+def test_long_periods_are_stitched_from_windows(offline_pipeline, monkeypatch):
+    today = date.today()
+    T2 = today + timedelta(days=13)
+    monkeypatch.setattr(app_utils, "MAX_DAYS", 30)  # Limite relevée par l'environnement (défaut : 7 jours)
+    monkeypatch.setattr(app_utils, "PREDICT_CHUNK_DAYS", 30)  # D'un seul tenant
+    whole, whole_timestamps = app_utils.predict_period(app_utils.refresh_eCO2mix_store(T2), today, T2, offline_pipeline)
+
+    monkeypatch.setattr(app_utils, "PREDICT_CHUNK_DAYS", 3)
+    assert len(app_utils.prediction_windows(today, T2)) == 5
+    result = app_utils.run_prediction_pipeline(today, T2, offline_pipeline)
+    chunked = result.predictions
+    assert len(chunked) == len(whole) == 14 * 96
+    assert chunked == pytest.approx(whole.tolist(), rel=1e-12)
+    assert (result.timestamps == whole_timestamps).all()
+
+    store = app_utils.refresh_eCO2mix_store(T2)
+    parallel, parallel_timestamps = app_utils.predict_period(store, today, T2, offline_pipeline, processes=2)
+    assert parallel.tolist() == pytest.approx(whole.tolist(), rel=1e-12)
+    assert (parallel_timestamps == whole_timestamps).all()
+    assert app_utils._worker_models is None  # Modèles passés aux seuls processus du pool
+
+    # Une période longue dans un lot : traitée seule, par fenêtres
+    app_utils.prediction_cache.clear()
+    periods = [(today, today + timedelta(days=1)), (today, T2)]
+    batch = list(app_utils.run_batch_prediction_pipeline(periods, offline_pipeline))
+    assert batch[1].predictions == pytest.approx(chunked)
+    assert batch[0].predictions == pytest.approx(chunked[:2 * 96])
+
+
+def test_batch_endpoint_coalesces_side_effects_and_rejects_past_periods(offline_pipeline, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(app_main, "submit_prediction_side_effects", lambda items, versions: submitted.append(items))
+    monkeypatch.setattr(app_main.registry, "_current", offline_pipeline)
+    client = TestClient(app_main.app)
+    today = date.today()
+    periods = [{"T1": str(today + timedelta(days=i)), "T2": str(today + timedelta(days=i + 1))} for i in range(3)]
+
+    response = client.post("/predict/batch", json={"periods": periods})
+    assert response.status_code == 200 and len(response.text.splitlines()) == 3
+    assert len(submitted) == 1 and [str(T1) for T1, _, _ in submitted[0]] == [p["T1"] for p in periods]
+
+    past = {"T1": str(today - timedelta(days=2)), "T2": str(today)}
+    assert client.post("/predict", json=past).status_code == 400
+    assert client.post("/predict/batch", json={"periods": [past]}).status_code == 400
+
+
+def test_window_processes_are_not_forked_from_a_threaded_process(offline_pipeline, monkeypatch, caplog):
+    import threading
+
+    today = date.today()
+    monkeypatch.setattr(app_utils, "PREDICT_CHUNK_DAYS", 3)
+    store = app_utils.refresh_eCO2mix_store(today + timedelta(days=6))
+    stop = threading.Event()
+    other = threading.Thread(target=stop.wait)  # Comme le pool de threads de l'API
+    other.start()
+    try:
+        predictions, _ = app_utils.predict_period(store, today, today + timedelta(days=6), offline_pipeline,
+                                                  processes=2)
+    finally:
+        stop.set()
+        other.join()
+    assert len(predictions) == 7 * 96
+    assert "fenêtres traitées sans fork" in caplog.text
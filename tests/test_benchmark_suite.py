@@ -0,0 +1,69 @@
+from benchmarks.suite import compare_to_baseline, measure
+
+PARAMS = {"days": 30, "seed": 0, "n_estimators": 10, "rows": 2880, "input_mb": 0.2}
+
+
+def results(reference=10, **stages):
+    stages = dict(stages, reference=(reference, 1)) if reference else stages
+    return {"params": dict(PARAMS), "stages": {
+        name: {"median_ms": ms, "min_ms": ms, "peak_mb": mb} for name, (ms, mb) in stages.items()}}
+
+
+def test_measure_reports_latency_and_memory():
+    result = measure(lambda: [0] * 100_000, repeat=3)
+
+    assert 0 < result["min_ms"] <= result["median_ms"]
+    assert result["peak_mb"] > 0.5
+
+
+def test_compare_within_tolerance():
+    baseline = results(features=(100, 10), predict=(20, 5))
+
+    assert compare_to_baseline(results(features=(120, 11), predict=(21, 5)), baseline) == []
+
+
+def test_compare_flags_time_and_memory_regressions():
+    baseline = results(features=(100, 10), predict=(20, 5))
+    regressions = compare_to_baseline(results(features=(200, 10), predict=(20, 9)), baseline)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("features:") and "ms" in regressions[0]
+    assert regressions[1].startswith("predict: pic")
+
+
+def test_compare_rescales_timings_to_the_machine_of_the_run():
+    baseline = results(features=(100, 10), predict=(20, 5))
+
+    # Machine deux fois plus lente : toutes les étapes, calibration comprise, doublent
+    assert compare_to_baseline(results(reference=20, features=(200, 10), predict=(40, 5)), baseline) == []
+    # Machine deux fois plus rapide : une étape qui ne suit pas régresse
+    regressions = compare_to_baseline(results(reference=5, features=(100, 10), predict=(10, 5)), baseline)
+    assert len(regressions) == 1 and regressions[0].startswith("features:") and "×0.50" in regressions[0]
+
+
+def test_baseline_without_calibration_only_gates_memory():
+    baseline = results(reference=None, features=(100, 10), predict=(20, 5))
+
+    assert compare_to_baseline(results(features=(500, 10), predict=(20, 5)), baseline) == []
+    assert compare_to_baseline(results(features=(500, 20), predict=(20, 5)), baseline)[0].startswith("features: pic")
+
+
+def test_compare_flags_missing_stage_and_other_params():
+    baseline = results(features=(100, 10), predict=(20, 5))
+
+    assert compare_to_baseline(results(features=(100, 10)), baseline) == ["predict: étape absente"]
+    other = results(features=(100, 10), predict=(20, 5))
+    other["params"]["days"] = 365
+    assert "paramètres différents" in compare_to_baseline(other, baseline)[0]
+
+
+def test_run_suite_removes_its_synthetic_files(tmp_path, monkeypatch):
+    import tempfile
+
+    from benchmarks.suite import run_suite
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    results = run_suite(days=3, repeat=1, n_estimators=2)
+
+    assert results["params"]["rows"] == 3 * 96
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,109 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.fixtures import write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+
+
+def test_store_slice_matches_full_pipeline(tmp_path):
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    full = build_eCO2mix_dataset(raw)
+
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    assert store.ensure(lambda: full) is True
+    assert store.ensure(lambda: full) is False
+
+    T1, T2 = date(2024, 12, 30), date(2025, 1, 2)
+    expected = full[(full["Date"] >= pd.to_datetime(T1)) & (full["Date"] <= pd.to_datetime(T2))]
+    sliced = store.read_between(T1, T2)
+
+    assert len(sliced) == len(expected)
+    pd.testing.assert_series_equal(sliced["Consommation"],
+                                   expected["Consommation"].reset_index(drop=True))
+
+
+def test_store_rebuilds_when_raw_files_change(tmp_path):
+    raw = str(tmp_path / "raw")
+    paths = write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return build_eCO2mix_dataset(raw)
+
+    store.ensure(build)
+    version = store.version
+    os.utime(paths[0], ns=(0, 0))
+    assert store.ensure(build) is True
+    assert len(builds) == 2
+    assert store.version != version
+
+
+def test_store_reopens_after_another_instance_rebuilds(tmp_path):
+    raw = str(tmp_path / "raw")
+    paths = write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    root = str(tmp_path / "store")
+    reader, writer = EcO2mixStore(root, raw), EcO2mixStore(root, raw)
+    reader.ensure(lambda: build_eCO2mix_dataset(raw))
+    before = reader.read_between(date(2024, 12, 30), date(2025, 1, 2))
+
+    os.utime(paths[0], ns=(0, 0))
+    assert writer.ensure(lambda: build_eCO2mix_dataset(raw)) is True
+    assert reader.ensure(lambda: build_eCO2mix_dataset(raw)) is False
+    pd.testing.assert_frame_equal(reader.read_between(date(2024, 12, 30), date(2025, 1, 2)), before)
+
+
+def test_concurrent_instances_build_the_store_once(tmp_path):
+    import threading
+
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    root = str(tmp_path / "store")
+    builds = []
+
+    def ensure():
+        EcO2mixStore(root, raw).ensure(lambda: builds.append(1) or build_eCO2mix_dataset(raw))
+
+    threads = [threading.Thread(target=ensure) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+
+
+def test_readers_survive_rebuilds_by_another_instance(tmp_path):
+    import threading
+
+    raw = str(tmp_path / "raw")
+    paths = write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    root = str(tmp_path / "store")
+    reader, writer = EcO2mixStore(root, raw), EcO2mixStore(root, raw)
+    reader.ensure(lambda: build_eCO2mix_dataset(raw))
+    expected = reader.read_between(date(2024, 12, 30), date(2025, 1, 2))
+    errors, stop = [], threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                pd.testing.assert_frame_equal(reader.read_between(date(2024, 12, 30), date(2025, 1, 2)), expected)
+            except Exception as e:  # pragma: no cover - signalé par l'assertion
+                errors.append(e)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    try:
+        for n in range(3):  # Version ouverte par le lecteur supprimée dès la 2e reconstruction
+            os.utime(paths[0], ns=(n, n))
+            assert writer.ensure(lambda: build_eCO2mix_dataset(raw)) is True
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == []
+    assert len([entry for entry in os.listdir(root) if entry.startswith("v-")]) == 2
+    pd.testing.assert_frame_equal(reader.read_between(date(2024, 12, 30), date(2025, 1, 2)), expected)
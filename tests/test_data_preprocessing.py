@@ -0,0 +1,50 @@
+import re
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.fixtures import write_eco2mix_files
+from core.data_preprocessing import (
+    convert_xls_eCO2mix_to_csv,
+    iter_clean_eCO2mix_chunks,
+    load_data,
+    read_xls_eCO2mix,
+)
+
+
+def legacy_convert(input_path: str) -> str:
+    """Conversion ligne à ligne d'origine, pour référence."""
+    with open(input_path, 'r', encoding='cp1252') as f:
+        lines = f.readlines()
+    cleaned_lines = []
+    for i, line in enumerate(lines):
+        if "RTE ne pourra" in line or "L'ensemble des informations disponibles" in line:
+            continue
+        line = line.replace('\t', ',')
+        if i > 0:
+            line = re.sub(r',\s*$', '', line)
+        cleaned_lines.append(line.rstrip() + '\n')
+    return "".join(cleaned_lines)
+
+
+def test_streaming_conversion_matches_legacy(tmp_path):
+    path = tmp_path / "eCO2mix_RTE_edge.xls"
+    content = ("Date\tHeures\tConsommation\t\n"
+               "2025-01-01\t00:00\t100\t\n"
+               "L'ensemble des informations disponibles\t\n"
+               "2025-01-01\t00:15\t\t\t  \r\n"
+               "\n"
+               "2025-01-01\t00:30\t102,\t\xa0\n"
+               "RTE ne pourra être tenu responsable\t")
+    path.write_bytes(content.encode("cp1252"))
+
+    for chunk_size in (1, 7, 64, 1 << 20):
+        assert "".join(iter_clean_eCO2mix_chunks(str(path), chunk_size)) == legacy_convert(str(path))
+
+
+def test_direct_read_matches_csv_round_trip(tmp_path):
+    paths = write_eco2mix_files(str(tmp_path), date(2025, 1, 1), days=3)
+    for path in paths:
+        csv_path = str(tmp_path / "out.csv")
+        convert_xls_eCO2mix_to_csv(path, csv_path)
+        pd.testing.assert_frame_equal(read_xls_eCO2mix(path), load_data(csv_path))
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.fixtures import write_eco2mix_files
+from core.data_preprocessing import (
+    build_eCO2mix_dataset,
+    preprocess_annual_data,
+    preprocess_eCO2mix_data_engineered,
+    split_features_target,
+)
+from core.features_engineering import (
+    FeaturePipeline,
+    create_cyclical_features,
+    create_date_features,
+    create_hour_features,
+    create_lag_features,
+    create_rolling_features,
+)
+
+
+def legacy_preprocess_annual_data(df: pd.DataFrame) -> pd.DataFrame:
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Datetime'] = pd.to_datetime(df['Date'].dt.strftime("%Y-%m-%d") + " " + df['Heures'], errors='coerce')
+    return df[['Date', 'Heures', 'Datetime', 'Consommation']].dropna()
+
+
+def legacy_create_hour_features(df: pd.DataFrame) -> pd.DataFrame:
+    return create_cyclical_features(df, column='Heures', max_val=24,
+                                    transform_func=lambda x: pd.to_datetime(x, format='%H:%M').hour,
+                                    prefix='hour')
+
+
+def test_vectorized_datetime_matches_legacy():
+    raw = pd.DataFrame({
+        "Date": ["2025-01-01", "2025-01-01", "2025-01-02", None, "2025-01-03", "2025-01-03", "2025-01-03"],
+        "Heures": ["00:00", "23:45", "24:00", "01:00", None, "7:05", "12:30:00"],
+        "Consommation": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    }, index=[0, 0, 1, 1, 2, 2, 3])
+    pd.testing.assert_frame_equal(preprocess_annual_data(raw.copy()), legacy_preprocess_annual_data(raw.copy()))
+
+
+def test_vectorized_hour_features_match_legacy():
+    hours = pd.Series(pd.date_range("2025-01-01", periods=96, freq="15min").strftime("%H:%M"))
+    df = pd.DataFrame({"Heures": list(hours) + ["7:05"]})
+    pd.testing.assert_frame_equal(create_hour_features(df.copy()), legacy_create_hour_features(df.copy()))
+
+
+def legacy_preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+    df = create_date_features(df, "Date")
+    df = create_hour_features(df)
+    df = create_lag_features(df, target_column="Consommation", lags=[1, 2, 3])
+    df = create_rolling_features(df, target_column="Consommation", window=3)
+    df = preprocess_eCO2mix_data_engineered(df)
+    X, _ = split_features_target(df, target="Consommation")
+    return X
+
+
+def test_feature_pipeline_matches_legacy_chain(tmp_path):
+    write_eco2mix_files(str(tmp_path), date(2024, 12, 1), days=40)
+    merged = build_eCO2mix_dataset(str(tmp_path))
+    window = merged[(merged["Date"] >= "2024-12-10") & (merged["Date"] <= "2024-12-17")]
+    # Mélange + trou dans la cible pour vérifier le tri unique et le filtrage des NaN
+    window = window.sample(frac=1, random_state=0)
+    window.loc[window.index[10], "Consommation"] = float("nan")
+
+    pipeline = FeaturePipeline()
+    expected = legacy_preprocess_data(window.copy())
+    X = pipeline.transform(window.copy())
+
+    assert list(X.columns) == pipeline.feature_names
+    pd.testing.assert_frame_equal(X, expected, check_exact=False, rtol=1e-12)
+    assert pipeline.transform_array(window).flags["C_CONTIGUOUS"]
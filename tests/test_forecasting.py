@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+import app.utils as app_utils
+from app.model import ModelRegistry
+from app.result_cache import PredictionCache
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.features_engineering import TEMPO_COLUMNS, FeaturePipeline
+from core.forecasting import RecursiveForecaster
+from core.history_buffer import HistoryBuffer
+from core.tempo_calendar import TempoCalendar
+
+PIPELINE = FeaturePipeline(target="Consommation", lags=[1, 2, 3], window=3)
+WEIGHTS = np.random.default_rng(0).normal(size=len(PIPELINE.feature_names)) / 100
+
+
+def linear(X: np.ndarray) -> np.ndarray:
+    return 0.5 * X[:, -1] + 0.3 * X[:, -4] + X @ WEIGHTS
+
+
+def reference_rollout(history, start, horizon, tempo):
+    # Une ligne de plus à chaque pas, features recalculées par le pipeline complet
+    step = pd.Timedelta(minutes=15)
+    values = list(history)
+    for k in range(horizon):
+        times = pd.date_range(end=start + k * step, periods=len(values) + 1, freq=step)
+        # La valeur de la dernière ligne (à prédire) n'entre dans aucune de ses features
+        df = pd.DataFrame({"Datetime": times, "Date": times.normalize(), "Consommation": values + [0.0]})
+        for col, flag in zip(TEMPO_COLUMNS, tempo):
+            df[col] = flag
+        last = PIPELINE.transform_array(df)[-1:]
+        values.append(float(linear(last)[0]))
+    return np.array(values[len(history):])
+
+
+def test_rollout_matches_step_by_step_pipeline():
+    history = np.array([50000.0, 51000.0, 50500.0, 52000.0])
+    start = pd.Timestamp("2025-03-30 22:30")  # Traverse minuit et un changement de mois
+    forecaster = RecursiveForecaster(PIPELINE, linear)
+
+    got = forecaster.forecast(history, start, 12, [[0, 1, 0]])
+    np.testing.assert_allclose(got[0], reference_rollout(history, start, 12, [0, 1, 0]), rtol=1e-12)
+
+
+def test_scenarios_advance_together_like_separate_runs():
+    rng = np.random.default_rng(1)
+    history = rng.normal(50000, 1000, size=(3, 3))
+    tempo = np.eye(3)
+    start = np.datetime64("2025-01-01T00:00")
+    forecaster = RecursiveForecaster(PIPELINE, linear)
+
+    batched = forecaster.forecast(history, start, 96, tempo)
+    assert batched.shape == (3, 96)
+    for i in range(3):
+        np.testing.assert_allclose(batched[i], forecaster.forecast(history[i], start, 96, tempo[i:i + 1])[0])
+
+    with pytest.raises(ValueError):
+        forecaster.forecast(np.array([1.0, np.nan, 2.0]), start, 4, tempo[:1])
+
+
+@pytest.fixture
+def offline_forecast(tmp_path, monkeypatch):
+    today = date.today()
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, today - timedelta(days=30), days=30)  # Dernière mesure : hier à 23:45
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    calendar = TempoCalendar()
+    store.ensure(lambda: build_eCO2mix_dataset(raw, calendar=calendar))
+    monkeypatch.setattr(app_utils, "refresh_eCO2mix_store", lambda T2: store)
+    monkeypatch.setattr(app_utils, "get_tempo_calendar", lambda: calendar)
+    monkeypatch.setattr(app_utils, "prediction_cache", PredictionCache(persist_dir=None))
+    monkeypatch.setattr(app_utils, "HISTORY", HistoryBuffer(capacity=96 * 60))
+    return train_stand_in_models(store.read_between(today - timedelta(days=30), today), n_estimators=20)
+
+
+def test_native_and_pyfunc_forecasts_agree(offline_forecast):
+    today = date.today()
+    registry = ModelRegistry(poll_interval=0, engine="native")
+    registry.install(offline_forecast)
+    scenarios = [("baseline", None), ("rouge", "ROUGE")]
+
+    native = app_utils.run_forecast_pipeline(today, today + timedelta(days=2), scenarios, registry.current)
+    pyfunc = app_utils.run_forecast_pipeline(today, today + timedelta(days=2), scenarios, offline_forecast)
+    assert set(native.forecasts) == {"baseline", "rouge"}
+    assert len(native.timestamps) == len(native.forecasts["rouge"]) == 96 * 3
+    assert native.timestamps[0] == np.datetime64(today)
+    for name in native.forecasts:
+        assert native.forecasts[name] == pytest.approx(pyfunc.forecasts[name], rel=1e-5)
+
+    with pytest.raises(ValueError):
+        app_utils.run_forecast_pipeline(today, today + timedelta(days=1), [("x", "VERT")], offline_forecast)
+
+
+def test_forecast_horizon_follows_max_days(offline_forecast):
+    today = date.today()  # Dernière mesure : hier à 23:45
+    longest = app_utils.run_forecast_pipeline(today + timedelta(days=1), today + timedelta(days=1 + app_utils.MAX_DAYS),
+                                              models=offline_forecast)
+    assert len(longest.timestamps) == (app_utils.MAX_DAYS + 1) * 96
+    with pytest.raises(ValueError, match="Horizon trop long"):
+        app_utils.run_forecast_pipeline(today + timedelta(days=2), today + timedelta(days=2 + app_utils.MAX_DAYS),
+                                        models=offline_forecast)
+
+
+def test_forecast_endpoint(offline_forecast, monkeypatch):
+    monkeypatch.setattr(app_main.registry, "_current", offline_forecast)
+    client = TestClient(app_main.app)
+    today = date.today()
+    body = {"T1": str(today), "T2": str(today + timedelta(days=1)),
+            "scenarios": [{"name": "bleu", "tempo": "BLEU"}, {"name": "blanc", "tempo": "BLANC"}]}
+
+    response = client.post("/forecast", json=body)
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["step_minutes"] == 15 and payload["start"] == payload["timestamps"][0]
+    assert len(payload["forecasts"]["bleu"]) == len(payload["forecasts"]["blanc"]) == len(payload["timestamps"])
+
+    body["scenarios"].append({"name": "bleu"})
+    assert client.post("/forecast", json=body).status_code == 400
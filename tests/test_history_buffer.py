@@ -0,0 +1,43 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import write_eco2mix_files
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.features_engineering import FeaturePipeline
+from core.history_buffer import HistoryBuffer
+
+
+def test_buffer_is_bounded_sorted_and_accepts_revisions():
+    stamps = pd.date_range("2025-01-01", periods=25, freq="15min")
+    buffer = HistoryBuffer(capacity=10)
+    for start in range(0, 25, 4):  # Ajouts successifs : plusieurs recopies en tête
+        buffer.append(stamps[start:start + 4], np.arange(start, min(start + 4, 25), dtype=float))
+
+    assert len(buffer) == 10
+    assert buffer.last_timestamp == stamps[-1]
+    assert buffer.before(stamps[-1], 3).tolist() == [21.0, 22.0, 23.0]
+    assert buffer.before(stamps[0], 3).size == 0
+
+    buffer.append(stamps[-2:], [-1.0, -2.0])  # Révision des deux dernières mesures
+    assert len(buffer) == 10
+    assert buffer.before(stamps[-1] + pd.Timedelta("1min"), 2).tolist() == [-1.0, -2.0]
+
+
+def test_window_with_history_matches_the_continuous_series(tmp_path):
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, date(2024, 12, 20), days=30)
+    full = build_eCO2mix_dataset(raw).sort_values("Datetime").reset_index(drop=True)
+    pipeline = FeaturePipeline()
+
+    buffer = HistoryBuffer()
+    buffer.append(full["Datetime"], full["Consommation"])
+    window = full[(full["Date"] >= "2025-01-03") & (full["Date"] <= "2025-01-05")]
+    history = buffer.before(window["Datetime"].min(), pipeline.history_rows)
+
+    X = pipeline.transform(window, history=history)
+    expected = pipeline.transform(full).loc[window.index]
+
+    assert len(X) == len(window)  # Aucune ligne perdue faute de lag
+    pd.testing.assert_frame_equal(X, expected)
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBRegressor
+
+import app.utils as app_utils
+from app.inference import CompiledTrees, NativeEngine, NativeEngineUnavailable, build_native_engine, standardization
+from app.model import ModelRegistry
+from app.result_cache import PredictionCache
+from benchmarks.fixtures import PyfuncStandIn, train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.history_buffer import HistoryBuffer
+
+
+@pytest.fixture(scope="module")
+def merged(tmp_path_factory):
+    raw = str(tmp_path_factory.mktemp("raw"))
+    write_eco2mix_files(raw, date(2024, 1, 1), days=40)
+    return build_eCO2mix_dataset(raw)
+
+
+def test_native_engine_matches_pyfunc_path(merged):
+    models = train_stand_in_models(merged, n_estimators=20)
+    engine = NativeEngine.from_models(models.scaler, models.model)
+    X = app_utils.FEATURE_PIPELINE.transform(merged)
+
+    expected = np.asarray(app_utils.predict_with_model(app_utils.scale_data(X, models), models))
+    np.testing.assert_allclose(engine.predict(X), expected, rtol=1e-6)
+
+    matrix = app_utils.FEATURE_PIPELINE.transform_array(merged)
+    np.testing.assert_allclose(engine.predict(matrix, overwrite=True), expected, rtol=1e-6)
+
+
+def test_compiled_trees_match_inplace_predict():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6))
+    y = 1000 * X[:, 0] + 300 * np.sin(X[:, 1]) + rng.normal(size=2000)
+    X[rng.random(X.shape) < 0.02] = np.nan  # Valeurs manquantes : direction par défaut de chaque nœud
+    booster = XGBRegressor(n_estimators=30, max_depth=5, early_stopping_rounds=3, eval_metric="rmse") \
+        .fit(X[:1500], y[:1500], eval_set=[(X[1500:], y[1500:])], verbose=False).get_booster()
+    engine = NativeEngine(booster, np.zeros(6), np.ones(6))
+
+    trees = CompiledTrees(booster, engine.iteration_range)
+    np.testing.assert_array_equal(trees.predict(X), engine.predict(X))
+    np.testing.assert_array_equal(engine.step_predictor()(X.copy()), engine.predict(X))
+
+    classifier = XGBRegressor(n_estimators=2, objective="reg:logistic").fit(X[:, :2], (y > 0).astype(float))
+    with pytest.raises(NativeEngineUnavailable):
+        CompiledTrees(classifier.get_booster())
+
+
+def test_compiled_trees_handle_infinite_inputs_and_reject_multi_target():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(500, 3))
+    y = 100 * X[:, 0] + rng.normal(size=500)
+    booster = XGBRegressor(n_estimators=10, max_depth=3).fit(X, y).get_booster()
+    multi = XGBRegressor(n_estimators=2, tree_method="hist").fit(X[:50], np.column_stack([y[:50], -y[:50]]))
+    X[::7, 0], X[1::7, 1], X[2::7, 2] = np.inf, -np.inf, np.inf  # Une feuille ne doit jamais « passer à droite »
+    np.testing.assert_array_equal(CompiledTrees(booster).predict(X), booster.inplace_predict(X))
+
+    with pytest.raises(NativeEngineUnavailable, match="multi-cible"):
+        CompiledTrees(multi.get_booster())
+    engine = NativeEngine(multi.get_booster(), np.zeros(3), np.ones(3))
+    assert engine.step_predictor()(X[:4].copy()).shape == (4, 2)  # Repli sur `inplace_predict`
+
+
+def test_standardization_follows_scaler_options():
+    X = np.random.default_rng(0).normal(10, 3, size=(50, 3))
+    scaler = StandardScaler(with_mean=False).fit(X)
+    mean, scale = standardization(PyfuncStandIn(scaler))
+
+    np.testing.assert_allclose((X - mean) / scale, scaler.transform(X))
+
+
+def test_unsupported_artifacts_fall_back_to_pyfunc():
+    model = PyfuncStandIn(XGBRegressor(n_estimators=2).fit(np.ones((4, 2)), np.arange(4)))
+
+    with pytest.raises(NativeEngineUnavailable):
+        standardization(PyfuncStandIn(object()))
+    assert build_native_engine(PyfuncStandIn(object()), model) is None
+
+
+def test_mismatched_features_fall_back_to_pyfunc(merged):
+    models = train_stand_in_models(merged, n_estimators=2)
+    names = app_utils.FEATURE_PIPELINE.feature_names
+    assert NativeEngine.from_models(models.scaler, models.model, names) is not None
+
+    with pytest.raises(NativeEngineUnavailable, match="pipeline"):
+        NativeEngine.from_models(models.scaler, models.model, names[::-1])
+    other = XGBRegressor(n_estimators=2).fit(np.ones((4, len(names) - 1)), np.arange(4))
+    with pytest.raises(NativeEngineUnavailable, match="booster"):
+        NativeEngine.from_models(models.scaler, PyfuncStandIn(other), names)
+    assert build_native_engine(models.scaler, PyfuncStandIn(other), names) is None
+
+
+def test_registry_native_engine_serves_same_predictions(merged, tmp_path, monkeypatch):
+    raw = str(tmp_path / "raw")
+    today = date.today()
+    write_eco2mix_files(raw, today - timedelta(days=20), days=35)
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    store.ensure(lambda: build_eCO2mix_dataset(raw))
+    monkeypatch.setattr(app_utils, "refresh_eCO2mix_store", lambda T2: store)
+    monkeypatch.setattr(app_utils, "prediction_cache", PredictionCache(persist_dir=None))
+    monkeypatch.setattr(app_utils, "HISTORY", HistoryBuffer(capacity=96 * 60))
+    snapshot = train_stand_in_models(merged, n_estimators=20)
+
+    registry = ModelRegistry(poll_interval=0, engine="native")
+    registry.install(snapshot)
+    assert registry.current.describe()["engine"] == "native"
+
+    native = app_utils.run_prediction_pipeline(today, today + timedelta(days=2), registry.current)
+    app_utils.prediction_cache.clear()
+    pyfunc = app_utils.run_prediction_pipeline(today, today + timedelta(days=2), snapshot)
+    assert native.predictions == pytest.approx(pyfunc.predictions, rel=1e-6)
+
+    periods = [(today, today + timedelta(days=1)), (today + timedelta(days=1), today + timedelta(days=3))]
+    app_utils.prediction_cache.clear()
+    batch_native = list(app_utils.run_batch_prediction_pipeline(periods, registry.current))
+    app_utils.prediction_cache.clear()
+    batch_pyfunc = list(app_utils.run_batch_prediction_pipeline(periods, snapshot))
+    for a, b in zip(batch_native, batch_pyfunc):
+        assert a.predictions == pytest.approx(b.predictions, rel=1e-6)
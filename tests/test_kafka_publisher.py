@@ -0,0 +1,172 @@
+import json
+
+import pytest
+
+from app.kafka_publisher import POINT, PredictionPublisher, decode_message
+from app.side_effects import SideEffectQueue, publish_predictions
+from benchmarks.fixtures import InMemoryKafkaBroker
+from core.metrics import metrics
+
+PAYLOAD = {"T1": "2025-03-01",
+           "timestamps": ["2025-03-01T00:00:00", "2025-03-01T00:15:00", "2025-03-01T00:30:00", "2025-03-01T00:45:00"],
+           "predictions": [51000.5, 52000.25, 50500.0, 49800.75],
+           "model_versions": {"EnergyForecastModel_xgboost": "7"}}
+
+
+def make_publisher(broker, **kwargs):
+    return PredictionPublisher(topic="energy_forecast", producer_factory=broker.producer, **kwargs)
+
+
+def test_batch_json_keeps_the_prediction_payload():
+    broker = InMemoryKafkaBroker()
+    publisher = make_publisher(broker)
+
+    assert publisher.publish(PAYLOAD) == 1
+    publisher.flush()
+    [(key, value, headers)] = broker.topics["energy_forecast"]
+    assert key == b"2025-03-01"
+    assert json.loads(value) == PAYLOAD
+    assert decode_message(value, headers) == PAYLOAD
+    assert publisher.stats()["delivered"] == 1 and publisher.stats()["pending"] == 0
+
+
+def test_point_binary_messages_round_trip():
+    broker = InMemoryKafkaBroker()
+    publisher = make_publisher(broker, mode="point", encoding="binary")
+
+    assert publisher.publish(PAYLOAD) == 4
+    publisher.flush()
+    messages = broker.topics["energy_forecast"]
+    assert [len(value) for _, value, _ in messages] == [POINT.size] * 4
+    decoded = [decode_message(value, headers) for _, value, headers in messages]
+    assert [d["timestamp"] for d in decoded] == [key.decode() for key, _, _ in messages]
+    assert decoded[1]["timestamp"] == "2025-03-01T00:15:00"  # Lignes quart-horaires
+    assert [d["y_pred"] for d in decoded] == PAYLOAD["predictions"]  # Valeurs exactes en float32
+    assert decoded[0]["model_versions"] == PAYLOAD["model_versions"]
+
+
+def test_timestamps_off_the_quarter_hour_grid_are_published_as_is():
+    # Ligne de 00:15 absente du stock, payload journalisé sans horodatages
+    gap = dict(PAYLOAD, timestamps=["2025-03-01T00:00:00", "2025-03-01T00:30:00", "2025-03-01T00:45:00",
+                                    "2025-03-01T01:00:00"])
+    legacy = {k: v for k, v in PAYLOAD.items() if k != "timestamps"}
+    for payload, expected in ((gap, gap["timestamps"]), (legacy, PAYLOAD["timestamps"])):
+        for mode in ("batch", "point"):
+            broker = InMemoryKafkaBroker()
+            publisher = make_publisher(broker, mode=mode, encoding="binary")
+            publisher.publish(payload)
+            publisher.flush()
+            decoded = [decode_message(value, headers) for _, value, headers in broker.topics["energy_forecast"]]
+            if mode == "batch":
+                assert decoded[0]["timestamps"] == expected
+                assert decoded[0]["predictions"] == PAYLOAD["predictions"]
+            else:
+                assert [d["timestamp"] for d in decoded] == expected
+
+
+def test_non_finite_predictions_are_published_as_valid_json():
+    payload = dict(PAYLOAD, predictions=[51000.5, float("nan"), float("inf"), None])
+    for mode in ("batch", "point"):
+        broker = InMemoryKafkaBroker()
+        publisher = make_publisher(broker, mode=mode)
+        publisher.publish(payload)
+        publisher.flush()
+        # Parseur strict : NaN / Infinity refusés
+        strict = [json.loads(value, parse_constant=pytest.fail) for _, value, _ in broker.topics["energy_forecast"]]
+        values = strict[0]["predictions"] if mode == "batch" else [m["y_pred"] for m in strict]
+        assert values == [51000.5, None, None, None]
+
+
+def test_binary_batch_is_smaller_than_json():
+    payload = {"T1": PAYLOAD["T1"], "predictions": [50000.0 + i * 0.37 for i in range(96 * 7)]}
+    sizes = {}
+    for encoding in ("json", "binary"):
+        broker = InMemoryKafkaBroker()
+        publisher = make_publisher(broker, encoding=encoding)
+        publisher.publish(payload)
+        publisher.flush()
+        [(_, value, headers)] = broker.topics["energy_forecast"]
+        sizes[encoding] = len(value)
+        assert decode_message(value, headers)["predictions"] == pytest.approx(payload["predictions"], rel=1e-6)
+    assert sizes["binary"] * 2 < sizes["json"]
+
+
+def test_backpressure_drops_and_counts_excess_messages():
+    broker = InMemoryKafkaBroker(hold=True)  # Aucun acquittement avant le flush
+    publisher = make_publisher(broker, mode="point", max_pending=2, max_block=0.01)
+
+    assert publisher.publish(PAYLOAD) == 2
+    assert publisher.stats()["pending"] == 2 and publisher.stats()["dropped"] == 2
+    assert 'superman_kafka_dropped_total{reason="backpressure"}' in metrics.render()
+
+    publisher.flush()  # Places libérées par les acquittements
+    assert publisher.stats()["pending"] == 0
+    assert publisher.publish(PAYLOAD) == 2
+
+
+def test_delivery_failures_and_latency_are_exported():
+    failing = make_publisher(InMemoryKafkaBroker(fail=True))
+    failing.publish(PAYLOAD)
+    failing.flush()
+    assert failing.stats()["failed"] == 1 and failing.stats()["pending"] == 0
+
+    ok = make_publisher(InMemoryKafkaBroker())
+    ok.publish(PAYLOAD)
+    ok.flush()
+    text = metrics.render()
+    assert 'superman_kafka_dropped_total{reason="delivery"}' in text
+    assert "# TYPE superman_kafka_delivery_seconds histogram" in text
+    assert "superman_kafka_delivery_seconds_count" in text
+
+
+def test_side_effect_batch_is_flushed_once_and_close_empties_the_buffer(tmp_path):
+    broker = InMemoryKafkaBroker(hold=True)
+    publisher = make_publisher(broker)
+    queue = SideEffectQueue({"publish": lambda p: publish_predictions(p, publisher.publish, publisher.flush)},
+                            journal_dir=str(tmp_path / "queue"))
+    for day in ("2025-01-01", "2025-01-02"):
+        queue.submit("publish", dict(PAYLOAD, T1=day))
+    queue.drain()
+    assert len(broker.topics["energy_forecast"]) == 2 and len(broker.batches) == 1
+
+    publisher.publish(dict(PAYLOAD, T1="2025-01-03"))
+    publisher.close()
+    assert len(broker.topics["energy_forecast"]) == 3 and broker.producers[0].closed
+    raw, compressed = broker.batches[0]
+    assert compressed < raw
+
+
+def test_retried_batch_republishes_messages_with_the_same_id(tmp_path):
+    broker = InMemoryKafkaBroker()
+    publisher = make_publisher(broker, mode="point")
+    flushes = []
+
+    def flaky_flush():
+        flushes.append(1)
+        publisher.flush()
+        if len(flushes) == 1:
+            raise TimeoutError("flush expiré")
+
+    queue = SideEffectQueue({"publish": lambda p: publish_predictions(p, publisher.publish, flaky_flush)},
+                            journal_dir=str(tmp_path / "queue"), backoff=0.001)
+    queue.submit("publish", PAYLOAD)
+    queue.drain()
+
+    # Au moins une fois : messages republiés, dédupliqués par l'en-tête message_id
+    ids = [dict(headers)["message_id"] for _, _, headers in broker.topics["energy_forecast"]]
+    assert len(ids) == 8 and len(set(ids)) == 4
+    other = dict(PAYLOAD, model_versions={"EnergyForecastModel_xgboost": "8"})
+    publisher.publish(other)
+    publisher.flush()
+    assert not set(ids) & {dict(headers)["message_id"] for _, _, headers in broker.topics["energy_forecast"][8:]}
+
+
+def test_unconfigured_publisher_is_a_no_op():
+    publisher = PredictionPublisher(topic=None, producer_factory=None)
+    assert not publisher.enabled
+    assert publisher.publish(PAYLOAD) == 0
+    publisher.flush()
+    publisher.close()
+
+    with pytest.raises(ValueError):
+        PredictionPublisher(topic="t", mode="stream")
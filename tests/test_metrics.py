@@ -0,0 +1,100 @@
+import contextvars
+import threading
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+import app.utils as app_utils
+from app.model import registry
+from app.result_cache import PredictionCache
+from benchmarks.fixtures import train_stand_in_models, write_eco2mix_files
+from core.columnar_store import EcO2mixStore
+from core.data_preprocessing import build_eCO2mix_dataset
+from core.history_buffer import HistoryBuffer
+from core.metrics import MetricsRegistry, metrics, server_timing
+
+
+def test_stage_histogram_rows_and_errors():
+    registry_ = MetricsRegistry(buckets=(0.1, 1.0), track_memory=False)
+    with registry_.stage("features") as stage:
+        stage.rows = 96
+    with pytest.raises(ValueError):
+        with registry_.stage("features"):
+            raise ValueError("boom")
+    registry_.inc("eco2mix_download_bytes_total", 2048, "Octets téléchargés.")
+
+    text = registry_.render()
+    assert 'superman_stage_duration_seconds_bucket{stage="features",le="0.1"} 2' in text
+    assert 'superman_stage_duration_seconds_bucket{stage="features",le="+Inf"} 2' in text
+    assert 'superman_stage_duration_seconds_count{stage="features"} 2' in text
+    assert 'superman_stage_rows_total{stage="features"} 96' in text
+    assert 'superman_stage_errors_total{stage="features"} 1' in text
+    assert "# TYPE superman_eco2mix_download_bytes_total counter" in text
+    assert "superman_eco2mix_download_bytes_total{} 2048" in text
+    assert registry_.snapshot()["features"]["count"] == 2
+
+
+def test_disabled_registry_records_nothing():
+    registry_ = MetricsRegistry(enabled=False)
+    with registry_.stage("predict") as stage:
+        stage.rows = 10
+    registry_.inc("kafka_messages_total")
+
+    assert registry_.snapshot() == {}
+
+
+def test_trace_follows_copied_context_into_threads():
+    registry_ = MetricsRegistry(track_memory=False)
+
+    def work():
+        with registry_.stage("predict"):
+            pass
+
+    with registry_.trace() as spans:
+        with registry_.stage("features"):
+            pass
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(work,))
+        thread.start()
+        thread.join()
+    with registry_.stage("outside"):
+        pass
+
+    assert [name for name, _ in spans] == ["features", "predict"]
+    assert server_timing([("scale", 0.001), ("scale", 0.002)], total=0.01) == "scale;dur=3.00, total;dur=10.00"
+
+
+@pytest.fixture
+def offline_api(tmp_path, monkeypatch):
+    today = date.today()
+    raw = str(tmp_path / "raw")
+    write_eco2mix_files(raw, today - timedelta(days=20), days=35)
+    store = EcO2mixStore(str(tmp_path / "store"), raw)
+    store.ensure(lambda: build_eCO2mix_dataset(raw))
+    monkeypatch.setattr(app_utils, "refresh_eCO2mix_store", lambda T2: store)
+    monkeypatch.setattr(app_utils, "prediction_cache", PredictionCache(persist_dir=None))
+    monkeypatch.setattr(app_utils, "HISTORY", HistoryBuffer(capacity=96 * 60))
+    monkeypatch.setattr(app_main, "submit_prediction_side_effects", lambda *args: None)
+    monkeypatch.setattr(registry, "_current",
+                        train_stand_in_models(store.read_between(today - timedelta(days=20), today), n_estimators=5))
+    return TestClient(app_main.app)
+
+
+def test_predict_trace_header_and_metrics_endpoint(offline_api):
+    today = date.today()
+    payload = {"T1": str(today), "T2": str(today + timedelta(days=1))}
+
+    traced = offline_api.post("/predict", json=payload, headers={"X-Trace": "1"})
+    assert traced.status_code == 200
+    stages = [part.split(";")[0] for part in traced.headers["Server-Timing"].split(", ")]
+    assert {"store_read", "features", "scale", "predict", "total"} <= set(stages)
+    assert "Server-Timing" not in offline_api.post("/predict", json=payload).headers
+
+    response = offline_api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'superman_stage_duration_seconds_count{stage="predict"}' in response.text
+    assert 'route="/predict",status="200"' in response.text
+    assert "# TYPE superman_prediction_cache_hits gauge" in response.text
+    assert metrics.snapshot()["predict"]["rows"] > 0
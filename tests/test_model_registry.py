@@ -0,0 +1,43 @@
+from app.model import ModelRegistry
+
+
+def make_registry(versions, loads):
+    def resolver(name, alias):
+        return versions[name]
+
+    def loader(name, version):
+        loads.append((name, version))
+        return f"{name}:{version}"
+
+    return ModelRegistry(scaler_name="scaler", model_name="model", alias="prod",
+                         poll_interval=0, resolver=resolver, loader=loader)
+
+
+def test_models_loaded_once_and_reused():
+    versions = {"scaler": "1", "model": "4"}
+    loads = []
+    registry = make_registry(versions, loads)
+
+    first = registry.current
+    assert registry.current is first
+    assert registry.refresh() is False
+    assert loads == [("scaler", "1"), ("model", "4")]
+    assert first.version_header() == "model=4;scaler=1"
+
+
+def test_alias_move_swaps_snapshot():
+    versions = {"scaler": "1", "model": "4"}
+    loads = []
+    registry = make_registry(versions, loads)
+    old = registry.current
+
+    versions["model"] = "5"
+    assert registry.refresh() is True
+    new = registry.current
+    assert new is not old
+    assert new.model == "model:5"
+    # L'ancien instantané reste intact pour les requêtes en cours
+    assert old.model == "model:4"
+    # Seul l'artefact dont la version a changé est rechargé
+    assert loads == [("scaler", "1"), ("model", "4"), ("model", "5")]
+    assert new.scaler is old.scaler
@@ -0,0 +1,124 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.serialization import row_timestamps
+from app.side_effects import run_monitoring
+from monitoring.service import MonitoringService, PredictionRing
+
+
+class FakeEstimator:
+    """Substitut de NannyML : RMSE = écart moyen à la moyenne de référence."""
+
+    fitted = 0
+    failing = False
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+
+    def fit(self, reference):
+        FakeEstimator.fitted += 1
+        self.mean = reference["y_pred"].mean()
+
+    def estimate(self, chunk):
+        assert len(chunk) == self.chunk_size
+        if FakeEstimator.failing:
+            raise RuntimeError("estimation impossible")
+        return pd.DataFrame({"value": [float(np.abs(chunk["y_pred"] - self.mean).mean())]})
+
+
+def make_service(tmp_path, clock, emails, **kwargs):
+    reference = tmp_path / "reference.csv"
+    reference.write_text("timestamp,y_pred\n2025-01-01 00:00:00,1000\n2025-01-01 01:00:00,1000\n")
+    return MonitoringService(reference_path=str(reference), chunk_size=4, buffer_rows=8, threshold=700,
+                             alert_interval=60, alerts_log=str(tmp_path / "alerts.log"),
+                             chunks_log=str(tmp_path / "chunks.csv"), estimator_factory=FakeEstimator,
+                             alert=lambda rmse, suppressed: emails.append((rmse, suppressed)),
+                             clock=lambda: clock[0], **kwargs)
+
+
+def test_ring_keeps_the_latest_rows():
+    ring = PredictionRing(4)
+    ts = row_timestamps(date(2025, 1, 1), 6)
+    ring.extend(ts[:3], np.arange(3.0))
+    ring.extend(ts[3:], np.arange(3.0, 6.0))
+    assert ring.total == 6 and len(ring) == 4
+    assert ring.last(4)["y_pred"].tolist() == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_chunks_are_scored_once_and_estimator_fitted_once(tmp_path):
+    FakeEstimator.fitted = 0
+    emails = []
+    service = make_service(tmp_path, [0.0], emails)
+    ts = row_timestamps(date(2025, 1, 1), 10)
+
+    assert service.observe(ts[:3], [1000.0] * 3) == []
+    chunks = service.observe(ts[3:8], [1000.0] * 5)
+    assert [c["rmse"] for c in chunks] == [0.0, 0.0]
+    assert service.observe(ts[8:10], [1000.0] * 2) == []
+    assert FakeEstimator.fitted == 1
+    assert service.stats()["pending_rows"] == 2
+    assert len(open(tmp_path / "chunks.csv").readlines()) == 3
+
+
+def test_alerts_are_logged_but_emails_rate_limited(tmp_path):
+    emails, clock = [], [0.0]
+    service = make_service(tmp_path, clock, emails)
+    ts = row_timestamps(date(2025, 1, 1), 12)
+
+    service.observe(ts[:8], [2000.0] * 8)  # Deux chunks en alerte : un seul e-mail
+    clock[0] = 120.0
+    service.observe(ts[8:], [2000.0] * 4)
+
+    assert emails == [(1000.0, 0), (1000.0, 1)]
+    assert len(open(tmp_path / "alerts.log").readlines()) == 3
+    assert service.stats()["suppressed"] == 1
+
+
+def test_reference_change_refits_and_side_effect_handler_feeds_service(tmp_path):
+    FakeEstimator.fitted = 0
+    service = make_service(tmp_path, [0.0], [])
+    # Horodatages réels du payload (ligne de 00:45 absente) ; le second payload, sans horodatages,
+    # retombe sur la grille quart-horaire
+    timestamps = ["2025-01-01T00:00:00", "2025-01-01T00:15:00", "2025-01-01T00:30:00", "2025-01-01T01:00:00"]
+    run_monitoring([{"T1": "2025-01-01", "timestamps": timestamps, "predictions": [1000.0] * 4}], service=service)
+
+    reference = tmp_path / "reference.csv"
+    reference.write_text("timestamp,y_pred\n2025-01-01 00:00:00,1500\n")
+    os.utime(reference, ns=(0, 0))
+    run_monitoring([{"T1": "2025-01-02", "predictions": [1000.0] * 4}], service=service)
+
+    assert FakeEstimator.fitted == 2
+    assert [c["rmse"] for c in service.stats()["last_chunks"]] == [0.0, 500.0]
+    assert [c["end"] for c in service.stats()["last_chunks"]] == ["2025-01-01 01:00:00", "2025-01-02 00:45:00"]
+
+
+def test_retried_observe_neither_duplicates_rows_nor_skips_chunks(tmp_path):
+    emails = []
+    service = make_service(tmp_path, [0.0], emails)
+    ts = row_timestamps(date(2025, 1, 1), 8)
+    failures = [1]
+
+    def flaky(rmse, suppressed):
+        if failures:
+            failures.pop()
+            raise ConnectionError("smtp indisponible")
+        emails.append(rmse)
+
+    service._alert = flaky
+    service.observe(ts[:4], [2000.0] * 4)  # Erreur d'e-mail ignorée, chunk estimé
+    FakeEstimator.failing = True
+    try:
+        with pytest.raises(RuntimeError):
+            service.observe(ts[4:], [1000.0] * 4)
+    finally:
+        FakeEstimator.failing = False
+    assert service.stats()["pending_rows"] == 4
+    chunks = service.observe(ts[4:], [1000.0] * 4)  # Nouvel essai du même lot
+
+    assert [c["rmse"] for c in chunks] == [0.0]
+    assert service.stats()["chunks"] == 2 and service.stats()["replayed"] == 1
+    assert service.stats()["pending_rows"] == 0 and service.stats()["buffered_rows"] == 8
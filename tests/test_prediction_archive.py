@@ -0,0 +1,116 @@
+import os
+from datetime import date
+
+import pyarrow.parquet as pq
+import pytest
+
+from app.prediction_archive import PredictionArchive, multipart_upload
+from benchmarks.fixtures import InMemoryS3
+
+VERSIONS = {"EnergyForecastModel_xgboost": "7", "Scaler_standard": "3"}
+
+
+def payload(T1, values, versions=VERSIONS):
+    return {"T1": T1, "predictions": values, "model_versions": versions}
+
+
+def test_append_partitions_by_day_and_model_version(tmp_path):
+    archive = PredictionArchive(str(tmp_path))
+    # 120 pas quart-horaires à partir du 1er : deux jours ; puis une autre version du modèle
+    values = [float(i) for i in range(120)]
+    written = archive.append([payload("2025-01-01", values),
+                              payload("2025-01-02", [100.0], {"EnergyForecastModel_xgboost": "8"})])
+    assert sorted(os.path.dirname(path) for path in written) == [
+        os.path.join("date=2025-01-01", "model_version=7"),
+        os.path.join("date=2025-01-02", "model_version=7"),
+        os.path.join("date=2025-01-02", "model_version=8")]
+
+    # Un lot rejoué réécrit les mêmes fichiers : pas de doublon
+    assert archive.append([payload("2025-01-01", values)]) == written[:2]
+
+    day2 = archive.read_between(date(2025, 1, 2), date(2025, 1, 2))
+    assert len(day2) == 25 and day2["T1"].astype(str).tolist()[:2] == ["2025-01-01", "2025-01-02"]
+    assert [str(t) for t in day2["timestamp"].iloc[[0, 2]]] == ["2025-01-02 00:00:00", "2025-01-02 00:15:00"]
+    assert archive.read_between(date(2025, 1, 2), date(2025, 1, 2), model_version="7")["y_pred"].tolist() == \
+        values[96:]
+    assert archive.read_between(date(2025, 1, 1), date(2025, 1, 3), model_version="8")["y_pred"].tolist() == [100.0]
+    assert archive.read_between(date(2024, 1, 1), date(2024, 12, 31)).empty
+
+
+def test_rows_keep_the_timestamps_carried_by_the_payload(tmp_path):
+    archive = PredictionArchive(str(tmp_path))
+    # Jour du 2025-01-01 sans couleur TEMPO : la première ligne prédite est le 2 à minuit
+    timestamps = ["2025-01-02T00:00:00", "2025-01-02T00:30:00", "2025-01-02T00:45:00"]
+    archive.append([dict(payload("2025-01-01", [1.0, 2.0, 3.0]), timestamps=timestamps)])
+
+    assert archive.files("date=2025-01-01/model_version=7") == []
+    rows = archive.read_between(date(2025, 1, 1), date(2025, 1, 2))
+    assert [t.isoformat() for t in rows["timestamp"]] == timestamps
+
+
+def test_compaction_keeps_rows_and_replaces_remote_objects(tmp_path):
+    s3 = InMemoryS3()
+    archive = PredictionArchive(str(tmp_path), compact_min_files=3)
+    for day in range(5):
+        archive.store([payload("2025-03-01", [float(day), float(day) + 0.5])], s3, "bucket")
+    partition = os.path.join("date=2025-03-01", "model_version=7")
+
+    # Compactée au 3e fichier (1 fichier), puis deux ajouts : 3 fichiers, compactés à nouveau
+    files = archive.files(partition)
+    assert len(files) == 1
+    archive.store([payload("2025-03-01", [9.0])], s3, "bucket")
+    files = archive.files(partition)
+    assert len(files) == 2
+    assert s3.keys("bucket") == sorted(archive.key(path) for path in files)
+    before = archive.read_between(date(2025, 3, 1), date(2025, 3, 1))
+
+    merged = archive.compact(partition, s3, "bucket")
+    assert archive.files(partition) == [merged]
+    assert s3.keys("bucket") == [archive.key(merged)]
+    after = archive.read_between(date(2025, 3, 1), date(2025, 3, 1))
+    assert sorted(after["y_pred"]) == sorted(before["y_pred"]) and len(after) == 11
+    assert after["timestamp"].is_monotonic_increasing
+    assert pq.ParquetFile(os.path.join(str(tmp_path), merged)).metadata.num_rows == 11
+    assert archive.compact(partition) is None
+
+    # Lot rejoué après la compaction de son fichier : pas de doublon
+    assert archive.store([payload("2025-03-01", [0.0, 0.5])], s3, "bucket") == []
+    assert archive.files(partition) == [merged]
+    assert len(archive.read_between(date(2025, 3, 1), date(2025, 3, 1))) == 11
+
+
+def _store_and_read(root, worker):
+    archive = PredictionArchive(root, compact_min_files=2)
+    for i in range(10):
+        archive.store([payload("2025-04-01", [float(worker * 100 + i)])])
+        archive.read_between(date(2025, 4, 1), date(2025, 4, 1))
+
+
+def test_workers_compact_and_read_the_same_partition(tmp_path):
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_store_and_read, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert [process.exitcode for process in workers] == [0] * 4
+    rows = PredictionArchive(str(tmp_path)).read_between(date(2025, 4, 1), date(2025, 4, 1))
+    assert sorted(rows["y_pred"]) == sorted(float(w * 100 + i) for w in range(4) for i in range(10))
+
+
+def test_large_files_are_uploaded_in_parts(tmp_path):
+    path = tmp_path / "blob.bin"
+    data = os.urandom(10_000)
+    path.write_bytes(data)
+    s3 = InMemoryS3()
+
+    assert multipart_upload(s3, str(path), "b", "k", part_size=4096) == 3
+    assert s3.objects[("b", "k")] == data
+    assert multipart_upload(s3, str(path), "b", "small", part_size=1 << 20) == 1
+
+    failing = InMemoryS3(fail_part=2)
+    with pytest.raises(ConnectionError):
+        multipart_upload(failing, str(path), "b", "k", part_size=4096)
+    assert failing.aborted == 1 and ("b", "k") not in failing.objects
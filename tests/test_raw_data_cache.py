@@ -0,0 +1,107 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zipfile import ZipFile
+
+import pytest
+
+from core.raw_data_cache import RawDataCache, build_session
+
+
+def make_zip(content: str) -> bytes:
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as zf:
+        zf.writestr("eCO2mix_RTE_En-cours-TR.xls", content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def rte_stub():
+    """Serveur HTTP local qui imite RTE (ETag + 304)."""
+    state = {"body": make_zip("v1"), "etag": '"v1"', "hits": 0, "not_modified": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"] += 1
+            if self.headers.get("If-None-Match") == state["etag"]:
+                state["not_modified"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", state["etag"])
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+            self.wfile.write(state["body"])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/eco2mix.zip"
+    yield state
+    server.shutdown()
+
+
+def test_warm_fetch_needs_no_network(tmp_path, rte_stub):
+    cache = RawDataCache(str(tmp_path), session=build_session(), max_age=60)
+    assert cache.fetch(rte_stub["url"], "annual") is True
+    assert (tmp_path / "eCO2mix_RTE_En-cours-TR.xls").read_text() == "v1"
+
+    # Le cache est persistant : une nouvelle instance relit l'index sans réseau
+    warm = RawDataCache(str(tmp_path), session=build_session(), max_age=60)
+    assert warm.fetch(rte_stub["url"], "annual") is False
+    assert rte_stub["hits"] == 1
+
+
+def test_conditional_request_and_change(tmp_path, rte_stub):
+    cache = RawDataCache(str(tmp_path), session=build_session(), max_age=0)
+    cache.fetch(rte_stub["url"], "annual")
+    fingerprint = cache.fingerprint()
+
+    assert cache.fetch(rte_stub["url"], "annual") is False
+    assert rte_stub["not_modified"] == 1
+
+    rte_stub["body"], rte_stub["etag"] = make_zip("v2"), '"v2"'
+    assert cache.fetch(rte_stub["url"], "annual") is True
+    assert (tmp_path / "eCO2mix_RTE_En-cours-TR.xls").read_text() == "v2"
+    assert cache.fingerprint() != fingerprint
+
+
+def test_concurrent_fetches_download_once_and_clean_up(tmp_path, rte_stub):
+    # Deux instances sur le même dossier : comme deux workers gunicorn
+    caches = [RawDataCache(str(tmp_path), session=build_session(), max_age=60) for _ in range(2)]
+    threads = [threading.Thread(target=cache.fetch, args=(rte_stub["url"], "annual")) for cache in caches * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert rte_stub["hits"] == 1
+
+    # Archive invalide : l'extraction échoue et le fichier temporaire est supprimé
+    rte_stub["body"], rte_stub["etag"] = b"not a zip", '"broken"'
+    stale = RawDataCache(str(tmp_path), session=build_session(), max_age=0)
+    with pytest.raises(Exception):
+        stale.fetch(rte_stub["url"], "annual")
+    assert not list((tmp_path / ".downloads").glob("*.part"))
+
+
+def _update_entries(folder, worker):
+    cache = RawDataCache(folder)
+    for i in range(20):
+        cache._update_entry(f"https://rte/{worker}/{i}", sha256=str(i))
+
+
+def test_workers_updating_the_index_keep_every_entry(tmp_path):
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_update_entries, args=(str(tmp_path), worker)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert [process.exitcode for process in workers] == [0] * 4
+    assert len(RawDataCache(str(tmp_path))._read_index()) == 4 * 20
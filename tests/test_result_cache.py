@@ -0,0 +1,66 @@
+from datetime import date
+
+from app.result_cache import PredictionCache, make_cache_key
+from app.serialization import row_timestamps
+
+VERSIONS = {"EnergyForecastModel_xgboost": "4", "Scaler_standard": "1"}
+
+
+def timestamps(n):
+    return row_timestamps(date(2025, 1, 1), n)
+
+
+def test_hits_misses_and_lru_eviction_by_size():
+    one_entry = PredictionCache._size(([0.0] * 10, timestamps(10)))
+    cache = PredictionCache(max_bytes=2 * one_entry, persist_dir=None)
+    keys = [make_cache_key(f"2025-01-0{i}", f"2025-01-0{i + 1}", "data", VERSIONS) for i in range(1, 4)]
+
+    assert cache.get(keys[0]) is None
+    cache.put(keys[0], [1.0] * 10, timestamps(10))
+    cache.put(keys[1], [2.0] * 10, timestamps(10))
+    assert cache.get(keys[0])[0] == [1.0] * 10  # keys[0] devient la plus récente
+    cache.put(keys[2], [3.0] * 10, timestamps(10))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2])[0] == [3.0] * 10
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 2, 1, 2)
+    assert stats["bytes"] <= stats["max_bytes"]
+
+
+def test_new_data_or_model_version_invalidates_entries():
+    cache = PredictionCache(persist_dir=None)
+    key = make_cache_key("2025-01-01", "2025-01-02", "data-v1", VERSIONS)
+    cache.put(key, [1.0], timestamps(1))
+
+    assert cache.retain("data-v1", VERSIONS) == 0
+    assert cache.retain("data-v1", dict(VERSIONS, EnergyForecastModel_xgboost="5")) == 1
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    key = make_cache_key("2025-01-01", "2025-01-02", "data-v1", VERSIONS)
+    PredictionCache(persist_dir=str(tmp_path)).put(key, [1.5, 2.5], timestamps(2))
+
+    reloaded = PredictionCache(persist_dir=str(tmp_path))
+    predictions, stamps = reloaded.get(key)
+    assert predictions == [1.5, 2.5] and (stamps == timestamps(2)).all()
+
+    reloaded.retain("data-v2", VERSIONS)
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_entries_are_not_shared_and_written_outside_the_lock(tmp_path):
+    cache = PredictionCache(persist_dir=str(tmp_path))
+    key = make_cache_key("2025-01-01", "2025-01-02", "data-v1", VERSIONS)
+    persist = cache._persist
+    held = []
+    cache._persist = lambda *args: (held.append(cache._lock.locked()), persist(*args))
+    cache.put(key, [1.0, 2.0], timestamps(2))
+    assert held == [False]
+
+    predictions, stamps = cache.get(key)
+    predictions.append(3.0)
+    assert cache.get(key)[0] == [1.0, 2.0]
+    assert not stamps.flags.writeable
@@ -0,0 +1,62 @@
+import json
+from datetime import date, datetime
+
+import pyarrow as pa
+
+from app.schemas import PredictionOutput, PredictionRow
+from app.serialization import (ARROW, JSON, NDJSON, iter_arrow_ipc, iter_ndjson, json_body, negotiate_format,
+                               row_timestamps)
+
+PREDICTIONS = [50123.5, 49876.25, 51000.0, 48765.125, 50500.75]
+TIMESTAMPS = row_timestamps(date(2025, 6, 1), len(PREDICTIONS))
+
+
+def test_negotiate_format():
+    assert negotiate_format(None) == JSON
+    assert negotiate_format("*/*") == JSON
+    assert negotiate_format(NDJSON) == NDJSON
+    assert negotiate_format(f"{JSON};q=0.5, {ARROW}") == ARROW
+    assert negotiate_format("text/html, application/*;q=0.1") == JSON
+    assert negotiate_format("text/csv") is None
+
+
+def test_ndjson_rows_match_typed_schema():
+    lines = b"".join(iter_ndjson(TIMESTAMPS, PREDICTIONS, chunk_rows=2)).decode().splitlines()
+    rows = [PredictionRow.model_validate_json(line) for line in lines]
+
+    assert [row.y_pred for row in rows] == PREDICTIONS
+    assert rows[0].timestamp == datetime(2025, 6, 1, 0)
+    assert rows[-1].timestamp == datetime(2025, 6, 1, 1, 0)  # Pas quart-horaire
+
+
+def test_arrow_stream_round_trip():
+    chunks = list(iter_arrow_ipc(TIMESTAMPS, PREDICTIONS, chunk_rows=2))
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+    assert len(chunks) == 4  # schéma + 1er lot, 2 lots, fin de flux
+    assert table.column("y_pred").to_pylist() == PREDICTIONS
+    assert table.column("timestamp").to_pylist()[1] == datetime(2025, 6, 1, 0, 15)
+
+
+def test_one_day_response_ends_at_quarter_to_midnight():
+    predictions = [50000.0] * 96  # Une journée de lignes eCO2mix
+    timestamps = row_timestamps(date(2025, 6, 1), 96)
+    lines = b"".join(iter_ndjson(timestamps, predictions)).decode().splitlines()
+    table = pa.ipc.open_stream(b"".join(iter_arrow_ipc(timestamps, predictions))).read_all()
+
+    assert PredictionRow.model_validate_json(lines[-1]).timestamp == datetime(2025, 6, 1, 23, 45)
+    assert table.column("timestamp").to_pylist()[-1] == datetime(2025, 6, 1, 23, 45)
+
+
+def test_json_body_is_the_historical_payload():
+    body = PredictionOutput.model_validate(json.loads(json_body(TIMESTAMPS, PREDICTIONS)))
+    assert body.prediction == PREDICTIONS
+    assert body.timestamps[1] == datetime(2025, 6, 1, 0, 15)
+
+
+def test_non_finite_predictions_are_serialized_as_null():
+    predictions = [50123.5, float("nan"), float("inf")]
+    timestamps = TIMESTAMPS[:3]
+    lines = b"".join(iter_ndjson(timestamps, predictions)).decode().splitlines()
+    assert [json.loads(line)["y_pred"] for line in lines] == [50123.5, None, None]
+    assert json.loads(json_body(timestamps, predictions))["prediction"] == [50123.5, None, None]
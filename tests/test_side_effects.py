@@ -0,0 +1,130 @@
+import os
+import threading
+from datetime import date
+
+from app.prediction_archive import PredictionArchive
+from app.side_effects import SideEffectQueue, publish_predictions, store_predictions
+from benchmarks.fixtures import InMemoryS3
+
+
+class FakeKafka:
+    def __init__(self):
+        self.sent, self.flushes = [], 0
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_batches_are_coalesced_in_handler_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s3, kafka, calls = InMemoryS3(), FakeKafka(), []
+    archive = PredictionArchive(str(tmp_path / "archive"))
+    queue = SideEffectQueue({
+        "store": lambda p: (calls.append("store"), store_predictions(p, archive, s3, "b")),
+        "publish": lambda p: (calls.append("publish"), publish_predictions(p, kafka.send, kafka.flush)),
+    }, journal_dir=str(tmp_path / "queue"))
+
+    for day, value in [("2025-01-01", 1.0), ("2025-01-02", 2.0)]:
+        queue.submit("publish", {"T1": day, "predictions": [value]})
+        queue.submit("store", {"T1": day, "predictions": [value]})
+    queue.drain()
+
+    assert calls == ["store", "publish"]
+    assert archive.read_between(date(2025, 1, 1), date(2025, 1, 2))["y_pred"].tolist() == [1.0, 2.0]
+    assert s3.keys("b") == sorted(archive.key(path) for path in archive.files("date=2025-01-01/model_version=unknown")
+                                  + archive.files("date=2025-01-02/model_version=unknown"))
+    assert len(kafka.sent) == 2 and kafka.flushes == 1
+    assert queue.stats()["completed"] == 4
+    assert not list((tmp_path / "queue").rglob("*.json"))
+
+
+def test_retries_then_succeeds():
+    attempts = []
+
+    def flaky(payloads):
+        attempts.append(len(payloads))
+        if len(attempts) < 3:
+            raise ConnectionError("MinIO indisponible")
+
+    queue = SideEffectQueue({"store": flaky}, journal_dir=None, backoff=0.001)
+    queue.submit("store", {})
+    queue.drain()
+    assert attempts == [1, 1, 1]
+    assert queue.stats()["retried"] == 2 and queue.stats()["completed"] == 1
+
+
+def test_journal_survives_restart_and_backpressure(tmp_path):
+    journal = str(tmp_path / "queue")
+    queue = SideEffectQueue({"store": lambda p: None}, journal_dir=journal, max_pending=2, put_timeout=0.01)
+    assert queue.submit("store", {"n": 1}) and queue.submit("store", {"n": 2})
+    assert queue.submit("store", {"n": 3}) is False
+    assert queue.stats()["dropped"] == 1
+
+    seen = []
+    restarted = SideEffectQueue({"store": seen.extend}, journal_dir=journal)
+    restarted.drain()
+    assert seen == [{"n": 1}, {"n": 2}]
+
+
+def test_orphaned_journal_of_a_dead_worker_is_claimed_once(tmp_path):
+    journal = tmp_path / "queue"
+    dead_worker = journal / "999999999"  # pid inexistant
+    dead_worker.mkdir(parents=True)
+    (dead_worker / "00000000000000000001-abcd.json").write_text(
+        '{"id": "00000000000000000001-abcd", "kind": "store", "payload": {"n": 1}}')
+
+    seen = []
+    SideEffectQueue({"store": seen.extend}, journal_dir=str(journal)).drain()
+    SideEffectQueue({"store": seen.extend}, journal_dir=str(journal)).drain()
+    assert seen == [{"n": 1}]
+    assert not dead_worker.exists()
+
+
+def test_concurrent_submits_replay_the_journal_once(tmp_path):
+    journal = str(tmp_path / "queue")
+    first = SideEffectQueue({"store": lambda p: None}, journal_dir=journal)
+    for n in range(20):
+        first.submit("store", {"n": n})
+
+    seen = []
+    restarted = SideEffectQueue({"store": seen.extend}, journal_dir=journal)
+    threads = [threading.Thread(target=restarted.submit, args=("store", {"n": 100 + i})) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    restarted.drain()
+    assert sorted(p["n"] for p in seen) == list(range(20)) + list(range(100, 108))
+
+
+def test_partial_replay_resumes_once_the_queue_drains(tmp_path):
+    journal = str(tmp_path / "queue")
+    first = SideEffectQueue({"store": lambda p: None}, journal_dir=journal)
+    for n in range(5):
+        first.submit("store", {"n": n})
+
+    seen = []
+    restarted = SideEffectQueue({"store": seen.extend}, journal_dir=journal, max_pending=2, batch_size=2)
+    restarted.drain()
+    assert seen == [{"n": n} for n in range(5)]
+    assert not os.listdir(os.path.join(journal, str(os.getpid())))
+
+
+def test_batch_side_effects_take_one_task_per_handler(tmp_path, monkeypatch):
+    import app.side_effects as side_effects_module
+
+    seen = {"store": [], "publish": [], "monitor": []}
+    queue = SideEffectQueue({kind: seen[kind].extend for kind in seen}, journal_dir=str(tmp_path / "queue"),
+                            max_pending=3, put_timeout=0.01)
+    monkeypatch.setattr(side_effects_module, "side_effects", queue)
+    items = [(date(2025, 1, 1 + i), [f"2025-01-{1 + i:02d}T00:15:00"], [float(i)]) for i in range(20)]
+
+    side_effects_module.submit_prediction_side_effects(items, {"m": "1"})
+    assert queue.stats()["submitted"] == 3 and queue.stats()["dropped"] == 0
+    queue.drain()
+    assert [p["T1"] for p in seen["monitor"]] == [str(T1) for T1, _, _ in items]
+    assert [p["timestamps"] for p in seen["monitor"]] == [timestamps for _, timestamps, _ in items]
+    assert seen["store"] == seen["publish"] == seen["monitor"]
@@ -0,0 +1,78 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+from app.prefork import BackgroundWarmUp
+from benchmarks.import_time import LAZY_MODULES, build_report
+
+
+def test_api_import_does_not_load_heavy_dependencies():
+    report = build_report("app.main", repeat=1)
+
+    assert report["eager_heavy"] == [], f"importés au démarrage : {report['eager_heavy']}"
+    assert not set(LAZY_MODULES) & set(report["packages_ms"])
+
+
+def test_background_warm_up_reports_state():
+    release = threading.Event()
+    warmup = BackgroundWarmUp(lambda: release.wait(5))
+    warmup.start()
+    assert warmup.stats()["state"] == "running" and not warmup.finished
+
+    release.set()
+    assert warmup.wait(5)
+    assert warmup.stats()["state"] == "done"
+
+    failing = BackgroundWarmUp(lambda: 1 / 0)
+    failing.start()
+    assert failing.wait(5) and failing.stats()["state"] == "failed"
+
+
+def test_liveness_and_readiness(monkeypatch):
+    client = TestClient(app_main.app)
+    release = threading.Event()
+    warmup = BackgroundWarmUp(lambda: release.wait(5))
+    monkeypatch.setattr(app_main, "warmup", warmup)
+    monkeypatch.setattr(app_main.registry, "_current", None)
+    warmup.start()
+
+    assert client.get("/health/live").json()["status"] == "alive"
+    warming = client.get("/health/ready")
+    assert warming.status_code == 503 and warming.json()["status"] == "warming_up"
+
+    release.set()
+    warmup.wait(5)
+    monkeypatch.setattr(app_main.registry, "_current", object())
+    ready = client.get("/health/ready")
+    assert ready.status_code == 200 and ready.json()["models_loaded"]
+
+
+def _clients_after_fork(queue):
+    import app.kafka_publisher as kafka_publisher
+    import app.utils as app_utils
+    import core.raw_data_cache as raw_data_cache
+
+    queue.put((raw_data_cache._session is None, app_utils.get_s3_client.cache_info().currsize,
+               kafka_publisher.publisher._producer is None))
+
+
+def test_forked_workers_do_not_share_network_clients(monkeypatch):
+    import multiprocessing
+
+    import app.kafka_publisher as kafka_publisher
+    import app.utils as app_utils
+    import core.raw_data_cache as raw_data_cache
+
+    raw_data_cache.get_session()
+    app_utils.get_s3_client()
+    monkeypatch.setattr(kafka_publisher.publisher, "_producer", object())
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_clients_after_fork, args=(queue,))
+    child.start()
+    assert queue.get(timeout=30) == (True, 0, True)
+    child.join()
+    assert raw_data_cache._session is not None  # Le parent garde les siens
+    assert app_utils.get_s3_client.cache_info().currsize == 1
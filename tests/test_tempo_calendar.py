@@ -0,0 +1,132 @@
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import app.utils as app_utils
+from benchmarks.fixtures import write_eco2mix_files
+from core.data_preprocessing import (
+    concat_eCO2mix_frames,
+    fetch_eCO2mix_data,
+    load_all_xls_eCO2mix_data,
+    merge_eCO2mix_data,
+    preprocess_annual_data,
+    preprocess_eCO2mix_data,
+    preprocess_tempo_data,
+)
+from core.features_engineering import TEMPO_COLUMNS
+from core.tempo_calendar import TempoCalendar, tempo_seasons
+
+
+def test_seasons_cross_the_september_boundary():
+    assert tempo_seasons(date(2024, 8, 20), date(2024, 9, 5)) == ["2023-2024", "2024-2025"]
+    assert tempo_seasons(date(2024, 1, 1), date(2024, 8, 31)) == ["2023-2024"]
+    assert len(tempo_seasons(date(2000, 1, 1), date(2025, 1, 1))) == 26
+
+
+def test_calendar_lookup_update_and_persistence(tmp_path):
+    calendar = TempoCalendar()
+    assert calendar.update(["2024-01-02", "2024-01-03"], [1, 3]) == 2
+    assert calendar.update(np.array(["2023-12-30"], dtype="datetime64[ns]"), [2]) == 1  # extension vers le passé
+
+    dates = np.array(["2023-12-29", "2023-12-30T06:15", "2024-01-01", "2024-01-03T23:45", "2030-01-01", "NaT"],
+                     dtype="datetime64[ns]")
+    np.testing.assert_array_equal(calendar.lookup(dates), [0, 2, 0, 3, 0, 0])
+    np.testing.assert_array_equal(calendar.lookup_or_last(dates[:5]), [0, 2, 2, 3, 3])
+    assert calendar.covers(date(2024, 1, 2), date(2024, 1, 3))
+    assert not calendar.covers(date(2023, 12, 30), date(2024, 1, 3))
+
+    path = str(tmp_path / "tempo.npz")
+    calendar.save(path)
+    loaded = TempoCalendar.load(path)
+    assert loaded.origin == calendar.origin and loaded.last_day == date(2024, 1, 3)
+    np.testing.assert_array_equal(loaded.codes, calendar.codes)
+    assert len(TempoCalendar.load(str(tmp_path / "absent.npz"))) == 0
+
+
+def test_index_join_matches_hash_merge(tmp_path):
+    # Deux saisons TEMPO et deux années civiles
+    write_eco2mix_files(str(tmp_path), date(2023, 12, 1), days=300)
+    frames = load_all_xls_eCO2mix_data(str(tmp_path))
+    annual = preprocess_annual_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_*"))
+    tempo = preprocess_tempo_data(concat_eCO2mix_frames(frames, "eCO2mix_RTE_tempo*"))
+    # Jours sans couleur : lignes écartées comme par l'ancienne jointure
+    tempo = tempo[tempo['Date'] != pd.Timestamp("2024-03-10")]
+
+    expected = preprocess_eCO2mix_data(pd.merge(annual, tempo, on="Date", how="left"))
+    merged = preprocess_eCO2mix_data(merge_eCO2mix_data(annual, tempo))
+    pd.testing.assert_frame_equal(merged, expected.astype({col: bool for col in TEMPO_COLUMNS}))
+
+
+def test_missing_color_still_yields_every_tempo_column():
+    raw = pd.DataFrame({"Date": ["2024-01-01", "2024-01-02"], "Type de jour TEMPO": ["BLEU", "BLEU"]})
+    annual = pd.DataFrame({"Date": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+                           "Consommation": [1.0, 2.0, 3.0]})
+
+    merged = preprocess_eCO2mix_data(merge_eCO2mix_data(annual, preprocess_tempo_data(raw)))
+    assert list(merged.columns[-3:]) == TEMPO_COLUMNS
+    assert len(merged) == 2 and merged['Type de jour TEMPO_BLEU'].all() and not merged['Type de jour TEMPO_ROUGE'].any()
+
+
+def test_seasons_are_fetched_concurrently():
+    calls, barrier = [], threading.Barrier(3, timeout=5)
+
+    class Cache:
+        def fetch(self, url, label):
+            barrier.wait()  # Échoue si les trois téléchargements ne sont pas simultanés
+            calls.append(label)
+            return url.endswith("2024-2025")
+
+    urls = ["https://rte/tempo?season=2023-2024", "https://rte/tempo?season=2024-2025"]
+    assert fetch_eCO2mix_data("unused", urls, "https://rte/annual", cache=Cache())
+    assert sorted(calls) == ["annual", "tempo 2023-2024", "tempo 2024-2025"]
+
+
+def test_complete_seasons_are_not_downloaded_again(monkeypatch):
+    today = date.today()
+    monkeypatch.setattr(app_utils, "TEMPO_BACKFILL_START", str(today.replace(year=today.year - 3, day=1)))
+    calendar = TempoCalendar()
+    seasons = app_utils.required_tempo_seasons(today, calendar)
+    assert len(seasons) == 4
+
+    first = date(int(seasons[0][:4]), 9, 1)
+    days = pd.date_range(first, date(int(seasons[1][5:]), 8, 31))
+    calendar.update(days, np.ones(len(days)))
+    assert app_utils.required_tempo_seasons(today, calendar) == seasons[2:]
+
+
+def test_workers_saving_different_seasons_keep_both(tmp_path):
+    path = str(tmp_path / "calendar.npz")
+    first = TempoCalendar()
+    first.update(np.array(["2024-01-01", "2024-01-02"], dtype="datetime64[D]"), np.array([1, 3], dtype=np.uint8))
+    second = TempoCalendar()
+    second.update(np.array(["2025-01-01"], dtype="datetime64[D]"), np.array([2], dtype=np.uint8))
+
+    first.save(path)
+    second.save(path)  # Chargé avant l'écriture du premier : ne doit pas l'écraser
+    saved = TempoCalendar.load(path)
+    days = np.array(["2024-01-01", "2024-01-02", "2025-01-01"], dtype="datetime64[D]")
+    assert saved.lookup(days).tolist() == [1, 3, 2]
+
+
+def test_readers_never_see_a_half_updated_calendar():
+    calendar = TempoCalendar()
+    anchor = np.array(["2024-06-01"], dtype="datetime64[D]")
+    calendar.update(anchor, [3])
+    stop, wrong = threading.Event(), []
+
+    def read():
+        while not stop.is_set():
+            if calendar.lookup(anchor)[0] != 3:
+                wrong.append(1)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for k in range(1, 2000):  # Chaque ajout vers le passé déplace `origin`
+        calendar.update(anchor - k, [1])
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not wrong